@@ -0,0 +1,95 @@
+"""词书批量导入：生成 kajweb/dict 格式的合成词书，测量导入耗时与内存峰值
+
+导入在独立子进程中运行，报告解析+写入耗时和进程内存峰值（Linux VmHWM）。
+合成词书中约 5% 的单词是重复的（大小写不同），用于检验去重。
+
+用法: python benchmarks/bench_import.py [--entries 100000] [--library word_library.json]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+from word_library import WordLibrary
+from word_importer import import_books
+
+def peak_rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return 0
+
+lib = WordLibrary({library!r})
+before = len(lib.word_ids)
+baseline = peak_rss_kb()
+start = time.perf_counter()
+counts = import_books(lib, [{book!r}])
+elapsed = time.perf_counter() - start
+lib.close()
+ids = list(lib.word_ids)
+counts.update(seconds=elapsed, words=len(ids), unique_ids=len(set(ids)), before=before,
+              peak_rss_kb=peak_rss_kb(), baseline_rss_kb=baseline)
+print(json.dumps(counts))
+"""
+
+
+def synthetic_entry(rank: int, head: str) -> dict:
+    word_id = f"SYN_{rank}"
+    return {
+        "wordRank": rank,
+        "headWord": head,
+        "content": {"word": {"wordHead": head, "wordId": word_id, "content": {
+            "sentence": {"sentences": [{"sContent": f"This is an example sentence for {head}.",
+                                        "sCn": f"这是 {head} 的例句。"}]},
+            "usphone": head, "ukphone": head,
+            "trans": [{"tranCn": "合成释义", "pos": "n", "descCn": "中释", "tranOther": "synthetic"}],
+            "syno": {"synos": [{"pos": "n", "tran": "同义", "hwds": [{"w": "other"}]}]},
+            "remMethod": {"val": "x" * 120},
+        }}},
+        "bookId": "SYNTHETIC_1"
+    }
+
+
+def write_book(path: str, entries: int):
+    rng = random.Random(0)
+    with open(path, 'w', encoding='utf-8') as f:
+        for rank in range(1, entries + 1):
+            head = f"synword{rank}"
+            if rank > 1 and rng.random() < 0.05:
+                head = f"SynWord{rng.randrange(1, rank)}"  # 重复单词
+            f.write(json.dumps(synthetic_entry(rank, head), ensure_ascii=False) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--library", default=os.path.join(ROOT, "word_library.json"))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        book = os.path.join(tmp, "SYNTHETIC_1.json")
+        library = os.path.join(tmp, os.path.basename(args.library))
+        write_book(book, args.entries)
+        shutil.copy(args.library, library)
+        output = subprocess.check_output(
+            [sys.executable, "-c", PROBE.format(root=ROOT, library=library, book=book)], cwd=tmp)
+        result = json.loads(output.decode().strip().splitlines()[-1])
+        print(f"词书 {os.path.getsize(book) / 1024 / 1024:.1f}MB，{result['read']} 条记录")
+        print(f"导入 {result['imported']}，重复 {result['duplicate']}，无法识别 {result['invalid']}")
+        print(f"单词库 {result['before']} -> {result['words']} 个单词，ID 无重复: {result['unique_ids'] == result['words']}")
+        print(f"耗时 {result['seconds']:.2f}s，内存峰值 {result['peak_rss_kb'] / 1024:.1f}MB"
+              f"（导入前 {result['baseline_rss_kb'] / 1024:.1f}MB），单词库文件 {os.path.getsize(library) / 1024 / 1024:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""单词库格式对比：JSON vs .wlib 二进制格式的启动耗时与常驻内存
+
+每种格式在独立子进程中加载，报告 WordLibrary 构造耗时和加载后的常驻内存（Linux VmRSS）。
+--scale 会把单词库复制放大（生成新的ID），用于模拟大词书。
+
+用法: python benchmarks/bench_library_format.py [--library word_library.json] [--scale 20]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from word_store import convert
+
+PROBE = """
+import gc, json, sys, time
+sys.path.insert(0, {root!r})
+
+def current_rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+baseline = current_rss_kb()
+start = time.perf_counter()
+from word_library import WordLibrary
+lib = WordLibrary({path!r})
+elapsed = time.perf_counter() - start
+# 模拟评分和学习页面：遍历热字段，并读取一个单词的冷字段
+sum(1 for w in lib.all_words if w.get("learning_metadata") is None)
+lib.all_words[0].get("root_explanation")
+gc.collect()
+rss = current_rss_kb()
+print(json.dumps({{"load_seconds": elapsed, "rss_kb": rss, "rss_delta_kb": rss - baseline, "words": len(lib.all_words)}}))
+"""
+
+
+def probe(path: str):
+    output = subprocess.check_output([sys.executable, "-c", PROBE.format(root=ROOT, path=path)], cwd=os.path.dirname(path))
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--library", default=os.path.join(ROOT, "word_library.json"))
+    parser.add_argument("--scale", type=int, default=1, help="把单词库放大的倍数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(args.library, 'r', encoding='utf-8') as f:
+            words = json.load(f)
+        scaled = [dict(w, id=f"{w['id']}_{i}") for i in range(args.scale) for w in words]
+        json_path = os.path.join(tmp, "library.json")
+        wlib_path = os.path.join(tmp, "library.wlib")
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(scaled, f, ensure_ascii=False, indent=2)
+        convert(json_path, wlib_path)
+
+        print(f"{'format':>8} {'words':>8} {'size(KB)':>10} {'load(ms)':>10} {'RSS(MB)':>9} {'ΔRSS(MB)':>9}")
+        for name, path in (("json", json_path), ("wlib", wlib_path)):
+            result = probe(path)
+            print(f"{name:>8} {result['words']:>8} {os.path.getsize(path) // 1024:>10} "
+                  f"{result['load_seconds'] * 1000:>10.1f} {result['rss_kb'] / 1024:>9.1f} {result['rss_delta_kb'] / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""复习评分基准测试：原有逐字典循环 vs 堆调度器
+
+用法: python benchmarks/bench_review_scoring.py [--sizes 1000 10000 100000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from review_scheduler import ReviewScheduler
+
+
+def make_words(n: int, seed: int = 0):
+    """生成n个带随机学习元数据的已学单词"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    words = []
+    for i in range(n):
+        word = {"id": f"word_{i}", "word": f"w{i}"}
+        if rng.random() < 0.95:
+            last = now - timedelta(days=rng.randint(0, 40), seconds=rng.randint(0, 86399))
+            word["learning_metadata"] = {
+                "review_count": rng.randint(1, 8),
+                "last_reviewed": last.isoformat() if rng.random() < 0.98 else None,
+                "strength": rng.uniform(1.0, 6.0)
+            }
+        words.append(word)
+    return words
+
+
+def loop_top(words, n):
+    """原有实现：每次对所有单词逐个解析时间并评分，然后整体排序"""
+    candidates = []
+    for word in words:
+        if "learning_metadata" not in word:
+            score = 5.0
+        else:
+            lm = word["learning_metadata"]
+            review_factor = 1.0 / (lm.get("review_count", 1) + 1)
+            last_reviewed = lm.get("last_reviewed")
+            if last_reviewed:
+                days_since_review = (datetime.now() - datetime.fromisoformat(last_reviewed)).days
+                time_factor = min(days_since_review / 7, 3.0)
+            else:
+                time_factor = 2.0
+            strength_factor = 1.0 / lm.get("strength", 1.0)
+            score = review_factor * time_factor * strength_factor
+        candidates.append((word, score))
+    candidates.sort(key=lambda x: x[1], reverse=True)
+    return [word["id"] for word, _ in candidates[:n]]
+
+
+def build(scheduler, words):
+    for word in words:
+        scheduler.update(word["id"], word.get("learning_metadata"))
+    return scheduler
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--count", type=int, default=10, help="select_smart_review_words 的 count（取前 2×count）")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    k = args.count * 2
+
+    print(f"{'N':>8} {'loop(ms)':>10} {'heap build':>11} {'heap top':>10}")
+    for n in args.sizes:
+        words = make_words(n)
+        loop_time, expected = timed(lambda: loop_top(words, k), args.repeat)
+
+        heap_build, heap = timed(lambda: build(ReviewScheduler(), words), 1)
+        heap_time, heap_result = timed(lambda: heap.top(k), args.repeat)
+        assert heap_result == expected, "堆调度器结果与原实现不一致"
+
+        print(f"{n:>8} {loop_time * 1000:>10.2f} {heap_build * 1000:>11.2f} {heap_time * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
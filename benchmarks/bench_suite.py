@@ -0,0 +1,238 @@
+"""单词库与复习热点路径的基准测试：按不同单词库规模和已学比例计时，结果输出为JSON
+
+为每种规模（单词数）和已学比例生成合成单词库与学习状态（不需要网络和 API 密钥），
+在临时目录中计时以下操作（每次调用的耗时，单位微秒，报告最小值、中位数和次数）：
+
+- WordLibrary._load_words           读取单词库文件
+- WordLibrary.save_words            不传参数：整个单词库写回文件；append：追加一个新单词到日志
+- WordLibrary.remove_word           删除单词（追加日志并通知未学习单词池）
+- ReviewManager.select_smart_review_words(10)
+- ReviewManager.init_current_queue  抽取一批新单词
+- ReviewManager._get_word_by_id
+- ReviewManager.process_word_selection  与页面提交相同：在工作单元中处理 10 个复习单词（含落盘）
+
+结果写入 --out 指定的文件（默认输出到标准输出），进度信息输出到标准错误。
+指定 --compare 时与之前保存的结果逐项比较中位数，超过 --threshold 倍的项视为变慢，退出码为1。
+
+用法: python benchmarks/bench_suite.py [--sizes 1000 10000 100000 200000] [--learned 0.1 0.5 0.9]
+                                       [--formats json wlib] [--out results.json] [--compare baseline.json]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from review_manager import ReviewManager
+from word_library import WordLibrary
+from word_store import convert
+
+REVIEW_POOL_SIZE = 10
+
+
+def make_library(n: int, learned_fraction: float, seed: int = 0):
+    """生成n个单词和已学习队列，已学单词带随机学习元数据（与学习页面写入的字段相同）"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    words, old_queue = [], []
+    for i in range(n):
+        word = {
+            "id": f"word_{i:08d}",
+            "word": f"w{i}",
+            "translation": f"释义{i}",
+            "pronunciation": f"/w{i}/",
+            "example": f"This is an example for w{i}. - 这是 w{i} 的例句。",
+            "note": None,
+            "created_at": (now - timedelta(days=rng.randint(0, 365))).isoformat(),
+            "metadata": {},
+            "frequency": rng.randint(1, 20000)
+        }
+        if rng.random() < learned_fraction:
+            review_count = rng.randint(1, 8)
+            word["learning_metadata"] = {
+                "first_learned": (now - timedelta(days=60)).isoformat(),
+                "review_count": review_count,
+                "last_reviewed": (now - timedelta(days=rng.randint(0, 40), seconds=rng.randint(0, 86399))).isoformat(),
+                "strength": min(1.1 ** review_count, 10.0)
+            }
+            old_queue.append(word["id"])
+        words.append(word)
+    return words, old_queue
+
+
+def timed(fn, repeat: int):
+    """调用fn repeat次，返回每次的耗时（秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples):
+    return {
+        "best_us": round(min(samples) * 1e6, 2),
+        "median_us": round(statistics.median(samples) * 1e6, 2),
+        "runs": len(samples)
+    }
+
+
+def bench_case(tmp: str, n: int, learned_fraction: float, fmt: str, args):
+    words, old_queue = make_library(n, learned_fraction, args.seed)
+    json_path = os.path.join(tmp, "library.json")
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(words, f, ensure_ascii=False, indent=2)
+    library_path = json_path
+    if fmt == "wlib":
+        library_path = os.path.join(tmp, "library.wlib")
+        with contextlib.redirect_stdout(sys.stderr):  # 标准输出只留给结果JSON
+            convert(json_path, library_path)
+    state_path = os.path.join(tmp, "learning_state.json")
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump({"old_queue": old_queue, "stats": {}}, f)
+    del words
+
+    rng = random.Random(args.seed)
+    ops = {}
+    # 计时期间不触发后台压缩，整体写回单独计时
+    word_lib = WordLibrary(library_path, compact_threshold=10 ** 9)
+    try:
+        ops["_load_words"] = timed(word_lib._load_words, args.repeat)
+        ops["save_words"] = timed(word_lib.save_words, args.repeat)
+
+        review_manager = ReviewManager(word_lib, state_path)
+        learned = list(review_manager.old_queue)
+        unlearned = [word_id for word_id in word_lib.word_ids if word_id not in review_manager.learned_words]
+
+        ops["select_smart_review_words"] = timed(
+            lambda: review_manager.select_smart_review_words(REVIEW_POOL_SIZE), args.ops)
+        ops["init_current_queue"] = timed(review_manager.init_current_queue, args.ops)
+        lookups = [rng.choice(learned or unlearned) for _ in range(args.ops)]
+        ops["_get_word_by_id"] = [sample for word_id in lookups
+                                  for sample in timed(lambda: review_manager._get_word_by_id(word_id), 1)]
+
+        # 与复习页面提交相同：约五分之一的单词被选为陌生单词，其余为记得的单词
+        selection = []
+        for _ in range(args.ops if learned else 0):
+            review_pool = [w["id"] for w in review_manager.select_smart_review_words(REVIEW_POOL_SIZE)]
+            selected = review_pool[:len(review_pool) // 5]
+            unselected = review_pool[len(selected):]
+
+            def submit():
+                with review_manager.unit_of_work():
+                    review_manager.process_word_selection(selected, unselected)
+            selection.extend(timed(submit, 1))
+            # 放回已学习队列，保持已学单词数量不变
+            for word_id in selected:
+                review_manager.process_word(word_id, "keep")
+        if selection:
+            ops["process_word_selection"] = selection
+
+        new_words = [word_lib.create_word(f"bench{i}", "基准测试") for i in range(args.ops)]
+        ops["save_words(append)"] = [sample for word in new_words
+                                     for sample in timed(lambda: word_lib.save_words([word]), 1)]
+        removals = rng.sample(list(word_lib.word_ids), min(args.ops, n))
+        ops["remove_word"] = [sample for word_id in removals
+                              for sample in timed(lambda: word_lib.remove_word(word_id), 1)]
+    finally:
+        word_lib.close()
+
+    return {
+        "words": n,
+        "learned_fraction": learned_fraction,
+        "learned": len(old_queue),
+        "format": fmt,
+        "ops": {name: summarize(samples) for name, samples in ops.items()}
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def case_key(case):
+    return case["words"], case["learned_fraction"], case["format"]
+
+
+def compare(report, baseline_path: str, threshold: float) -> bool:
+    """与之前的结果比较中位数，返回是否有变慢超过阈值的项"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        # 旧版本的结果中还有 NumPy 调度器的数据，只与堆调度器比较
+        baseline = {case_key(case): case for case in json.load(f)["results"] if case.get("scheduler", "heap") == "heap"}
+    regressed = False
+    print(f"与 {baseline_path} 比较（中位数，>{threshold:.2f}x 标记为变慢）:", file=sys.stderr)
+    for case in report["results"]:
+        old = baseline.get(case_key(case))
+        if old is None:
+            continue
+        for name, result in case["ops"].items():
+            before = old["ops"].get(name)
+            if not before or not before["median_us"]:
+                continue
+            ratio = result["median_us"] / before["median_us"]
+            mark = ""
+            if ratio > threshold:
+                mark = "  <-- 变慢"
+                regressed = True
+            print(f"  N={case['words']:>7} learned={case['learned_fraction']:<4} {case['format']:>4} "
+                  f"{name:<28} {before['median_us']:>12.1f} -> {result['median_us']:>12.1f}us ({ratio:.2f}x){mark}",
+                  file=sys.stderr)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 200000])
+    parser.add_argument("--learned", type=float, nargs="+", default=[0.1, 0.5, 0.9], help="已学单词的比例")
+    parser.add_argument("--formats", nargs="+", choices=["json", "wlib"], default=["json"])
+    parser.add_argument("--repeat", type=int, default=3, help="整体读取/写回单词库的次数")
+    parser.add_argument("--ops", type=int, default=50, help="其他操作的调用次数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="结果JSON文件（默认输出到标准输出）")
+    parser.add_argument("--compare", help="之前保存的结果JSON，用于比较")
+    parser.add_argument("--threshold", type=float, default=1.25, help="中位数变慢超过该倍数视为退化")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"repeat": args.repeat, "ops": args.ops, "seed": args.seed},
+        "results": []
+    }
+    for n in args.sizes:
+        for learned_fraction in args.learned:
+            for fmt in args.formats:
+                print(f"N={n} learned={learned_fraction} format={fmt}", file=sys.stderr)
+                with tempfile.TemporaryDirectory() as tmp:
+                    report["results"].append(bench_case(tmp, n, learned_fraction, fmt, args))
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+        print(f"结果已写入 {args.out}", file=sys.stderr)
+    else:
+        print(output)
+
+    if args.compare and compare(report, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""批量生成例句：N个关键单词一次请求 vs 逐个请求
+
+用本地假模型比较上游调用次数和总耗时；批量请求中的部分例句第一次校验失败，
+检查只有失败的例句被重新请求。
+
+用法: python benchmarks/demo_batch_sentences.py [--words 5] [--latency 0.5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm import LLM
+from fake_chat import FakeChatModel, sentence_responder
+
+
+def flaky_responder(failing: set, requests: list):
+    """第一次请求时 failing 中单词的例句里没有关键单词（无法修复），之后正常；requests 记录每次请求的关键单词"""
+    def respond(messages):
+        content = json.loads(sentence_responder(messages))
+        requests.append([item["key"] for item in content.get("items", [])])
+        for item in content.get("items", []):
+            if item["key"] in failing:
+                failing.discard(item["key"])
+                item["sentence"] = item["sentence"].replace(item["key"], "study")
+        return json.dumps(content, ensure_ascii=False)
+    return respond
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    result = await coro
+    return time.perf_counter() - start, result
+
+
+async def one_by_one(llm: LLM, items):
+    return await asyncio.gather(*(llm.amake_sentence(key, pool) for key, pool in items))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.5, help="假模型单次调用延迟（秒）")
+    args = parser.parse_args()
+
+    items = [(f"word{i}", [f"pool{i}_{j}" for j in range(10)]) for i in range(args.words)]
+    llm = LLM(api_key="offline")
+
+    llm.llm = FakeChatModel(latency=args.latency)
+    single_time, _ = asyncio.run(timed(one_by_one(llm, items)))
+    single_calls = llm.llm.calls
+    single_chars = sum(len(llm._sentence_messages(key, pool)[1].content) for key, pool in items)
+
+    failing = {items[0][0], items[-1][0]}
+    requests = []
+    llm.llm = FakeChatModel(latency=args.latency, responder=flaky_responder(set(failing), requests))
+    llm.retry_policy.base_delay = 0
+    batch_time, results = asyncio.run(timed(llm.amake_sentences(items)))
+    assert all(result is not None for result in results), "所有例句最终都应生成成功"
+    assert sorted(requests[1:]) == [sorted(failing)], f"第一次请求后只应重新请求失败的例句，实际 {requests}"
+    batch_chars = len(llm._sentences_messages(items)[1].content)
+
+    print(f"{args.words} 个关键单词，单次延迟 {args.latency}s")
+    print(f"逐个生成: 上游调用 {single_calls} 次，提示词共 {single_chars} 字符，耗时 {single_time:.2f}s")
+    print(f"批量生成: 上游调用 {llm.llm.calls} 次（第二次只请求校验失败的 {requests[1]}），"
+          f"首次提示词 {batch_chars} 字符，耗时 {batch_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""合并相同的并发LLM调用：N个提示词相同的并发请求只请求一次上游
+
+用本地假模型并发发起N个相同的 make_sentence 请求（模拟刷新页面、多个标签页），
+其中一部分以流式方式调用，检查上游调用次数、所有调用者拿到的结果以及流式部分结果的转发；
+再发起一组提示词不同的请求作为对照。
+
+用法: python benchmarks/demo_single_flight.py [--requests 8] [--latency 0.5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm import LLM
+from single_flight import coalesce_stats
+from fake_chat import FakeChatModel
+
+
+async def identical(llm: LLM, n: int):
+    partials = [0] * n
+
+    async def handler(i):
+        async def on_partial(fields):
+            partials[i] += 1
+        # 一半的调用者以流式方式调用
+        return await llm.amake_sentence("study", ["apple", "banana"], on_partial=on_partial if i % 2 == 0 else None)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(handler(i) for i in range(n)))
+    return time.perf_counter() - start, results, partials
+
+
+async def distinct(llm: LLM, n: int):
+    await asyncio.gather(*(llm.amake_sentence(f"word{i}", []) for i in range(n)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5, help="假模型单次调用延迟（秒）")
+    args = parser.parse_args()
+
+    llm = LLM(api_key="offline")
+    llm.llm = FakeChatModel(latency=args.latency)
+
+    elapsed, results, partials = asyncio.run(identical(llm, args.requests))
+    upstream = llm.llm.calls
+    assert upstream == 1, f"相同的并发请求应只调用一次上游，实际 {upstream} 次"
+    assert all(r == results[0] for r in results), "所有调用者应拿到相同的结果"
+    assert all(r is not results[0] for r in results[1:]), "其他调用者应拿到结果的副本"
+    assert partials[0] > 0, "流式调用者应收到部分结果"
+    print(f"{args.requests} 个相同的并发请求: 上游调用 {upstream} 次，耗时 {elapsed:.2f}s，"
+          f"流式调用者收到部分结果 {[partials[i] for i in range(0, args.requests, 2)]} 次")
+
+    asyncio.run(distinct(llm, args.requests))
+    assert llm.llm.calls == upstream + args.requests, "提示词不同的请求不应合并"
+    print(f"{args.requests} 个不同的并发请求: 上游调用 {llm.llm.calls - upstream} 次")
+    print(f"合并统计: {coalesce_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""本地假聊天模型：按固定延迟返回预设内容，用于离线基准测试（不需要API_KEY）"""
+import asyncio
+import json
+import re
+import time
+from langchain.schema import AIMessage
+from langchain_core.messages import AIMessageChunk
+
+
+class FakeChatModel:
+    """模拟 ChatOpenAI 的 invoke / ainvoke 接口"""
+
+    def __init__(self, latency: float = 0.5, responder=None):
+        self.latency = latency
+        self.responder = responder or sentence_responder
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        time.sleep(self.latency)
+        return AIMessage(content=self.responder(messages))
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=self.responder(messages))
+
+    async def astream(self, messages, chunk_size: int = 8):
+        """按固定大小分段流式返回，总耗时与 ainvoke 相同"""
+        self.calls += 1
+        content = self.responder(messages)
+        chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)] or [""]
+        for chunk in chunks:
+            await asyncio.sleep(self.latency / len(chunks))
+            yield AIMessageChunk(content=chunk)
+
+
+def _sentence(key: str) -> dict:
+    return {
+        "sentence": f"Every student should **{key}** carefully before the exam begins tomorrow morning.",
+        "translation": "每个学生都应该在明天早上考试开始前仔细……",
+        "words_list": [key],
+        "occur_list": [key]
+    }
+
+
+def sentence_responder(messages) -> str:
+    """根据 make_sentence / make_sentences 的提示词生成能通过校验的例句"""
+    prompt = messages[-1].content
+    if "请为以下每组参数分别生成句子" in prompt:
+        keys = re.findall(r"^\d+\. 关键单词：(.+?)；", prompt, re.M)
+        return json.dumps({"items": [{"key": key, **_sentence(key)} for key in keys]}, ensure_ascii=False)
+    key = re.search(r"关键单词：(.+)", prompt).group(1).strip()
+    return json.dumps(_sentence(key), ensure_ascii=False)
@@ -0,0 +1,52 @@
+"""LLM 并发负载测试：同步调用 vs 异步调用
+
+在事件循环中并发发起N个 make_sentence 请求（与 FastAPI 的 async 路由相同的调用方式），
+同步版本会阻塞事件循环导致请求串行，异步版本的请求会重叠执行（受上游并发上限约束）。
+
+用法: python benchmarks/load_test_llm.py [--requests 8] [--latency 0.5] [--limit 4]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm import LLM
+from llm_limits import set_upstream_limit
+from fake_chat import FakeChatModel
+
+
+async def run(llm: LLM, n: int, use_async: bool):
+    async def handler(i):
+        # 模拟一个 async 路由处理函数
+        if use_async:
+            await llm.amake_sentence(f"word{i}", [])
+        else:
+            llm.make_sentence(f"word{i}", [])
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(i) for i in range(n)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5, help="假模型单次调用延迟（秒）")
+    parser.add_argument("--limit", type=int, default=4, help="上游并发上限")
+    args = parser.parse_args()
+
+    llm = LLM(api_key="offline")
+    llm.llm = FakeChatModel(latency=args.latency)
+    set_upstream_limit(llm.base_url, args.limit)
+
+    sync_time = asyncio.run(run(llm, args.requests, use_async=False))
+    async_time = asyncio.run(run(llm, args.requests, use_async=True))
+    print(f"{args.requests} 个并发请求，单次延迟 {args.latency}s，并发上限 {args.limit}")
+    print(f"同步调用: {sync_time:.2f}s（请求串行）")
+    print(f"异步调用: {async_time:.2f}s（请求重叠）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""例句校验的重试率：严格校验 vs 按词形索引在本地修复
+
+读取记录下来的模型原始输出（main.py 中设置 SENTENCE_OUTPUT_LOG 后生成的 JSONL，
+每行 {"key", "pool", "content"}），统计两种校验方式下需要重新生成的比例。
+没有记录文件时使用内置的几条示例输出（覆盖常见的失败情形），仅用于演示。
+
+用法: python benchmarks/sentence_retry_report.py [--corpus sentence_outputs.jsonl] [--index inflections.json]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inflection import InflectionIndex, load_inflection_index
+from llm_json import LLMOutputError, extract_json
+from sentence_check import check_sentence
+
+SAMPLES = [
+    # 单词池中的单词被变形，occur_list 仍写原形
+    {"key": "abandon", "pool": ["study", "carry"], "content": json.dumps({
+        "sentence": "They **abandoned** the plan after **studying** the map and **carrying** the boxes home.",
+        "translation": "……", "words_list": ["abandon", "study", "carry"], "occur_list": ["abandoned", "study", "carry"]})},
+    # 句首大写与 occur_list 不一致
+    {"key": "ancient", "pool": ["ruin"], "content": json.dumps({
+        "sentence": "**Ancient** **ruins** stand quietly on the hill above the village.",
+        "translation": "……", "words_list": ["ancient", "ruin"], "occur_list": ["ancient", "ruins"]})},
+    # words_list 中写的是变形而不是原形
+    {"key": "run", "pool": ["fast"], "content": json.dumps({
+        "sentence": "He **ran** **faster** than anyone else in the school.",
+        "translation": "……", "words_list": ["ran", "fast"], "occur_list": ["ran", "faster"]})},
+    # 正常输出
+    {"key": "bright", "pool": ["future"], "content": json.dumps({
+        "sentence": "She has a **bright** **future** ahead of her.",
+        "translation": "……", "words_list": ["bright", "future"], "occur_list": ["bright", "future"]})},
+    # 句子里确实没有关键单词：无法修复
+    {"key": "calm", "pool": ["sea"], "content": json.dumps({
+        "sentence": "The **sea** was quiet that night.",
+        "translation": "……", "words_list": ["calm", "sea"], "occur_list": ["calm", "sea"]})},
+]
+
+
+def passes(record, index) -> bool:
+    try:
+        check_sentence(extract_json(record["content"]), record["key"], record.get("pool", []), index)
+        return True
+    except LLMOutputError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default="sentence_outputs.jsonl", help="记录的模型输出")
+    parser.add_argument("--index", default="inflections.json", help="词形索引（不存在时按规则生成）")
+    args = parser.parse_args()
+
+    if os.path.exists(args.corpus):
+        with open(args.corpus, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        print(f"记录文件 {args.corpus}: {len(records)} 条输出")
+    else:
+        records = SAMPLES
+        print(f"没有找到 {args.corpus}，使用内置的 {len(records)} 条示例输出（仅演示，不代表真实重试率）")
+    index = load_inflection_index(args.index) if os.path.exists(args.index) else InflectionIndex()
+
+    strict_failed = [r for r in records if not passes(r, None)]
+    repaired_failed = [r for r in records if not passes(r, index)]
+    total = len(records) or 1
+    print(f"严格校验: {len(strict_failed)} 条需要重新生成（{len(strict_failed) / total:.1%}）")
+    print(f"本地修复后: {len(repaired_failed)} 条需要重新生成（{len(repaired_failed) / total:.1%}）")
+    for record in repaired_failed[:5]:
+        print(f"  仍失败: {record['key']}: {record['content'][:120]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""故事提示词长度：全部段落原文 vs 最近N段原文 + 滚动摘要
+
+用本地假模型连续续写一个长故事，记录每次续写时提示词的估计token数和摘要调用次数。
+
+用法: python benchmarks/story_context_demo.py [--segments 20] [--keep 3]
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from story_creator import StoryCreator
+from story_context import estimate_tokens
+from fake_chat import FakeChatModel
+
+SEGMENT = " ".join(["The travellers crossed the frozen river while the lanterns flickered in the wind."] * 10)
+SUMMARY = " ".join(["Earlier the travellers left the village and crossed the river."] * 6)
+
+
+def story_responder(messages) -> str:
+    return SUMMARY if messages[0].content == "你是一个专业的故事编辑" else SEGMENT
+
+
+async def run(segments: int, keep: int):
+    creator = StoryCreator(api_key="offline", context_segments=keep)
+    creator.llm = FakeChatModel(latency=0, responder=story_responder)
+    creator.history["background"] = "A small village at the edge of a northern forest."
+    sizes = []
+    for _ in range(segments):
+        await creator.wait_for_summary()  # 加入段落后摘要在后台更新
+        sizes.append(sum(estimate_tokens(m.content) for m in creator._continue_messages(["river"], False)))
+        creator.append(await creator.acontinue_story(["river"]))
+    return sizes, creator.llm.calls - segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segments", type=int, default=20)
+    parser.add_argument("--keep", type=int, default=3, help="保留原文的最近段落数")
+    args = parser.parse_args()
+
+    full, _ = asyncio.run(run(args.segments, keep=args.segments))
+    bounded, summaries = asyncio.run(run(args.segments, keep=args.keep))
+    print(f"续写 {args.segments} 段，每段约 {estimate_tokens(SEGMENT)} tokens")
+    print(f"全部原文: 第1段 {full[0]} -> 第{args.segments}段 {full[-1]} tokens，合计 {sum(full)}")
+    print(f"最近{args.keep}段 + 摘要: 第1段 {bounded[0]} -> 第{args.segments}段 {bounded[-1]} tokens，"
+          f"合计 {sum(bounded)}，摘要调用 {summaries} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import argparse
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from llm_json import LLMOutputError
+from llm_limits import RateLimiter
+from word_store import atomic_write_text
+
+
+class Enricher:
+    """一个由LLM生成的单词字段：如何判断缺失、如何生成"""
+
+    def __init__(self,
+                 field: str,
+                 generate: Callable[[object, Dict], Awaitable[object]],
+                 is_missing: Optional[Callable[[Dict], bool]] = None):
+        self.field = field
+        self.generate = generate  # (llm, 单词记录) -> 字段值
+        self.is_missing = is_missing or (lambda word: not word.get(field))
+
+
+async def _root_explanation(llm, word: Dict) -> str:
+    return await llm.aexplain_root(word["word"])
+
+
+def synonyms_enricher(llm) -> Enricher:
+    """近义词字段（与 SynonymService 保存在记录中的格式相同，模型或提示词变化后视为缺失）"""
+    version = llm.synonym_version()
+
+    async def generate(llm, word: Dict) -> Dict:
+        items = await llm.aget_synonyms(word["word"])
+        if not items:
+            raise LLMOutputError("没有生成近义词")
+        return {"version": version, "items": items}
+
+    def is_missing(word: Dict) -> bool:
+        stored = word.get("synonyms")
+        return not (isinstance(stored, dict) and stored.get("version") == version)
+
+    return Enricher("synonyms", generate, is_missing)
+
+
+def default_enrichers(llm, fields: List[str]) -> List[Enricher]:
+    available = {
+        "root_explanation": lambda: Enricher("root_explanation", _root_explanation),
+        "synonyms": lambda: synonyms_enricher(llm),
+    }
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ValueError(f"不支持的字段: {unknown}，可选 {list(available)}")
+    return [available[field]() for field in fields]
+
+
+class EnrichmentCheckpoint:
+    """补全进度检查点
+
+    生成结果本身写入单词库（记录中有了该字段即视为完成），检查点只记录累计完成数和
+    每个单词的失败次数，重启后跳过失败过多的单词。
+    """
+
+    def __init__(self, path: str = "enrichment_checkpoint.json"):
+        self.path = path
+        self.completed = 0
+        self.failures: Dict[str, int] = {}  # "字段:单词ID" -> 失败次数
+        self.dirty = False  # 有尚未保存的变化
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                self.completed = data.get("completed", 0)
+                self.failures = data.get("failures", {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def record_failure(self, key: str):
+        self.failures[key] = self.failures.get(key, 0) + 1
+        self.dirty = True
+
+    def save(self):
+        atomic_write_text(self.path, json.dumps({
+            "completed": self.completed,
+            "failures": self.failures,
+            "updated_at": time.time()
+        }, ensure_ascii=False))
+        self.dirty = False
+
+
+class EnrichmentWorker:
+    """后台补全单词记录中缺失的LLM生成字段
+
+    固定数量的协程并发生成（另受LLM上游并发上限约束），请求发起速率受 RateLimiter 限制；
+    结果攒够 batch_size 条后通过 WordLibrary.update_words 批量写入，并保存检查点。
+    """
+
+    def __init__(self,
+                 llm,
+                 word_lib,
+                 enrichers: List[Enricher],
+                 concurrency: int = 2,
+                 rate: float = 1.0,
+                 checkpoint_path: str = "enrichment_checkpoint.json",
+                 batch_size: int = 20,
+                 max_failures: int = 3):
+        self.llm = llm
+        self.word_lib = word_lib
+        self.enrichers = enrichers
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(rate)
+        self.checkpoint = EnrichmentCheckpoint(checkpoint_path)
+        self.batch_size = batch_size
+        self.max_failures = max_failures
+        self._buffer: Dict[str, Dict[str, object]] = {}  # 尚未写入单词库的结果
+        self._stopping = False
+
+        # 统计信息（本次运行）
+        self.generated = 0
+        self.failed = 0
+        self.remaining = 0
+
+    def pending(self) -> List[Tuple[str, Enricher]]:
+        """需要补全的 (单词ID, 字段)，跳过失败次数过多的"""
+        jobs = []
+        for word in self.word_lib.all_words:
+            for enricher in self.enrichers:
+                key = f"{enricher.field}:{word['id']}"
+                if enricher.is_missing(word) and self.checkpoint.failures.get(key, 0) < self.max_failures:
+                    jobs.append((word["id"], enricher))
+        return jobs
+
+    async def run(self, limit: Optional[int] = None):
+        """补全全部（或前limit个）缺失字段，完成或被 stop() 后返回"""
+        jobs = self.pending()
+        if limit is not None:
+            jobs = jobs[:limit]
+        self.remaining = len(jobs)
+        queue: asyncio.Queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self.flush()
+
+    def stop(self):
+        """正在进行的请求完成后停止"""
+        self._stopping = True
+
+    async def _worker(self, queue: asyncio.Queue):
+        while not self._stopping:
+            try:
+                word_id, enricher = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            word = self.word_lib.get_word(word_id)
+            if word is None or not enricher.is_missing(word):
+                self.remaining -= 1
+                continue
+            await self.rate_limiter.acquire()
+            try:
+                value = await enricher.generate(self.llm, word)
+            except Exception as e:
+                self.checkpoint.record_failure(f"{enricher.field}:{word_id}")
+                self.failed += 1
+                print(f"警告: 为单词 {word.get('word')} 生成 {enricher.field} 失败: {e}")
+            else:
+                self._buffer.setdefault(word_id, {})[enricher.field] = value
+                self.generated += 1
+                if len(self._buffer) >= self.batch_size:
+                    self.flush()
+            self.remaining -= 1
+
+    def flush(self):
+        """把已生成的结果批量写入单词库，并保存检查点（没有新结果或新失败时不写文件）"""
+        if self._buffer:
+            buffer, self._buffer = self._buffer, {}
+            self.word_lib.update_words(buffer)
+            self.checkpoint.completed += sum(len(fields) for fields in buffer.values())
+            self.checkpoint.dirty = True
+        if self.checkpoint.dirty:
+            self.checkpoint.save()
+
+    def stats(self) -> Dict:
+        return {
+            "generated": self.generated,
+            "failed": self.failed,
+            "remaining": self.remaining,
+            "completed_total": self.checkpoint.completed
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为单词库中缺少LLM生成字段的单词补全内容")
+    parser.add_argument("--library", default="word_library.json", help="单词库文件")
+    parser.add_argument("--fields", nargs="+", default=["root_explanation"], help="要补全的字段")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=2.0, help="每秒最多发起的请求数")
+    parser.add_argument("--limit", type=int, default=None, help="本次最多补全多少个字段")
+    parser.add_argument("--checkpoint", default="enrichment_checkpoint.json")
+    parser.add_argument("--api-key", default=None)
+    args = parser.parse_args()
+
+    from llm import LLM
+    from llm_limits import set_upstream_limit
+    from word_library import WordLibrary
+
+    api_key = args.api_key or str(input("Please enter your infini_ai API_KEY: "))
+    llm = LLM(api_key=api_key)
+    set_upstream_limit(llm.base_url, args.concurrency)
+    word_lib = WordLibrary(args.library)
+    worker = EnrichmentWorker(llm, word_lib, default_enrichers(llm, args.fields),
+                              concurrency=args.concurrency, rate=args.rate, checkpoint_path=args.checkpoint)
+    print(f"需要补全 {len(worker.pending())} 个字段")
+    try:
+        asyncio.run(worker.run(args.limit))
+    except KeyboardInterrupt:
+        pass  # 已生成的结果在 run() 退出时写入
+    finally:
+        word_lib.close()
+    print(worker.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+from word_library import WordType
+
+# 所有用户的填空练习缓存统计（所有 FillBlankBuffer 实例共享，会话被移出内存后仍然保留）
+BUFFER_COUNTERS: Dict[str, int] = {"hits": 0, "misses": 0, "invalidated": 0}
+
+
+class FillBlankBuffer:
+    """某个用户预先生成好的填空练习
+
+    后台按当前的智能复习选择生成练习（已通过 LLM 输出校验），页面请求时直接取出一个并触发补充。
+    每个练习记录生成时各单词的版本（学习元数据和是否仍在已学习队列中），取出时版本有变化
+    （例如单词在学习页面被复习过，或被重新加入学习队列）就丢弃该练习。
+    缓存中的练习使用互不重叠的单词，做完一个不会让其余的失效。
+    """
+
+    def __init__(self, llm, review_manager, pool_size: int = 10, capacity: int = 2):
+        self.llm = llm
+        self.review_manager = review_manager
+        self.pool_size = pool_size
+        self.capacity = capacity
+        self._ready: Deque[Tuple[List[WordType], Dict, Dict[str, tuple]]] = deque()  # (复习池, 练习, 单词版本)
+        self._task: Optional[asyncio.Task] = None
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def __len__(self) -> int:
+        return len(self._ready)
+
+    def version(self, word_id: str) -> tuple:
+        """单词当前的版本，变化后包含该单词的练习失效"""
+        word = self.review_manager.word_lib.get_word(word_id)
+        if word is None:
+            return (None,)
+        lm = self.review_manager._get_metadata(word_id) or {}
+        return (word["word"], word_id in self.review_manager.old_queue,
+                lm.get("review_count"), lm.get("last_reviewed"), lm.get("strength"))
+
+    def _fresh(self, versions: Dict[str, tuple]) -> bool:
+        return all(self.version(word_id) == version for word_id, version in versions.items())
+
+    def pop(self) -> Optional[Tuple[List[WordType], Dict]]:
+        """取出一个仍然有效的练习，返回 (复习池, 练习)；没有时返回None"""
+        while self._ready:
+            review_pool, exercise, versions = self._ready.popleft()
+            if self._fresh(versions):
+                self._count("hits")
+                return review_pool, exercise
+            self._count("invalidated")
+        self._count("misses")
+        return None
+
+    def _count(self, name: str):
+        setattr(self, name, getattr(self, name) + 1)
+        BUFFER_COUNTERS[name] += 1
+
+    def refill(self):
+        """在后台补充练习（不在事件循环中或已在补充时跳过）"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if (self._task is None or self._task.done()) and len(self._ready) < self.capacity:
+            self._task = asyncio.create_task(self._refill())
+
+    async def _refill(self):
+        while len(self._ready) < self.capacity:
+            # 已失效的练习不再占用单词
+            self._ready = deque(entry for entry in self._ready if self._fresh(entry[2]))
+            reserved: Set[str] = {word_id for entry in self._ready for word_id in entry[2]}
+            candidates = self.review_manager.select_smart_review_words(self.pool_size + len(reserved))
+            review_pool = [w for w in candidates if w["id"] not in reserved][:self.pool_size]
+            if not review_pool or (reserved and len(review_pool) < self.pool_size):
+                return  # 可用的单词不够，等已缓存的练习被取出后再生成
+            versions = {w["id"]: self.version(w["id"]) for w in review_pool}
+            try:
+                exercise = await self.llm.agenerate_fill_in_blank_exercise([w["word"] for w in review_pool])
+            except Exception as e:
+                print(f"警告: 预生成填空练习失败: {e}")
+                return
+            self._ready.append((review_pool, exercise, versions))
+
+    def busy(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def close(self):
+        """取消正在进行的补充"""
+        if self._task is not None:
+            self._task.cancel()
+        self._ready.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "ready": len(self._ready),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidated": self.invalidated
+        }
+
+
+def buffer_stats(buffers: Iterable[FillBlankBuffer]) -> Dict:
+    """所有用户的填空练习缓存统计：ready 为内存中各会话已生成的练习数之和"""
+    lookups = BUFFER_COUNTERS["hits"] + BUFFER_COUNTERS["misses"]
+    return {
+        "ready": sum(len(buffer) for buffer in buffers),
+        **BUFFER_COUNTERS,
+        "hit_rate": BUFFER_COUNTERS["hits"] / lookups if lookups else 0.0
+    }
@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import re
+import time
+from typing import Dict, Iterable, Optional, Set
+from word_store import atomic_write_text
+
+_VOWELS = set("aeiou")
+_TRANSLATION_SEP = re.compile(r"[,，;；、/\s]+")
+INDEX_VERSION = 2  # 生成规则变化时递增，旧版本的索引文件会被重新生成
+
+# 常见不规则变化：原形 -> 变化形式
+_IRREGULAR_TABLE = """
+arise arose arisen; awake awoke awoken; be am is are was were been being; bear bore borne born;
+beat beat beaten; become became; begin began begun; bend bent; bet bet; bind bound; bite bit bitten;
+bleed bled; blow blew blown; break broke broken; breed bred; bring brought; build built; burn burnt;
+burst burst; buy bought; catch caught; choose chose chosen; cling clung; come came; cost cost;
+creep crept; cut cut; deal dealt; dig dug; do does did done doing; draw drew drawn; dream dreamt;
+drink drank drunk; drive drove driven; eat ate eaten; fall fell fallen; feed fed; feel felt; fight fought;
+find found; flee fled; fly flew flown flies; forbid forbade forbidden; forget forgot forgotten;
+forgive forgave forgiven; freeze froze frozen; get got gotten; give gave given; go goes went gone;
+grind ground; grow grew grown; hang hung; have has had having; hear heard; hide hid hidden; hit hit;
+hold held; hurt hurt; keep kept; kneel knelt; know knew known; lay laid; lead led; lean leant;
+leap leapt; learn learnt; leave left; lend lent; let let; lie lay lain lying; light lit; lose lost;
+make made; mean meant; meet met; mislead misled; mistake mistook mistaken; overcome overcame;
+pay paid; prove proven; put put; quit quit; read read; ride rode ridden; ring rang rung; rise rose risen;
+run ran; say said; see saw seen; seek sought; sell sold; send sent; set set; sew sewn; shake shook shaken;
+shed shed; shine shone; shoot shot; show shown; shrink shrank shrunk; shut shut; sing sang sung;
+sink sank sunk; sit sat; sleep slept; slide slid; speak spoke spoken; speed sped; spend spent;
+spill spilt; spin spun; spit spat; split split; spread spread; spring sprang sprung; stand stood;
+steal stole stolen; stick stuck; sting stung; stink stank stunk; strike struck stricken; strive strove striven;
+swear swore sworn; sweep swept; swell swollen; swim swam swum; swing swung; take took taken;
+teach taught; tear tore torn; tell told; think thought; throw threw thrown; thrust thrust;
+tread trod trodden; understand understood; undertake undertook undertaken; upset upset; wake woke woken;
+wear wore worn; weave wove woven; weep wept; win won; wind wound; withdraw withdrew withdrawn;
+write wrote written; good better best; well better best; bad worse worst; badly worse worst;
+far farther further farthest furthest; little less least; many more most; much more most;
+man men; woman women; child children; person people; mouse mice; foot feet; tooth teeth; goose geese;
+ox oxen; analysis analyses; basis bases; crisis crises; thesis theses; hypothesis hypotheses;
+phenomenon phenomena; criterion criteria; datum data; medium media; bacterium bacteria;
+curriculum curricula; life lives; knife knives; wife wives; leaf leaves; half halves; wolf wolves;
+shelf shelves; thief thieves; calf calves; loaf loaves; self selves
+"""
+
+IRREGULAR: Dict[str, Set[str]] = {}
+for _entry in _IRREGULAR_TABLE.replace("\n", " ").split(";"):
+    _words = _entry.split()
+    if _words:
+        IRREGULAR.setdefault(_words[0], set()).update(_words[1:])
+
+
+def _consonant_vowel_consonant(word: str) -> bool:
+    return (len(word) >= 3 and word[-1] not in _VOWELS and word[-1] not in "wxy"
+            and word[-2] in _VOWELS and word[-3] not in _VOWELS)
+
+
+def is_adjective(word: Dict) -> bool:
+    """按释义粗略判断单词是否可作形容词（释义中有以"的"结尾的义项，或标注了 adj.）"""
+    translation = str(word.get("translation") or "")
+    if "adj" in translation.lower():
+        return True
+    return any(part.endswith("的") for part in _TRANSLATION_SEP.split(translation))
+
+
+def inflect(lemma: str, comparative: bool = False) -> Set[str]:
+    """按英语构词规则生成单词的变化形式（复数/三单、过去式、现在分词），包括原形，全部小写
+
+    comparative 为 True（形容词）时再生成 -er/-est 比较级和最高级；否则只有不规则表中的比较级，
+    避免把 teacher、farmer 这类派生词当成 teach、farm 的变形。
+    规则无法判断重音，会同时生成双写和不双写辅音的形式（如 visitted），这类形式不是真实单词，
+    在句子中不会出现。词组只变化第一个单词（give up -> gave up）。
+    """
+    word = lemma.strip().lower()
+    if " " in word:
+        head, rest = word.split(" ", 1)
+        return {word} | {f"{form} {rest}" for form in inflect(head, comparative)}
+    forms = {word}
+    if len(word) < 2 or not word.isalpha():
+        return forms
+    forms |= IRREGULAR.get(word, set())
+
+    # 复数 / 第三人称单数
+    if word.endswith(("s", "x", "z", "ch", "sh")):
+        forms.add(word + "es")
+    elif word.endswith("o"):
+        forms |= {word + "s", word + "es"}
+    elif word.endswith("y") and word[-2] not in _VOWELS:
+        forms.add(word[:-1] + "ies")
+    elif word.endswith("f"):
+        forms |= {word + "s", word[:-1] + "ves"}
+    elif word.endswith("fe"):
+        forms |= {word + "s", word[:-2] + "ves"}
+    else:
+        forms.add(word + "s")
+
+    # 过去式 / 过去分词、现在分词、比较级和最高级（两个字母的单词不去掉结尾的e，否则 be -> bed、best）
+    if len(word) <= 2:
+        stems = [word]
+        forms.add(word + "ing")
+    elif word.endswith("ie"):
+        stems = [word[:-1]]
+        forms.add(word[:-2] + "ying")
+    elif word.endswith(("ee", "ye", "oe")):
+        stems = [word[:-1]]
+        forms.add(word + "ing")
+    elif word.endswith("e"):
+        stems = [word[:-1]]
+        forms.add(word[:-1] + "ing")
+    elif word.endswith("y") and word[-2] not in _VOWELS:
+        stems = [word[:-1] + "i"]
+        forms.add(word + "ing")
+    elif word.endswith("c"):
+        stems = [word, word + "k"]
+        forms |= {word + "ing", word + "king"}
+    elif _consonant_vowel_consonant(word):
+        stems = [word, word + word[-1]]
+        forms |= {word + "ing", word + word[-1] + "ing"}
+    else:
+        stems = [word]
+        forms.add(word + "ing")
+    for stem in stems:
+        forms.add(stem + "ed")
+        if comparative:
+            forms |= {stem + "er", stem + "est"}
+    return forms
+
+
+class InflectionIndex:
+    """单词原形 -> 变化形式的索引（以及反向索引）
+
+    由 from_words() 离线为单词库中的全部单词生成并保存，启动时 load() 读入；
+    索引中没有的单词（例如之后新导入的）在第一次查询时按规则生成，可以作形容词的单词
+    （adjectives，或通过 add_word() 加入的）才生成比较级。
+    """
+
+    def __init__(self, forms: Optional[Dict[str, Iterable[str]]] = None, adjectives: Iterable[str] = ()):
+        self._forms: Dict[str, Set[str]] = {}
+        self._lemmas: Dict[str, Set[str]] = {}  # 变化形式 -> 原形
+        self.adjectives: Set[str] = set(adjectives)
+        for lemma, lemma_forms in (forms or {}).items():
+            self._add(lemma, set(lemma_forms))
+
+    def __len__(self) -> int:
+        return len(self._forms)
+
+    def _add(self, lemma: str, forms: Set[str]):
+        forms.add(lemma)
+        self._forms[lemma] = forms
+        for form in forms:
+            self._lemmas.setdefault(form, set()).add(lemma)
+
+    def forms_of(self, lemma: str) -> Set[str]:
+        """单词的全部形式（小写，包括原形）"""
+        key = lemma.strip().lower()
+        if key not in self._forms:
+            self._add(key, inflect(key, comparative=key in self.adjectives))
+        return self._forms[key]
+
+    def add_word(self, word: Dict) -> Set[str]:
+        """把单词库中的单词加入索引（按释义判断是否生成比较级），返回它的全部形式"""
+        key = str(word["word"]).strip().lower()
+        if key not in self._forms and is_adjective(word):
+            self.adjectives.add(key)
+        return self.forms_of(key)
+
+    def lemmas_of(self, form: str) -> Set[str]:
+        """某个形式可能对应的原形（只包括索引中已有的单词）"""
+        return self._lemmas.get(form.strip().lower(), set())
+
+    def is_form_of(self, form: str, lemma: str) -> bool:
+        return form.strip().lower() in self.forms_of(lemma)
+
+    @classmethod
+    def build(cls, lemmas: Iterable[str], adjectives: Iterable[str] = ()) -> "InflectionIndex":
+        index = cls(adjectives=adjectives)
+        for lemma in lemmas:
+            if lemma and lemma.strip():
+                index.forms_of(lemma)
+        return index
+
+    @classmethod
+    def from_words(cls, words: Iterable[Dict]) -> "InflectionIndex":
+        """为单词库中的单词生成索引"""
+        index = cls()
+        for word in words:
+            if str(word.get("word") or "").strip():
+                index.add_word(word)
+        return index
+
+    def save(self, path: str):
+        atomic_write_text(path, json.dumps({
+            "version": INDEX_VERSION,
+            "built_at": time.time(),
+            "adjectives": sorted(self.adjectives),
+            "forms": {lemma: sorted(forms) for lemma, forms in self._forms.items()}
+        }, ensure_ascii=False))
+
+    @classmethod
+    def load(cls, path: str) -> "InflectionIndex":
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"索引版本 {data.get('version')} 已过期（当前为 {INDEX_VERSION}）")
+        return cls(data["forms"], data.get("adjectives", ()))
+
+
+def load_inflection_index(path: str, word_lib=None) -> InflectionIndex:
+    """启动时读入离线生成的索引；文件不存在或损坏时按单词库在内存中生成"""
+    try:
+        return InflectionIndex.load(path)
+    except FileNotFoundError:
+        pass
+    except (json.JSONDecodeError, KeyError, ValueError) as e:
+        print(f"警告: 词形索引 {path} 无法读取: {e}")
+    print(f"词形索引 {path} 不可用，按单词库在内存中生成（可运行 python inflection.py 预先生成）")
+    return InflectionIndex.from_words(word_lib.all_words) if word_lib is not None else InflectionIndex()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为单词库中的全部单词生成词形变化索引")
+    parser.add_argument("--library", default="word_library.json", help="单词库文件（.json 或 .wlib）")
+    parser.add_argument("--out", default="inflections.json", help="输出的索引文件")
+    args = parser.parse_args()
+
+    from word_library import WordLibrary
+    start = time.perf_counter()
+    word_lib = WordLibrary(args.library)
+    try:
+        index = InflectionIndex.from_words(word_lib.all_words)
+    finally:
+        word_lib.close()
+    index.save(args.out)
+    print(f"{len(index)} 个单词，索引大小 {os.path.getsize(args.out) / 1024:.0f}KB，"
+          f"耗时 {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
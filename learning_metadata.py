@@ -0,0 +1,163 @@
+import json
+import os
+import shutil
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+from word_store import WordJournal, atomic_write_text
+
+
+class LibraryMetadata:
+    """学习元数据保存在单词库记录的 learning_metadata 字段中（单用户模式，原有行为）"""
+
+    def __init__(self, word_lib):
+        self.word_lib = word_lib
+
+    def get(self, word_id: str) -> Optional[Dict]:
+        word = self.word_lib.get_word(word_id)
+        return None if word is None else word.get("learning_metadata")
+
+    def update(self, word_id: str, changes: Dict[str, object]) -> Dict:
+        """合并更新学习元数据，返回更新后的元数据"""
+        return self.word_lib.update_metadata(word_id, changes)["learning_metadata"]
+
+    def update_many(self, changes: Dict[str, Dict[str, object]]):
+        """一次写入多个单词的元数据变化（单词库日志中的一条记录）"""
+        self.word_lib.update_metadata_many(changes)
+
+    def batch(self):
+        return nullcontext()
+
+    def close(self):
+        """单词库由调用方统一关闭"""
+
+
+class UserMetadataStore:
+    """单个用户的学习元数据（单词ID -> learning_metadata），与共享的单词库分开保存
+
+    文件为 {单词ID: 元数据} 的JSON快照；日常修改只追加到变更日志（"meta" 操作），
+    日志达到一定长度或关闭时再写回快照。
+    """
+
+    def __init__(self, file_path: str, compact_threshold: int = 200):
+        self.file_path = file_path
+        self.journal = WordJournal(f"{file_path}.journal")
+        self.compact_threshold = compact_threshold
+        self._data: Dict[str, Dict] = self._load()
+        if self._replay_journal():
+            self.compact()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                if not isinstance(data, dict):
+                    print(f"警告: 学习元数据文件 {self.file_path} 格式不正确，重置为空。")
+                    return {}
+                return data
+        except FileNotFoundError:
+            return {}
+
+    def _replay_journal(self) -> bool:
+        """重放变更日志，返回是否需要立即压缩"""
+        replayed = 0
+        for op in self.journal.replay():
+            if op.get("op") == "meta":
+                self._merge(op["id"], op.get("fields", {}))
+            elif op.get("op") == "meta_many":
+                for word_id, fields in op.get("items", {}).items():
+                    self._merge(word_id, fields)
+            replayed += 1
+        self.journal.entries = replayed
+        return self.journal.has_rotated() or replayed >= self.compact_threshold
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, word_id: str) -> Optional[Dict]:
+        return self._data.get(word_id)
+
+    def items(self):
+        return self._data.items()
+
+    def _merge(self, word_id: str, changes: Dict[str, object]) -> Dict:
+        lm = dict(self._data.get(word_id) or {})
+        lm.update(changes)
+        self._data[word_id] = lm
+        return lm
+
+    def update(self, word_id: str, changes: Dict[str, object]) -> Dict:
+        """合并更新学习元数据（只把变化的字段追加到日志），返回更新后的元数据"""
+        lm = self._merge(word_id, changes)
+        self.journal.append({"op": "meta", "id": word_id, "fields": changes})
+        self._maybe_compact()
+        return lm
+
+    def update_many(self, changes: Dict[str, Dict[str, object]]):
+        """一次写入多个单词的元数据变化（作为一条日志记录写入并落盘）"""
+        if not changes:
+            return
+        # 先落盘再修改内存，写入失败时内存中的元数据保持不变
+        self.journal.append({"op": "meta_many", "items": changes}, sync=True)
+        for word_id, fields in changes.items():
+            self._merge(word_id, fields)
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self.journal.entries >= self.compact_threshold:
+            self.compact()
+
+    def batch(self):
+        return nullcontext()
+
+    def compact(self):
+        """把全部元数据写回快照文件，并清空已合并的日志"""
+        atomic_write_text(self.file_path, json.dumps(self._data, ensure_ascii=False))
+        self.journal.rotate()
+        self.journal.discard_rotated()
+
+    def close(self):
+        if self.journal.entries:
+            self.compact()
+        self.journal.close()
+
+
+class JsonLearningState:
+    """学习状态（已学习队列和统计信息）保存在JSON文件中"""
+
+    def __init__(self, save_path: str):
+        self.save_path = save_path
+
+    def load(self) -> List[str]:
+        """加载已学习队列"""
+        try:
+            with open(self.save_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                if isinstance(data, dict) and 'old_queue' in data:
+                    return data.get('old_queue', [])
+                # 兼容旧版本格式
+                if isinstance(data, list):
+                    return data
+                return []
+        except FileNotFoundError:
+            return []
+
+    def save(self, old_queue: List[str], stats: Dict):
+        """原子写入（写临时文件、fsync 后再替换），崩溃时不会留下写了一半的文件"""
+        atomic_write_text(self.save_path, json.dumps({
+            "old_queue": old_queue,
+            "stats": stats
+        }, ensure_ascii=False, indent=2))
+
+
+def seed_user_from_library(word_lib, state_path: str, user_dir: str) -> int:
+    """把单用户模式的学习进度（单词库中的 learning_metadata 和学习状态文件）复制到用户目录，返回元数据条数
+
+    开启多用户后，第一个会话用它接手原有的学习进度；单词库中的数据保持不变。
+    """
+    metadata = {word["id"]: word["learning_metadata"] for word in word_lib.all_words
+                if word.get("learning_metadata")}
+    os.makedirs(user_dir, exist_ok=True)
+    atomic_write_text(os.path.join(user_dir, "learning_metadata.json"), json.dumps(metadata, ensure_ascii=False))
+    if os.path.exists(state_path):
+        shutil.copyfile(state_path, os.path.join(user_dir, "learning_state.json"))
+    return len(metadata)
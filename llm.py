@@ -1,9 +1,15 @@
+import hashlib
 import json
-import re
 import math
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
+from llm_limits import upstream_semaphore
+from llm_json import LLMOutputError, extract_json, require_keys, partial_string_field
+from retry_policy import RetryPolicy, LLMRetryError
+from single_flight import SingleFlight
+from inflection import InflectionIndex
+from sentence_check import check_sentence
 
 class LLM:
 
@@ -11,16 +17,167 @@ class LLM:
                  api_key: str,
                  base_url: str = "https://cloud.infini-ai.com/maas/v1",
                  model: str = "deepseek-v3",
-                 temperature: float = 0):
+                 temperature: float = 0,
+                 retry_policy: Optional[RetryPolicy] = None):
         self.llm = ChatOpenAI(
             api_key=api_key,
             base_url=base_url,
             model=model,
             temperature=temperature
         )
+        self.base_url = base_url
+        self.model = model
+        self.retry_policy = retry_policy or RetryPolicy()  # 所有方法共用的重试策略
+        self.single_flight = SingleFlight()  # 合并提示词相同的并发调用
+        self.inflections = InflectionIndex()  # 词形索引，启动时替换为离线生成的索引
+        self.output_log: Optional[str] = None  # 记录例句的原始输出（JSONL），为None时不记录
+
+    async def _ainvoke(self, messages):
+        """异步调用模型，受同一上游服务的并发上限约束"""
+        async with upstream_semaphore(self.base_url):
+            return await self.llm.ainvoke(messages)
+
+    async def _astream(self, messages):
+        """异步流式调用模型，逐段产出生成的文本"""
+        async with upstream_semaphore(self.base_url):
+            async for chunk in self.llm.astream(messages):
+                if chunk.content:
+                    yield chunk.content
+
+    def _call(self, name: str, messages, parse):
+        """同步调用模型并解析结果，解析失败时按重试策略重新生成"""
+        return self.retry_policy.run(name, lambda: parse(self.llm.invoke(messages).content))
+
+    async def _acall(self, name: str, messages, parse, on_partial=None, partial_fields=()):
+        """_call 的异步版本
+
+        传入 on_partial 时改为流式调用：每收到新内容就把 partial_fields 中
+        已生成的部分交给 on_partial，生成完毕后再完整解析校验。
+        提示词相同的并发调用只请求一次上游（包括重试），所有调用者共享结果。
+        """
+        async def call(publish):
+            async def attempt():
+                if publish is None:
+                    response = await self._ainvoke(messages)
+                    return parse(response.content)
+                content = ""
+                last_fields = None
+                async for delta in self._astream(messages):
+                    content += delta
+                    fields = {}
+                    for field in partial_fields:
+                        value = partial_string_field(content, field)
+                        if value:
+                            fields[field] = value
+                    if fields and fields != last_fields:
+                        last_fields = fields
+                        await publish(fields)
+                return parse(content)
+            return await self.retry_policy.arun(name, attempt)
+        return await self.single_flight.run(name, self.prompt_key(messages), call, on_partial)
+
+    @staticmethod
+    def prompt_key(messages) -> str:
+        """归一化后的提示词摘要（忽略空白差异），用于合并相同的并发调用"""
+        normalized = "\n".join(f"{m.type}:{' '.join(str(m.content).split())}" for m in messages)
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
 
     def make_sentence(self, key: str, pool: List[str]) -> Dict:
-        min_count = math.ceil(len(pool) / 2)
+        messages = self._sentence_messages(key, pool)
+        return self._call("make_sentence", messages, lambda content: self._parse_sentence(content, key, pool))
+
+    async def amake_sentence(self, key: str, pool: List[str], on_partial=None) -> Dict:
+        """make_sentence 的异步版本
+
+        on_partial: 可选的异步回调，流式生成过程中会收到 {"sentence": ..., "translation": ...} 的部分内容
+        """
+        messages = self._sentence_messages(key, pool)
+        return await self._acall("make_sentence", messages, lambda content: self._parse_sentence(content, key, pool),
+                                 on_partial=on_partial, partial_fields=("sentence", "translation"))
+
+    def make_sentences(self, items: List[Tuple[str, List[str]]]) -> List[Optional[Dict]]:
+        """在一次请求中为多个关键单词（各自的单词池）生成例句
+
+        每个例句单独校验，只重新请求校验失败的部分。返回与 items 一一对应的结果，
+        重试次数用尽后仍失败的为None（调用方可以再单独生成）。
+        """
+        results: List[Optional[Dict]] = [None] * len(items)
+
+        def attempt():
+            pending = [i for i, result in enumerate(results) if result is None]
+            response = self.llm.invoke(self._sentences_messages([items[i] for i in pending]))
+            self._merge_sentences(response.content, items, pending, results)
+        try:
+            self.retry_policy.run("make_sentences", attempt)
+        except LLMRetryError as e:
+            print(f"警告: {results.count(None)} 个例句批量生成失败: {e}")
+        return results
+
+    async def amake_sentences(self, items: List[Tuple[str, List[str]]], on_result=None) -> List[Optional[Dict]]:
+        """make_sentences 的异步版本
+
+        on_result: 可选的回调 on_result(序号, 例句)，每个例句校验通过时立即调用（不必等整批和重试结束）
+        """
+        results: List[Optional[Dict]] = [None] * len(items)
+
+        async def attempt():
+            pending = [i for i, result in enumerate(results) if result is None]
+            response = await self._ainvoke(self._sentences_messages([items[i] for i in pending]))
+            self._merge_sentences(response.content, items, pending, results, on_result)
+        try:
+            await self.retry_policy.arun("make_sentences", attempt)
+        except LLMRetryError as e:
+            print(f"警告: {results.count(None)} 个例句批量生成失败: {e}")
+        return results
+
+    def _sentences_messages(self, items: List[Tuple[str, List[str]]]) -> List:
+        """批量生成的提示词：规则与示例只出现一次，每个关键单词附带自己的单词池"""
+        tasks = "\n".join(
+            f"{n}. 关键单词：{key}；单词池：{pool}；至少使用单词池中{math.ceil(len(pool) / 2)}个单词"
+            for n, (key, pool) in enumerate(items, 1))
+        prompt = f"""{self._sentence_rules("（见每组参数）", "（见每组参数）")}
+请为以下每组参数分别生成句子：
+{tasks}
+
+输出格式为JSON对象，只有一个字段 "items"：按上面的顺序排列的结果列表，每个结果是上面格式的JSON对象，
+并额外包含字段 "key"（该组的关键单词）。
+"""
+        return [SystemMessage(content="你是一个专业的英语老师"), HumanMessage(content=prompt)]
+
+    def _merge_sentences(self, content: str, items: List[Tuple[str, List[str]]], pending: List[int],
+                         results: List[Optional[Dict]], on_result=None):
+        """把批量结果中校验通过的例句填入 results，仍有缺失时抛出 LLMOutputError（只重新请求缺失的部分）"""
+        generated = require_keys(extract_json(content), ["items"])["items"]
+        if not isinstance(generated, list):
+            raise LLMOutputError("items 不是列表")
+        by_key = {item.get("key"): item for item in generated if isinstance(item, dict)}
+        for position, i in enumerate(pending):
+            key = items[i][0]
+            item = by_key.get(key)
+            if item is None and position < len(generated):
+                item = generated[position]  # 没有标注 key 时按顺序对应
+            self._record_output(key, items[i][1], json.dumps(item, ensure_ascii=False))
+            try:
+                results[i] = self._check_sentence(item, key, items[i][1])
+            except LLMOutputError as e:
+                print(f"例句 {key} 校验失败: {e}")
+                continue
+            if on_result is not None:
+                on_result(i, results[i])
+        failed = [items[i][0] for i in pending if results[i] is None]
+        if failed:
+            raise LLMOutputError(f"{len(failed)} 个例句校验失败: {failed}")
+
+    def _sentence_messages(self, key: str, pool: List[str]) -> List:
+        prompt = f"""{self._sentence_rules(f'"{key}"', math.ceil(len(pool) / 2))}
+请为以下参数生成句子：
+关键单词：{key}
+单词池：{pool}
+"""
+        return [SystemMessage(content="你是一个专业的英语老师"), HumanMessage(content=prompt)]
+
+    def _sentence_rules(self, key, min_count) -> str:
+        """例句的生成要求和示例（单个与批量生成共用）"""
         example = {
             "sentence": "They **deserted** the **dessert** in the **desert**.",
             "translation": "他们把甜品遗弃在沙漠里了。",
@@ -28,9 +185,9 @@ class LLM:
             "occur_list": ["deserted", "dessert", "desert"]
         }
         
-        prompt = f"""
+        return f"""
 你是一个英语教学助手，需要根据给定的关键单词和单词池生成例句。要求如下：
-1. 生成一个至少25个单词的英文句子，必须包含关键单词"{key}"（需用**加粗），并且是句子的核心
+1. 生成一个至少25个单词的英文句子，必须包含关键单词{key}（需用**加粗），并且是句子的核心
 2. 句子中必须包含单词池中至少{min_count}个单词（也需用**加粗，不能替换近义词）
 3. 允许重复使用单词（建议展示不同词义），但关键单词每次出现都必须加粗
 4. 使用的单词允许语法变形（复数、三单、过去式等），如果变形，就用**将变形后的完整单词包裹起来（例如 **playing** 正确，**play**ing 错误）
@@ -42,67 +199,23 @@ class LLM:
 
 示例输出：
 {json.dumps(example, ensure_ascii=False)}
-
-请为以下参数生成句子：
-关键单词：{key}
-单词池：{pool}
 """
 
-        while True:
-            response = self.llm.invoke([SystemMessage(content="你是一个专业的英语老师"), HumanMessage(content=prompt)])
-
-            # 增强JSON提取逻辑
-            content = response.content
-            print(content)
-            start_index = content.find('{')
-            end_index = content.rfind('}')
-            if start_index == -1 or end_index == -1 or end_index <= start_index:
-                raise ValueError("未检测到有效的JSON结构")
-            json_str = content[start_index:end_index+1]
-            json_str = json_str.replace('\\n', '').replace('\\t', '').strip()
-            result = json.loads(json_str)
-            if not all(key in result for key in ["sentence", "translation", "words_list", "occur_list"]):
-                continue
-            if key not in result.get("words_list", []):
-                continue
-            sentence = result["sentence"]
-            occur_list = result["occur_list"]
-            sentence = sentence.replace('*', '')
-
-            # 用于记录当前查找位置
-            current_index = 0
-            # 存储最终结果的分段列表
-            parts = []
-            # 记录上次处理结束位置
-            last_end = 0
-            ok = 1
-
-            for word in occur_list:
-                # 创建带单词边界的正则模式
-                pattern = re.compile(r'\b' + re.escape(word) + r'\b')
-                match = pattern.search(sentence, current_index)
-                
-                if not match:
-                    ok = 0
-                    break
-                
-                start, end = match.start(), match.end()
-                
-                # 添加非加粗部分
-                parts.append(sentence[last_end:start])
-                # 添加加粗单词
-                parts.append(f"**{sentence[start:end]}**")
-                
-                # 更新位置指针
-                last_end = end
-                current_index = end
-            if not ok:
-                continue
-            # 添加剩余部分
-            parts.append(sentence[last_end:])
-            sentence = ''.join(parts)
-            result["sentence"] = sentence
-            return result
+    def _parse_sentence(self, content: str, key: str, pool: List[str]) -> Dict:
+        """解析并校验例句结果，校验不通过时抛出 LLMOutputError（需要重新生成）"""
+        print(content)
+        self._record_output(key, pool, content)
+        return self._check_sentence(extract_json(content), key, pool)
+
+    def _check_sentence(self, result: object, key: str, pool: List[str]) -> Dict:
+        """校验单个例句并把句中出现的单词加粗（能按词形索引在本地修复的不再重新生成）"""
+        return check_sentence(result, key, pool, self.inflections)
+
+    def _record_output(self, key: str, pool: List[str], content: str):
+        """把模型的原始输出追加到 output_log（JSONL），用于离线统计校验失败率"""
+        if self.output_log:
+            with open(self.output_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"key": key, "pool": pool, "content": content}, ensure_ascii=False) + "\n")
 
     def generate_fill_in_blank_exercise(self, word_list: List[str]) -> Dict:
         """
@@ -110,6 +223,15 @@ class LLM:
         :param word_list: 单词列表（原形）
         :return: 包含sentence, translation, answer_list, word_list的字典
         """
+        messages = self._fill_blank_messages(word_list)
+        return self._call("generate_fill_in_blank_exercise", messages, self._parse_fill_blank)
+
+    async def agenerate_fill_in_blank_exercise(self, word_list: List[str]) -> Dict:
+        """generate_fill_in_blank_exercise 的异步版本"""
+        messages = self._fill_blank_messages(word_list)
+        return await self._acall("generate_fill_in_blank_exercise", messages, self._parse_fill_blank)
+
+    def _fill_blank_messages(self, word_list: List[str]) -> List:
         # 构建带示例的prompt
         word_list_str = json.dumps(word_list)
         prompt = f"""
@@ -137,75 +259,96 @@ class LLM:
 鼓励所填单词语法变形!
 """
      
-        messages = [
+        return [
             SystemMessage(content="你是一个英语教学助手，擅长根据单词列表生成上下文合理的填空练习题。"),
             HumanMessage(content=prompt)
         ]
+
+    def _parse_fill_blank(self, content: str) -> Dict:
+        """解析填空练习结果，格式不正确时抛出 LLMOutputError"""
+        result = extract_json(content)
+        print(result)
         
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                # 调用LLM生成响应
-                response = self.llm.invoke(messages)
-                content = response.content
-                
-                # 提取JSON部分（处理可能的markdown包装）
-                start_idx = content.find('{')
-                end_idx = content.rfind('}')
-                if start_idx == -1 or end_idx == -1:
-                    raise ValueError("未检测到JSON边界")
-                    
-                json_str = content[start_idx:end_idx+1]
-                # 处理常见转义问题
-                json_str = re.sub(r'\\"', '"', json_str)
-                json_str = re.sub(r'\\n', ' ', json_str)
-                
-                # 解析JSON
-                result = json.loads(json_str)
-                print(result)
-                
-                # 验证关键字段存在
-                required_keys = {"sentence", "translation", "answer_list", "word_list"}
-                if not all(key in result for key in required_keys):
-                    raise KeyError("缺少必要字段")
-                
-                sentence = result["sentence"]
-                answer_list = result["answer_list"]
-                parts = sentence.split("____")
-                new_parts = [parts[0]]  # 第一个部分（____之前的内容）保持不变
-
-                # 遍历每个答案和对应的后续部分
-                for i, ans in enumerate(answer_list):
-                    if i + 1 >= len(parts):  # 防止索引越界
-                        break
-                    s = parts[i + 1]  # 当前____后面的字符串
-                    k = min(len(ans), len(s))  # 最大可能匹配长度
-                    
-                    # 从长到短检查所有可能的后缀匹配
-                    for n in range(k, 0, -1):
-                        if ans.endswith(s[:n]):  # 检查后缀匹配
-                            s = s[n:]  # 删除匹配的后缀部分
-                            break
-                    
-                    new_parts.append(s)  # 添加处理后的部分
-
-                # 重新组合句子（用____连接各部分）
-                new_sentence = "____".join(new_parts)
-
-                return {
-                    "sentence": new_sentence,
-                    "translation": result["translation"],
-                    "answer_list": result["answer_list"],
-                    "word_list": result["word_list"]
-                }
-                
-            except (json.JSONDecodeError, ValueError, KeyError) as e:
-                print(f"解析失败（尝试 {attempt+1}/{max_retries}）: {str(e)}")
-                if attempt == max_retries - 1:
-                    raise RuntimeError("生成失败，请重试") from e
-        return {}
+        # 验证关键字段存在
+        result = require_keys(result, ["sentence", "translation", "answer_list", "word_list"])
+        
+        sentence = result["sentence"]
+        answer_list = result["answer_list"]
+        parts = sentence.split("____")
+        new_parts = [parts[0]]  # 第一个部分（____之前的内容）保持不变
+
+        # 遍历每个答案和对应的后续部分
+        for i, ans in enumerate(answer_list):
+            if i + 1 >= len(parts):  # 防止索引越界
+                break
+            s = parts[i + 1]  # 当前____后面的字符串
+            k = min(len(ans), len(s))  # 最大可能匹配长度
+            
+            # 从长到短检查所有可能的后缀匹配
+            for n in range(k, 0, -1):
+                if ans.endswith(s[:n]):  # 检查后缀匹配
+                    s = s[n:]  # 删除匹配的后缀部分
+                    break
+            
+            new_parts.append(s)  # 添加处理后的部分
+
+        # 重新组合句子（用____连接各部分）
+        new_sentence = "____".join(new_parts)
+
+        return {
+            "sentence": new_sentence,
+            "translation": result["translation"],
+            "answer_list": result["answer_list"],
+            "word_list": result["word_list"]
+        }
     
+    def explain_root(self, word: str) -> str:
+        """生成单词的构成解析与记忆技巧（即单词库中的 root_explanation 字段）"""
+        return self._call("explain_root", self._root_messages(word), self._parse_root)
+
+    async def aexplain_root(self, word: str) -> str:
+        """explain_root 的异步版本"""
+        return await self._acall("explain_root", self._root_messages(word), self._parse_root)
+
+    def _root_messages(self, word: str) -> List:
+        prompt = f"""
+请解析英语单词"{word}"的构成，帮助中文母语的学习者记忆。要求如下：
+1. 开头一行用**加粗单词，例如：**{word}** 的构成解析与记忆技巧：
+2. 按编号逐条列出词根、前缀、后缀（用**加粗），每条说明来源、含义和记忆技巧
+3. 如果单词不能拆分（例如很短的基础词），说明词源并给出联想记忆方法
+4. 最后用一两句话总结如何记住整个单词
+5. 使用Markdown格式，全文不超过300字，不要输出JSON或其他额外说明
+"""
+        return [SystemMessage(content="你是一个专业的英语老师，擅长词根词缀记忆法"), HumanMessage(content=prompt)]
+
+    def _parse_root(self, content: str) -> str:
+        """校验构成解析结果，内容为空时抛出 LLMOutputError"""
+        content = content.strip()
+        if not content:
+            raise LLMOutputError("构成解析结果为空")
+        return content
+
     def get_synonyms(self, word):
+        messages = self._synonym_messages(word)
+        try:
+            return self._call("get_synonyms", messages, self._parse_synonyms)
+        except LLMRetryError:
+            return {}  # 最终返回空字典
+
+    async def aget_synonyms(self, word):
+        """get_synonyms 的异步版本"""
+        messages = self._synonym_messages(word)
+        try:
+            return await self._acall("get_synonyms", messages, self._parse_synonyms)
+        except LLMRetryError:
+            return {}
+
+    def synonym_version(self) -> str:
+        """近义词结果的版本号（由模型名和提示词决定），提示词或模型变化后旧缓存自动失效"""
+        prompt = "".join(message.content for message in self._synonym_messages("{word}"))
+        return hashlib.sha1(f"{self.model}\n{prompt}".encode("utf-8")).hexdigest()[:12]
+
+    def _synonym_messages(self, word) -> List:
         # 构建带示例的prompt
         prompt = f"""
 你是一个英语语言专家，需要为单词"{word}"提供近义词辨析。请严格按以下要求返回JSON格式结果：
@@ -229,35 +372,16 @@ class LLM:
 
 现在请为单词"{word}"生成近义词辨析（注意，不是越多越好）：
 """
-        
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                # 调用语言模型
-                response = self.llm.invoke([
-                    SystemMessage(content="你是一个英语词典编辑专家，擅长精确区分近义词的细微差别。"),
-                    HumanMessage(content=prompt)
-                ])
-                
-                # 提取JSON部分
-                content = response.content
-                start_idx = content.find('{')
-                end_idx = content.rfind('}')
-                
-                if start_idx == -1 or end_idx == -1:
-                    return {}  # 没有找到JSON结构
-                    
-                json_str = content[start_idx:end_idx+1]
-                # 处理常见格式问题
-                json_str = re.sub(r',\s*}', '}', json_str)  # 修复尾部逗号
-                json_str = re.sub(r',\s*]', ']', json_str)
-                
-                result = json.loads(json_str)
-                return result
-            
-            except (json.JSONDecodeError, TypeError) as e:
-                print(f"JSON解析失败（尝试 {attempt+1}/{max_retries}）: {str(e)}")
-                if attempt == max_retries - 1:
-                    return {}  # 最终返回空字典
-        
-        return {}  # 安全返回
+        return [
+            SystemMessage(content="你是一个英语词典编辑专家，擅长精确区分近义词的细微差别。"),
+            HumanMessage(content=prompt)
+        ]
+
+    def _parse_synonyms(self, content: str) -> Dict:
+        """解析近义词结果，没有JSON结构时返回空字典"""
+        if '{' not in content:
+            return {}  # 没有找到JSON结构
+        result = extract_json(content)
+        if not isinstance(result, dict):
+            raise LLMOutputError("近义词结果不是JSON对象")
+        return result
@@ -0,0 +1,93 @@
+import json
+import re
+from typing import Dict, Iterable, Optional
+
+
+class LLMOutputError(ValueError):
+    """模型输出不符合要求（无法解析或校验失败），可以重新生成"""
+
+
+# 依次尝试的修复规则：只有严格解析失败时才使用
+_REPAIRS = [
+    lambda s: re.sub(r',\s*([}\]])', r'\1', s),  # 修复尾部逗号
+    lambda s: s.replace('\\n', ' ').replace('\\t', ' '),  # 字符串外的转义换行
+    lambda s: re.sub(r'\\"', '"', s),  # 整段JSON被再次转义
+]
+
+
+def extract_json(content: str) -> object:
+    """从模型回复中提取JSON（兼容markdown代码块、前后多余文字及常见格式问题）"""
+    if content is None:
+        raise LLMOutputError("模型没有返回内容")
+    start_index = content.find('{')
+    end_index = content.rfind('}')
+    if start_index == -1 or end_index == -1 or end_index <= start_index:
+        raise LLMOutputError("未检测到有效的JSON结构")
+    json_str = content[start_index:end_index+1].strip()
+
+    candidates = [json_str]
+    repaired = json_str
+    for repair in _REPAIRS:
+        repaired = repair(repaired)
+        candidates.append(repaired)
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+
+    # 回复中可能有多个JSON片段，取第一个能完整解析的对象
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r'\{', content):
+        try:
+            result, _ = decoder.raw_decode(content, match.start())
+            return result
+        except json.JSONDecodeError:
+            continue
+    raise LLMOutputError("JSON解析失败")
+
+
+def require_keys(result: object, keys: Iterable[str]) -> Dict:
+    """校验结果是包含所有必要字段的字典"""
+    if not isinstance(result, dict):
+        raise LLMOutputError(f"期望JSON对象，却得到{type(result).__name__}")
+    missing = [key for key in keys if key not in result]
+    if missing:
+        raise LLMOutputError(f"缺少必要字段: {', '.join(missing)}")
+    return result
+
+
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', '\\': '\\', '/': '/'}
+
+
+def partial_string_field(buffer: str, key: str) -> Optional[str]:
+    """从尚未生成完的JSON文本中取出某个字符串字段目前已生成的部分（流式输出时使用）"""
+    match = re.search(r'"' + re.escape(key) + r'"\s*:\s*"', buffer)
+    if not match:
+        return None
+    chars = []
+    i = match.end()
+    while i < len(buffer):
+        c = buffer[i]
+        if c == '"':
+            break  # 字段已完整
+        if c == '\\':
+            if i + 1 >= len(buffer):
+                break  # 转义序列还没生成完
+            escape = buffer[i + 1]
+            if escape == 'u':
+                code = buffer[i + 2:i + 6]
+                if len(code) < 4:
+                    break
+                try:
+                    chars.append(chr(int(code, 16)))
+                except ValueError:
+                    pass
+                i += 6
+                continue
+            chars.append(_ESCAPES.get(escape, escape))
+            i += 2
+            continue
+        chars.append(c)
+        i += 1
+    return ''.join(chars)
@@ -0,0 +1,49 @@
+import asyncio
+import time
+import weakref
+from typing import Dict, Optional
+
+DEFAULT_CONCURRENCY = 4  # 每个上游服务默认允许的并发请求数
+
+_limits: Dict[str, int] = {}
+# 信号量绑定在事件循环上，按事件循环分别保存
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = \
+    weakref.WeakKeyDictionary()
+
+
+def set_upstream_limit(base_url: str, limit: int):
+    """设置某个上游服务（按 base_url 区分）的最大并发请求数"""
+    _limits[base_url] = limit
+    for semaphores in _semaphores.values():
+        semaphores.pop(base_url, None)
+
+
+def upstream_semaphore(base_url: str) -> asyncio.Semaphore:
+    """获取某个上游服务共享的并发信号量（LLM 与 StoryCreator 共用）"""
+    semaphores = _semaphores.setdefault(asyncio.get_running_loop(), {})
+    semaphore = semaphores.get(base_url)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(_limits.get(base_url, DEFAULT_CONCURRENCY))
+        semaphores[base_url] = semaphore
+    return semaphore
+
+
+class RateLimiter:
+    """限制请求发起的速率（每秒最多 rate 个，按固定间隔放行）"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self):
+        if self.interval == 0:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
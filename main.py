@@ -1,43 +1,223 @@
 from fastapi import FastAPI, Request, WebSocket, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from word_library import WordLibrary
 from review_manager import ReviewManager
+from learning_metadata import LibraryMetadata, UserMetadataStore, seed_user_from_library
+from sqlite_store import SqliteLearningDB
+from session_manager import SessionManager, UserSession, SESSION_COOKIE, new_session_id, valid_session_id
 from llm import LLM
 from story_creator import StoryCreator
+from llm_limits import set_upstream_limit
+from retry_policy import retry_stats
+from single_flight import coalesce_stats
+from sentence_cache import SentenceCache, SentencePrefetcher
+from exercise_buffer import FillBlankBuffer, buffer_stats
+from inflection import load_inflection_index
+from offline_exercises import ExampleIndex
+from sentence_check import map_used_words, check_stats
+from synonym_cache import SynonymCache, SynonymService
+from enrichment import EnrichmentWorker, default_enrichers
+import asyncio
 import random
 import datetime
 import json
+import os
+from typing import Dict, List
 
 app = FastAPI()
 templates = Jinja2Templates(directory="templates")
 
 # 初始化依赖
-word_library = WordLibrary()
-review_manager = ReviewManager(word_library)
+word_library = WordLibrary()  # 所有用户共用的单词库
 API_KEY = str(input("Please enter your infini_ai API_KEY: "))
 llm = LLM(api_key=API_KEY)
-story_creator = StoryCreator(api_key=API_KEY)
 
 POOL_SIZE = 10
 BLANK_SIZE = 5
+FILL_BLANK_BUFFER_SIZE = 2  # 每个用户预先生成好的填空练习数
 SYNONYM_SIZE = 1
+NEW_WORDS_PER_BATCH = 5  # 每轮学习的新单词数
+NEW_WORD_ORDER = "random"  # 新单词顺序："random"、"list"（单词库顺序）、"frequency"（词频排名）、"difficulty"
+STORY_CONTEXT_SEGMENTS = 3  # 故事提示词中保留原文的最近段落数，更早的段落以滚动摘要代替
+STORY_SPECULATIONS_PER_SESSION = 20  # 每个会话最多在后台预先续写多少段（未被使用的也计入）
+LLM_CONCURRENCY = 4  # 同时发往LLM服务的最大请求数
+
+# 多用户：每个浏览器（会话Cookie）拥有独立的学习队列、学习元数据和故事
+# 开启后，第一个新会话接手原有的单用户学习进度（之后记录在 users/.legacy_owner 中）；
+# 进度跟随会话Cookie，浏览器清除Cookie后会以新用户身份开始
+MULTI_USER = False  # False 时所有访问者共用一份学习状态（原有的单用户行为）
+SINGLE_USER_ID = "default"
+USER_DATA_DIR = "users"  # 每个用户的数据保存在 users/<会话ID>/ 下
+LEGACY_OWNER_FILE = os.path.join(USER_DATA_DIR, ".legacy_owner")
+MAX_ACTIVE_SESSIONS = 64
+SESSION_IDLE_TIMEOUT = 30 * 60  # 空闲多久后保存并移出内存（秒）
+LEARNING_BACKEND = "json"  # 学习进度的存储方式："json"（文件）或 "sqlite"（所有用户共用 learning.db）
+SQLITE_PATH = "learning.db"  # 从JSON迁移：python sqlite_store.py
+
+set_upstream_limit(llm.base_url, LLM_CONCURRENCY)
+
+# 词形索引：例句校验在本地找回变形的单词，能修复的输出不再重新生成
+INFLECTION_INDEX_PATH = "inflections.json"  # 离线生成：python inflection.py
+SENTENCE_OUTPUT_LOG = None  # 设为文件路径时记录例句的原始输出，用 benchmarks/sentence_retry_report.py 统计重试率
+llm.inflections = load_inflection_index(INFLECTION_INDEX_PATH, word_library)
+llm.output_log = SENTENCE_OUTPUT_LOG
+
+# 离线练习：用单词库中已有的例句生成填空练习和学习页面的例句
+OFFLINE_MODE = False  # True 时学习页面和填空练习都不调用LLM
+LLM_LATENCY_BUDGET = 10.0  # 实时生成超过这个时间（秒）或失败时，改用单词库中的例句
+example_index = ExampleIndex(word_library, llm.inflections)
+
+# 例句缓存：今日学习队列确定后在后台预生成例句
+sentence_cache = SentenceCache()
+SENTENCE_CACHE_FLUSH_INTERVAL = 30  # 例句缓存有修改时，每隔多久写入一次文件（秒）
+
+learning_db = None
+if LEARNING_BACKEND == "sqlite":
+    learning_db = SqliteLearningDB(SQLITE_PATH)
+
+def claim_legacy_state(user_id: str):
+    """开启多用户后的第一个新用户接手单用户模式的学习进度（只发生一次）"""
+    if os.path.exists(LEGACY_OWNER_FILE):
+        return
+    if learning_db is not None:
+        if learning_db.has_user(user_id):
+            return
+        learning_db.copy_user(SINGLE_USER_ID, user_id)
+    else:
+        user_dir = os.path.join(USER_DATA_DIR, user_id)
+        if os.path.exists(user_dir):
+            return
+        count = seed_user_from_library(word_library, "learning_state.json", user_dir)
+        print(f"用户 {user_id} 接手了单用户模式的学习进度（{count} 条学习元数据）")
+    os.makedirs(USER_DATA_DIR, exist_ok=True)
+    with open(LEGACY_OWNER_FILE, 'w', encoding='utf-8') as f:
+        f.write(user_id)
+
+def load_session(user_id: str) -> UserSession:
+    """从磁盘加载用户的学习状态"""
+    namespace = "" if user_id == SINGLE_USER_ID else user_id
+    options = {"new_words_per_batch": NEW_WORDS_PER_BATCH, "new_word_order": NEW_WORD_ORDER}
+    if user_id != SINGLE_USER_ID:
+        claim_legacy_state(user_id)
+    if learning_db is not None:
+        store = learning_db.for_user(user_id)
+        review_manager = ReviewManager(word_library, metadata=store, state=store, **options)
+    elif user_id == SINGLE_USER_ID:
+        review_manager = ReviewManager(word_library, "learning_state.json",
+                                       metadata=LibraryMetadata(word_library), **options)
+    else:
+        user_dir = os.path.join(USER_DATA_DIR, user_id)
+        os.makedirs(user_dir, exist_ok=True)
+        metadata = UserMetadataStore(os.path.join(user_dir, "learning_metadata.json"))
+        review_manager = ReviewManager(word_library, os.path.join(user_dir, "learning_state.json"),
+                                       metadata=metadata, **options)
+    session = UserSession(
+        user_id,
+        review_manager,
+        StoryCreator(api_key=API_KEY, context_segments=STORY_CONTEXT_SEGMENTS,
+                     max_speculations=STORY_SPECULATIONS_PER_SESSION),
+        SentencePrefetcher(llm, review_manager, sentence_cache, POOL_SIZE, namespace=namespace),
+        FillBlankBuffer(llm, review_manager, BLANK_SIZE, FILL_BLANK_BUFFER_SIZE)
+    )
+    if not OFFLINE_MODE:
+        session.fill_blank_buffer.refill()  # 第一次打开填空练习时就有生成好的练习
+    return session
+
+sessions = SessionManager(load_session, MAX_ACTIVE_SESSIONS, SESSION_IDLE_TIMEOUT)
+
+# 近义词缓存（按模型和提示词版本失效）
+synonym_cache = SynonymCache(llm.synonym_version())
+synonym_service = SynonymService(llm, synonym_cache, word_library)
 
 print("Initialization finished.")
+
+# 后台补全新导入单词缺少的 root_explanation（占用较少的LLM并发，避免影响页面请求）
+# 开启后会持续消耗LLM调用额度（大批导入后尤其多），默认关闭；也可以手动运行 python enrichment.py
+ENRICH_IN_BACKGROUND = False
+ENRICH_FIELDS = ["root_explanation"]
+ENRICH_INTERVAL = 10 * 60  # 每轮补全结束后，隔多久再检查一次新单词（秒）
+enrichment_worker = EnrichmentWorker(llm, word_library, default_enrichers(llm, ENRICH_FIELDS),
+                                     concurrency=1, rate=0.5)
+enrichment_task = None
+cache_flush_task = None
+
+async def run_enrichment():
+    while True:
+        await enrichment_worker.run()
+        await asyncio.sleep(ENRICH_INTERVAL)
+
+async def flush_sentence_cache():
+    while True:
+        await asyncio.sleep(SENTENCE_CACHE_FLUSH_INTERVAL)
+        await sentence_cache.flush()
+
+@app.on_event("startup")
+async def startup():
+    global enrichment_task, cache_flush_task
+    if ENRICH_IN_BACKGROUND:
+        enrichment_task = asyncio.create_task(run_enrichment())
+    cache_flush_task = asyncio.create_task(flush_sentence_cache())
+
+@app.on_event("shutdown")
+async def shutdown():
+    """退出前保存所有用户的学习状态，并等待单词库后台压缩完成"""
+    if enrichment_task is not None:
+        # 取消后台补全，已生成的结果在 run() 退出时写入单词库
+        enrichment_worker.stop()
+        enrichment_task.cancel()
+        await asyncio.gather(enrichment_task, return_exceptions=True)
+    if cache_flush_task is not None:
+        cache_flush_task.cancel()
+        await asyncio.gather(cache_flush_task, return_exceptions=True)
+    sessions.close_all()
+    if learning_db is not None:
+        learning_db.close()
+    word_library.close()
+    sentence_cache.save()
+    synonym_cache.save()
+
+@app.middleware("http")
+async def attach_session(request: Request, call_next):
+    """为没有会话Cookie的浏览器分配会话ID"""
+    session_id = request.cookies.get(SESSION_COOKIE)
+    is_new = not valid_session_id(session_id)
+    if is_new:
+        session_id = new_session_id()
+    request.state.session_id = session_id
+    # 请求处理期间（包括等待LLM）会话不会被移出内存
+    with sessions.hold(session_key(session_id)):
+        response = await call_next(request)
+    if is_new:
+        response.set_cookie(SESSION_COOKIE, session_id, max_age=365 * 24 * 3600, httponly=True, samesite="lax")
+    return response
+
+def session_key(session_id: str) -> str:
+    return session_id if MULTI_USER else SINGLE_USER_ID
+
+def get_session(session_id: str) -> UserSession:
+    """获取当前用户的学习状态"""
+    return sessions.get(session_key(session_id))
+
 # 路由定义
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
-    """主菜单页面"""
+    """主菜单页面（同时加载用户的学习状态，开始预生成填空练习）"""
+    get_session(request.state.session_id)
     return templates.TemplateResponse("menu.html", {"request": request})
 
 @app.get("/learn_next_word", response_class=HTMLResponse)
 async def learn_next_word(request: Request):
     """学习下一个单词（重定向到合并后的学习页面）"""
+    session = get_session(request.state.session_id)
+    review_manager = session.review_manager
     if not review_manager.current_queue:
         new_words = review_manager.init_current_queue()
         if not new_words:
             message = "没有更多新单词可学习！"
             return templates.TemplateResponse("message.html", {"request": request, "message": message})
+        if not OFFLINE_MODE:
+            session.prefetcher.schedule(review_manager.current_queue)
         message = f"准备学习 {len(new_words)} 个新单词..."
     else:
         message = f"继续学习未完成的 {len(review_manager.current_queue)} 个单词..."
@@ -49,7 +229,7 @@ async def learn_next_word(request: Request):
 async def learn_word(request: Request, word_id: str):
     """合并后的单词学习页面，支持显示/隐藏释义"""
     try:
-        word = review_manager._get_word_by_id(word_id)
+        word = get_session(request.state.session_id).review_manager._get_word_by_id(word_id)
     except ValueError:
         message = f"单词ID {word_id} 不存在！"
         return templates.TemplateResponse("message.html", {"request": request, "message": message})
@@ -64,34 +244,62 @@ async def get_sentence_data(websocket: WebSocket, word_id: str):
     """通过WebSocket推送sentence_data"""
     await websocket.accept()
     try:
-        word = review_manager._get_word_by_id(word_id)
-        review_pool = review_manager.select_smart_review_words(POOL_SIZE)
-        pool_words = [w["word"] for w in review_pool]
-        sentence_data = llm.make_sentence(word["word"], pool_words)
-        
-        # 获取LLM实际采用的单词ID列表
-        used_words = []
-        for origin, occur in zip(sentence_data['words_list'], sentence_data['occur_list']):
-            match = next((d for d in review_pool if d.get('word') == origin), None)
-            if match:
-                used_words.append((match['id'], occur))
-
-        # 准备复习池数据，传递给前端
-        review_pool_json = json.dumps([{"id": id, "occur": occur} for id, occur in used_words])
-
-        data_package = {
-            "review_pool": review_pool_json,
-            "sentence_data": sentence_data
-        }
-        await websocket.send_text(json.dumps(data_package))
+        # WebSocket 不经过HTTP中间件，直接读取学习页面设置的会话Cookie
+        session_id = websocket.cookies.get(SESSION_COOKIE)
+        if MULTI_USER and not valid_session_id(session_id):
+            raise ValueError("会话已失效，请刷新页面")
+        with sessions.hold(session_key(session_id)):
+            await send_sentence_data(websocket, get_session(session_id), word_id)
     except Exception as e:
-        await websocket.send_text(json.dumps({"error": str(e)}))
+        await websocket.send_text(json.dumps({"type": "error", "error": str(e)}))
     finally:
         await websocket.close()
 
+async def send_sentence_data(websocket: WebSocket, session: UserSession, word_id: str):
+    """推送学习页面的例句（预生成、实时生成或单词库中的例句）"""
+    review_manager = session.review_manager
+    # 优先使用预生成的例句，未命中时实时生成；等待预生成和实时生成各有自己的时间预算，
+    # 超时或失败时改用单词库中的例句
+    try:
+        await asyncio.wait_for(session.prefetcher.wait_for(word_id), LLM_LATENCY_BUDGET)
+    except asyncio.TimeoutError:
+        pass
+    cached = sentence_cache.get(session.prefetcher.key(word_id), review_manager.learned_words)
+    if cached is not None:
+        review_pool = cached["review_pool"]
+        sentence_data = cached["sentence_data"]
+    elif OFFLINE_MODE:
+        review_pool, sentence_data = offline_sentence(review_manager, word_id)
+    else:
+        async def send_partial(fields):
+            # 先推送已生成的句子和翻译片段，校验通过后再推送最终结果
+            await websocket.send_text(json.dumps({"type": "partial", **fields}))
+
+        try:
+            review_pool, sentence_data = await asyncio.wait_for(
+                session.prefetcher.generate_live(word_id, on_partial=send_partial), LLM_LATENCY_BUDGET)
+        except Exception as e:
+            print(f"警告: 实时生成例句失败或超时（{e!r}），改用单词库中的例句")
+            review_pool, sentence_data = offline_sentence(review_manager, word_id)
+    
+    # 获取LLM实际采用的单词ID列表（按词形索引对应变形的单词）
+    used_words = map_used_words(sentence_data, review_pool, llm.inflections)
+
+    # 准备复习池数据，传递给前端
+    review_pool_json = json.dumps([{"id": id, "occur": occur} for id, occur in used_words])
+
+    data_package = {
+        "type": "final",
+        "review_pool": review_pool_json,
+        "sentence_data": sentence_data
+    }
+    await websocket.send_text(json.dumps(data_package))
+
 @app.post("/process_learning_choice/{word_id}", response_class=HTMLResponse)
 async def process_learning_choice(request: Request, word_id: str):
     """合并处理掌握程度和单词选择的提交"""
+    session = get_session(request.state.session_id)
+    review_manager = session.review_manager
     form_data = await request.form()
     
     # print(form_data)
@@ -129,28 +337,33 @@ async def process_learning_choice(request: Request, word_id: str):
             "next_url": "/learn_next_word"
         })
     
-    # 处理掌握程度选择
-    if word_id in review_manager.current_queue:
-        review_manager.current_queue.remove(word_id)
-
-    if choice in {1, 2}:
-        review_manager.current_queue.append(word_id)
-        mastery_message = "这个单词会在稍后的学习中再次出现。"
-    elif choice == 3:
-        review_manager.process_word(word_id, "keep")
-        mastery_message = "太好了！这个单词已被标记为已学习。"
-    else:
-        mastery_message = "该单词将不会出现在今后的学习中。"
-    
-    # 处理单词选择（使用前端传递的复习池数据）
-    
-    # print(f"Now {selected_words}\n{unselected_words}")
-
-    all_remembered = len(selected_words) == 0
-    review_manager.process_word_selection(selected_words, unselected_words)
-    
-    # 保存学习状态
-    review_manager.save_learning_state()
+    # 本次提交的全部更新在内存中合并，最后一次性写入
+    with review_manager.unit_of_work():
+        # 处理掌握程度选择
+        review_manager.current_queue.discard(word_id)
+
+        # 例句已经展示过，下次出现时换一个新例句
+        sentence_cache.invalidate(session.prefetcher.key(word_id))
+        if choice in {1, 2}:
+            review_manager.current_queue.append(word_id)
+            if not OFFLINE_MODE:
+                session.prefetcher.schedule([word_id])
+            mastery_message = "这个单词会在稍后的学习中再次出现。"
+        elif choice == 3:
+            review_manager.process_word(word_id, "keep")
+            mastery_message = "太好了！这个单词已被标记为已学习。"
+        else:
+            mastery_message = "该单词将不会出现在今后的学习中。"
+
+        # 处理单词选择（使用前端传递的复习池数据）
+
+        # print(f"Now {selected_words}\n{unselected_words}")
+
+        all_remembered = len(selected_words) == 0
+        review_manager.process_word_selection(selected_words, unselected_words)
+
+        # 保存学习状态
+        review_manager.save_learning_state()
     
     # 准备消息
     if all_remembered:
@@ -170,7 +383,7 @@ async def process_learning_choice(request: Request, word_id: str):
 @app.get("/continue_learning", response_class=HTMLResponse)
 async def continue_learning(request: Request):
     """继续学习页面"""
-    if review_manager.current_queue:
+    if get_session(request.state.session_id).review_manager.current_queue:
         return templates.TemplateResponse("continue_learning.html", {"request": request})
     else:
         message = "已完成所有单词的学习！"
@@ -183,25 +396,55 @@ async def continue_learning(request: Request):
 @app.get("/fill_blank_exercise", response_class=HTMLResponse)
 async def fill_blank_exercise(request: Request):
     """生成英语单词填空练习页面"""
+    return await render_fill_blank_exercise(request, offline=OFFLINE_MODE)
+
+@app.get("/offline_exercise", response_class=HTMLResponse)
+async def offline_exercise(request: Request):
+    """只使用单词库中已有例句的填空练习（不调用LLM）"""
+    return await render_fill_blank_exercise(request, offline=True)
+
+async def render_fill_blank_exercise(request: Request, offline: bool):
+    session = get_session(request.state.session_id)
+    review_manager = session.review_manager
     try:
-        # 选择复习池单词
-        review_pool = review_manager.select_smart_review_words(BLANK_SIZE)
-        if not review_pool:
-            message = "没有更多单词可用于生成练习！"
-            return templates.TemplateResponse("message.html", {
-                "request": request,
-                "message": message,
-                "next_url": "/"
-            })
-            
-        pool_words = [w["word"] for w in review_pool]
-        
-        # 调用LLM生成填空练习
-        exercise = llm.generate_fill_in_blank_exercise(pool_words)
+        # 优先使用预先生成好的练习
+        ready = None if offline else session.fill_blank_buffer.pop()
+        if ready is not None:
+            review_pool, exercise = ready
+        else:
+            # 选择复习池单词
+            review_pool = review_manager.select_smart_review_words(BLANK_SIZE)
+            if offline and not review_pool:
+                review_pool = example_index.random_words(BLANK_SIZE)  # 还没有学过的单词时随机选取
+            if not review_pool:
+                message = "没有更多单词可用于生成练习！"
+                return templates.TemplateResponse("message.html", {
+                    "request": request,
+                    "message": message,
+                    "next_url": "/"
+                })
+
+            pool_words = [w["word"] for w in review_pool]
+
+            if offline:
+                exercise = offline_fill_blank(review_pool)
+            else:
+                # 调用LLM生成填空练习，超时或失败时改用单词库中的例句
+                try:
+                    exercise = await asyncio.wait_for(llm.agenerate_fill_in_blank_exercise(pool_words),
+                                                      LLM_LATENCY_BUDGET)
+                except Exception as e:
+                    print(f"警告: 生成填空练习失败或超时（{e!r}），改用单词库中的例句")
+                    exercise = offline_fill_blank(review_pool)
 
         word_list = exercise['word_list']
 
-        review_manager.process_word_selection([], [w['id'] for w in review_pool])
+        # 只记录练习中实际出现的单词（没有可用例句的单词不会出现在离线练习中）
+        with review_manager.unit_of_work():
+            review_manager.process_word_selection([], exercise_word_ids(review_pool, word_list))
+        # 按更新后的学习元数据补充下一个练习
+        if not offline:
+            session.fill_blank_buffer.refill()
 
         random.shuffle(word_list)
         
@@ -209,7 +452,8 @@ async def fill_blank_exercise(request: Request):
         context = {
             "request": request,
             "exercise": exercise,
-            "word_list": word_list
+            "word_list": word_list,
+            "next_url": "/offline_exercise" if offline else "/fill_blank_exercise"
         }
         
         return templates.TemplateResponse("fill_blank_exercise.html", context)
@@ -223,6 +467,41 @@ async def fill_blank_exercise(request: Request):
             "next_url": "/"
         })
     
+def exercise_word_ids(review_pool: List[Dict], word_list: List[str]) -> List[str]:
+    """复习池中出现在练习单词列表里的单词ID"""
+    in_exercise = {str(word).strip().lower() for word in word_list}
+    return [w['id'] for w in review_pool if str(w['word']).strip().lower() in in_exercise]
+
+def offline_fill_blank(review_pool: List[Dict]) -> Dict:
+    exercise = example_index.cloze(review_pool)
+    if exercise is None:
+        raise ValueError("这些单词在单词库中没有可用的例句")
+    return exercise
+
+def offline_sentence(review_manager, word_id: str):
+    """用单词库中已有的例句代替实时生成，返回 (复习池, 例句数据)"""
+    word = review_manager._get_word_by_id(word_id)
+    review_pool = review_manager.select_smart_review_words(POOL_SIZE)
+    sentence_data = example_index.sentence(word, review_pool)
+    if sentence_data is None:
+        raise ValueError(f"单词 {word['word']} 在单词库中没有可用的例句")
+    return review_pool, sentence_data
+
+# 运行指标
+@app.get("/api/metrics", response_class=JSONResponse)
+async def metrics():
+    """缓存命中率等运行指标"""
+    return {
+        "sentence_cache": sentence_cache.stats(),
+        "synonym_cache": synonym_cache.stats(),
+        "fill_blank_buffer": buffer_stats(session.fill_blank_buffer for session in sessions),
+        "sessions": sessions.stats(),
+        "enrichment": enrichment_worker.stats(),
+        "llm_retries": retry_stats(),
+        "llm_coalesced": coalesce_stats(),
+        "sentence_check": check_stats()
+    }
+
 # 近义词查询页面
 @app.get("/synonyms", response_class=HTMLResponse)
 async def synonyms_page(request: Request):
@@ -242,7 +521,7 @@ async def process_synonym_query(request: Request):
         })
     
     try:
-        result = llm.get_synonyms(word)
+        result = await synonym_service.lookup(word)
         return templates.TemplateResponse("synonyms.html", {
             "request": request,
             "word": word,
@@ -268,6 +547,7 @@ async def novelist_home(request: Request):
 @app.get("/novelist/background", response_class=HTMLResponse)
 async def background_page(request: Request):
     """故事背景生成页面"""
+    story_creator = get_session(request.state.session_id).story_creator
     story_creator.delete_story()
     return templates.TemplateResponse("novelist/background.html", {
         "request": request,
@@ -281,7 +561,8 @@ async def generate_background(request: Request):
     try:
         form_data = await request.json()
         framework = form_data.get("framework", "")
-        background = story_creator.generate_background(framework)
+        story_creator = get_session(request.state.session_id).story_creator
+        background = await story_creator.agenerate_background(framework)
         return {"success": True, "background": background}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -290,21 +571,26 @@ async def generate_background(request: Request):
 @app.get("/novelist/continue", response_class=HTMLResponse)
 async def continue_story_page(request: Request):
     """故事续写页面"""
+    session = get_session(request.state.session_id)
+    story_creator = session.story_creator
     background = story_creator.history["background"]
     if not background:
         return RedirectResponse("/novelist/background")
         
     segments = story_creator.history["story_segments"]
 
-    review_pool = review_manager.select_smart_review_words(POOL_SIZE)
-    if not review_pool:
-        message = "没有更多单词可用于生成练习！"
-        return templates.TemplateResponse("message.html", {
-            "request": request,
-            "message": message,
-            "next_url": "/"
-        })
-    pool_words = [w["word"] for w in review_pool]
+    # 沿用加入上一段时选好的单词池（预先续写用的就是它），刷新页面也不变
+    if not story_creator.next_pool:
+        review_pool = session.review_manager.select_smart_review_words(POOL_SIZE)
+        if not review_pool:
+            message = "没有更多单词可用于生成练习！"
+            return templates.TemplateResponse("message.html", {
+                "request": request,
+                "message": message,
+                "next_url": "/"
+            })
+        story_creator.next_pool = [w["word"] for w in review_pool]
+    pool_words = story_creator.next_pool
 
     return templates.TemplateResponse("novelist/continue.html", {
         "request": request,
@@ -319,7 +605,14 @@ async def ai_append(request: Request):
     try:
         form_data = await request.json()
         content = form_data.get("segment", "")
+        session = get_session(request.state.session_id)
+        story_creator = session.story_creator
         story_creator.append(content)
+        # 为下一段选好单词池，并在用户阅读时预先续写
+        story_creator.discard_speculation()
+        story_creator.next_pool = [w["word"] for w in session.review_manager.select_smart_review_words(POOL_SIZE)]
+        if story_creator.next_pool and not form_data.get("end"):
+            story_creator.speculate(story_creator.next_pool)
         return {"success": True, "segment": content}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -332,11 +625,40 @@ async def ai_continue_story(request: Request):
         form_data = await request.json()
         word_pool = form_data.get("word_pool", [])
         is_end = form_data.get("is_end", False)
-        segment = story_creator.continue_story(word_pool, is_end)
+        story_creator = get_session(request.state.session_id).story_creator
+        if form_data.get("stream"):
+            return StreamingResponse(
+                stream_continue_story(session_key(request.state.session_id), story_creator, word_pool, is_end),
+                media_type="application/x-ndjson")
+        segment = await story_creator.take_speculation(word_pool, is_end)
+        if segment is None:
+            segment = await story_creator.acontinue_story(word_pool, is_end)
         return {"success": True, "segment": segment}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+async def stream_continue_story(user_id, story_creator, word_pool, is_end):
+    """以NDJSON逐行推送续写内容：若干行 {"delta": ...}，最后一行与非流式接口的返回相同"""
+    with sessions.hold(user_id):  # 响应体在中间件返回后才推送，推送期间仍占用会话
+        async for line in _stream_continue_story(story_creator, word_pool, is_end):
+            yield line
+
+async def _stream_continue_story(story_creator, word_pool, is_end):
+    parts = []
+    try:
+        segment = await story_creator.take_speculation(word_pool, is_end)
+        if segment is not None:
+            # 预先续写的段落已经生成好（或正在生成），一次推送完
+            yield json.dumps({"delta": segment}, ensure_ascii=False) + "\n"
+            yield json.dumps({"success": True, "segment": segment}, ensure_ascii=False) + "\n"
+            return
+        async for delta in story_creator.astream_continue_story(word_pool, is_end):
+            parts.append(delta)
+            yield json.dumps({"delta": delta}, ensure_ascii=False) + "\n"
+        yield json.dumps({"success": True, "segment": "".join(parts).strip()}, ensure_ascii=False) + "\n"
+    except Exception as e:
+        yield json.dumps({"success": False, "error": str(e)}, ensure_ascii=False) + "\n"
+
 # 用户续写故事
 @app.post("/api/user_continue", response_class=JSONResponse)
 async def user_continue_story(request: Request):
@@ -344,7 +666,8 @@ async def user_continue_story(request: Request):
     try:
         form_data = await request.json()
         user_segment = form_data.get("segment", "")
-        result = story_creator.evaluate_and_improve(user_segment)
+        story_creator = get_session(request.state.session_id).story_creator
+        result = await story_creator.aevaluate_and_improve(user_segment)
         return {"success": True, "evaluation": result}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -353,7 +676,7 @@ async def user_continue_story(request: Request):
 @app.get("/novelist/full_story", response_class=HTMLResponse)
 async def full_story_page(request: Request):
     """显示完整故事页面"""
-    full_story = story_creator.get_full_story()
+    full_story = get_session(request.state.session_id).story_creator.get_full_story()
     return templates.TemplateResponse("novelist/full_story.html", {
         "request": request,
         "full_story": full_story
@@ -0,0 +1,164 @@
+import random
+import re
+from typing import Dict, List, Optional, Set, Tuple
+from word_library import WordType
+
+_CJK = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+_TOKEN = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+
+
+def split_example(example: Optional[str]) -> Optional[Tuple[str, str]]:
+    """把单词库中的 example（"英文例句 - 中文翻译"）拆成 (英文, 中文)，格式不符时返回None"""
+    if not example:
+        return None
+    english, sep, chinese = str(example).rpartition(" - ")
+    if not sep or not _CJK.search(chinese) or not _TOKEN.search(english):
+        return None
+    return _clean(english), _clean(chinese)
+
+
+def _clean(text: str) -> str:
+    # 练习页面把句子嵌在JS字符串中，去掉会破坏字符串的字符
+    return " ".join(text.replace('"', "'").replace("\\", " ").split())
+
+
+class ExampleIndex:
+    """单词库中已有例句的索引：每个单词出现在哪些单词的例句中（按词形索引识别变形）
+
+    在内存中由单词库一次性生成，之后随新增、删除单词更新；新增的单词只索引它自己的例句，
+    不会回头在旧例句中查找它。索引只保存单词ID，例句本身在使用时才从单词库读取
+    （.wlib 单词库的例句不常驻内存）。
+    """
+
+    def __init__(self, word_lib, inflections):
+        self.word_lib = word_lib
+        self.inflections = inflections
+        self.owners: Set[str] = set()  # 有可用例句的单词ID
+        self.occurrences: Dict[str, List[str]] = {}  # 单词ID -> 包含它的例句（所属单词ID）
+        self._ids_by_lemma: Dict[str, List[str]] = {}
+        for word in word_lib.all_words:
+            self._add_lemma(word)
+        for word in word_lib.all_words:
+            self._index_example(word)
+        word_lib.add_listener(self)
+
+    def __len__(self) -> int:
+        return len(self.owners)
+
+    def _add_lemma(self, word: WordType):
+        lemma = word["word"].strip().lower()
+        self.inflections.add_word(word)  # 确保词形索引中有该单词，反向查找时才能找到它
+        self._ids_by_lemma.setdefault(lemma, []).append(word["id"])
+
+    def _index_example(self, word: WordType):
+        parsed = split_example(word.get("example"))
+        if parsed is None:
+            return
+        owner = word["id"]
+        self.owners.add(owner)
+        found: Set[str] = {owner}
+        for token in _TOKEN.findall(parsed[0]):
+            for lemma in self.inflections.lemmas_of(token):
+                found.update(self._ids_by_lemma.get(lemma, ()))
+        for word_id in found:
+            self.occurrences.setdefault(word_id, []).append(owner)
+
+    def example(self, owner: str) -> Optional[Tuple[str, str]]:
+        """从单词库读取单词的例句 (英文, 中文)，单词已删除或例句不可用时返回None"""
+        word = self.word_lib.get_word(owner)
+        return split_example(word.get("example")) if word is not None else None
+
+    def find(self, sentence: str, word: str) -> Optional[Tuple[int, int]]:
+        """单词（任一形式）在句子中第一次出现的位置"""
+        forms = sorted(self.inflections.forms_of(word), key=len, reverse=True)
+        pattern = re.compile(r"\b(?:" + "|".join(re.escape(form) for form in forms) + r")\b", re.IGNORECASE)
+        match = pattern.search(sentence)
+        return match.span() if match else None
+
+    def examples_for(self, word_id: str) -> List[str]:
+        """包含该单词的例句（所属单词ID），它自己的例句排在最前"""
+        owners = [owner for owner in self.occurrences.get(word_id, []) if owner in self.owners]
+        owners.sort(key=lambda owner: owner != word_id)
+        return owners
+
+    def cloze(self, words: List[WordType]) -> Optional[Dict]:
+        """用已有例句生成填空练习（格式与 LLM.generate_fill_in_blank_exercise 相同），每个单词一句"""
+        sentences, translations, answers, word_list = [], [], [], []
+        used: Set[str] = set()
+        for word in words:
+            for owner in self.examples_for(word["id"]):
+                if owner in used:
+                    continue
+                example = self.example(owner)
+                if example is None:
+                    continue
+                english, chinese = example
+                span = self.find(english, word["word"])
+                if span is None:
+                    continue
+                used.add(owner)
+                sentences.append(f"{english[:span[0]]}____{english[span[1]:]}")
+                translations.append(chinese)
+                answers.append(english[span[0]:span[1]])
+                word_list.append(word["word"])
+                break
+        if not sentences:
+            return None
+        return {
+            "sentence": " ".join(sentences),
+            "translation": " ".join(translations),
+            "answer_list": answers,
+            "word_list": word_list
+        }
+
+    def sentence(self, word: WordType, review_pool: List[WordType]) -> Optional[Dict]:
+        """为学习页面选一句已有例句（格式与 LLM.make_sentence 相同），优先选用到复习池单词最多的"""
+        best = None
+        for owner in self.examples_for(word["id"]):
+            example = self.example(owner)
+            if example is None:
+                continue
+            english, chinese = example
+            key_span = self.find(english, word["word"])
+            if key_span is None:
+                continue
+            spans = [(key_span, word["word"])]
+            for pool_word in review_pool:
+                span = self.find(english, pool_word["word"])
+                if span and all(span[1] <= s[0] or span[0] >= s[1] for s, _ in spans):
+                    spans.append((span, pool_word["word"]))
+            if best is None or len(spans) > len(best[2]):
+                best = (english, chinese, spans)
+        if best is None:
+            return None
+        english, chinese, spans = best
+        spans.sort()
+        parts, last_end = [], 0
+        for (start, end), _ in spans:
+            parts.append(f"{english[last_end:start]}**{english[start:end]}**")
+            last_end = end
+        parts.append(english[last_end:])
+        return {
+            "sentence": "".join(parts),
+            "translation": chinese,
+            "words_list": [lemma for _, lemma in spans],
+            "occur_list": [english[start:end] for (start, end), _ in spans]
+        }
+
+    def random_words(self, count: int) -> List[WordType]:
+        """随机选取有可用例句的单词（没有已学单词时的独立练习）"""
+        owners = random.sample(list(self.owners), min(count, len(self.owners)))
+        return [word for word in (self.word_lib.get_word(owner) for owner in owners) if word is not None]
+
+    # 单词库变化通知
+
+    def words_added(self, words: List[WordType]):
+        for word in words:
+            self._add_lemma(word)
+        for word in words:
+            self._index_example(word)
+
+    def word_removed(self, word_id: str):
+        """包含该单词的例句仍可以给其他单词使用，只移除它自己的例句"""
+        self.owners.discard(word_id)
+        self.occurrences.pop(word_id, None)
@@ -0,0 +1,69 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Tuple, Type, TypeVar
+from llm_json import LLMOutputError
+
+T = TypeVar("T")
+
+# 各方法的重试统计（所有 RetryPolicy 实例共享）
+RETRY_COUNTERS: Dict[str, Dict[str, int]] = defaultdict(lambda: {"calls": 0, "retries": 0, "failures": 0})
+
+
+class LLMRetryError(RuntimeError):
+    """重试次数或时间预算耗尽"""
+
+
+class RetryPolicy:
+    """LLM调用的重试策略：最大尝试次数 + 指数退避 + 总时间预算"""
+
+    def __init__(self,
+                 max_attempts: int = 3,
+                 base_delay: float = 0.5,
+                 max_delay: float = 4.0,
+                 total_budget: float = 90.0,
+                 retry_on: Tuple[Type[BaseException], ...] = (LLMOutputError,)):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.total_budget = total_budget  # 包括模型调用本身在内的总耗时上限（秒）
+        self.retry_on = retry_on
+
+    def delay(self, attempt: int) -> float:
+        """第attempt次失败后的等待时间"""
+        return min(self.base_delay * (2 ** attempt), self.max_delay)
+
+    def _next_delay(self, name: str, attempt: int, started: float, error: BaseException) -> float:
+        """记录一次失败并返回下次重试前的等待时间；不能再重试时抛出 LLMRetryError"""
+        delay = self.delay(attempt)
+        elapsed = time.monotonic() - started
+        print(f"{name} 生成失败（尝试 {attempt+1}/{self.max_attempts}）: {error}")
+        if attempt + 1 >= self.max_attempts or elapsed + delay > self.total_budget:
+            RETRY_COUNTERS[name]["failures"] += 1
+            raise LLMRetryError("生成失败，请重试") from error
+        RETRY_COUNTERS[name]["retries"] += 1
+        return delay
+
+    def run(self, name: str, fn: Callable[[], T]) -> T:
+        RETRY_COUNTERS[name]["calls"] += 1
+        started = time.monotonic()
+        for attempt in range(self.max_attempts):
+            try:
+                return fn()
+            except self.retry_on as e:
+                time.sleep(self._next_delay(name, attempt, started, e))
+        raise LLMRetryError("生成失败，请重试")
+
+    async def arun(self, name: str, fn: Callable[[], Awaitable[T]]) -> T:
+        RETRY_COUNTERS[name]["calls"] += 1
+        started = time.monotonic()
+        for attempt in range(self.max_attempts):
+            try:
+                return await fn()
+            except self.retry_on as e:
+                await asyncio.sleep(self._next_delay(name, attempt, started, e))
+        raise LLMRetryError("生成失败，请重试")
+
+
+def retry_stats() -> Dict[str, Dict[str, int]]:
+    return {name: dict(counter) for name, counter in RETRY_COUNTERS.items()}
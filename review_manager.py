@@ -1,18 +1,43 @@
-import json
 import random
-from typing import List, Dict, Set
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Set
 from datetime import datetime
 from word_library import WordLibrary, WordType
+from review_scheduler import ReviewScheduler
+from learning_metadata import LibraryMetadata, JsonLearningState
+from word_queue import WordQueue
+from unlearned_pool import UnlearnedPool
 
 class ReviewManager:
-    def __init__(self, word_lib: WordLibrary, save_path: str = "learning_state.json"):
+    def __init__(self,
+                 word_lib: WordLibrary,
+                 save_path: str = "learning_state.json",
+                 metadata=None,
+                 state=None,
+                 new_words_per_batch: int = 5,
+                 new_word_order: str = "random"):
         self.word_lib = word_lib  # 单词库实例
+        # 学习元数据存储：默认写在单词库记录中；多用户时每个用户使用独立的 UserMetadataStore
+        self.metadata = metadata if metadata is not None else LibraryMetadata(word_lib)
+        # 学习状态存储（已学习队列、统计信息）：默认为 save_path 指向的JSON文件，也可以是SQLite
+        self.state = state if state is not None else JsonLearningState(save_path)
         self.save_path = save_path  # 学习状态保存路径
         
         # 核心数据结构（存储单词ID而非完整单词对象）
-        self.current_queue: List[str] = []  # 今日学习队列（单词ID）
-        self.old_queue: List[str] = self._load_learning_state()  # 已学习队列（单词ID）
+        # 两个队列都是有序集合，成员判断、追加和删除为 O(1)
+        self.current_queue = WordQueue()  # 今日学习队列（单词ID）
+        self.old_queue = WordQueue(self._load_learning_state())  # 已学习队列（单词ID）
         self.learned_words: Set[str] = set(self.old_queue)  # 已学习单词ID集合
+        # 未学习单词池（随学习进度和单词库增删增量维护），每次从中抽取 new_words_per_batch 个新单词
+        # new_word_order："random"、"list"（单词库顺序）、"frequency"（词频排名）或 "difficulty"
+        self.new_words_per_batch = new_words_per_batch
+        self.unlearned = UnlearnedPool(word_lib, self.learned_words, new_word_order)
+        self.scheduler = self._build_scheduler()  # 复习调度器（只在单词元数据变化时更新评分）
+
+        # 工作单元：一次提交中暂存的元数据变化（单词ID -> 变化的字段），None 表示不在工作单元中
+        self._pending: Optional[Dict[str, Dict]] = None
+        self._state_dirty = False
+        self._learned_changes: Optional[Dict[str, bool]] = None  # 工作单元中已学习状态变化的单词 -> 原来是否已学习
         
         # 学习统计信息
         self.stats = {
@@ -23,41 +48,105 @@ class ReviewManager:
             "session_discarded": 0
         }
 
+    def _build_scheduler(self):
+        """根据已学习队列构建复习调度器"""
+        scheduler = ReviewScheduler()
+        for word_id in list(self.old_queue):
+            if self.word_lib.get_word(word_id) is not None:
+                scheduler.update(word_id, self.metadata.get(word_id))
+        return scheduler
+
     def _load_learning_state(self) -> List[str]:
         """加载学习状态"""
-        try:
-            with open(self.save_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if isinstance(data, dict) and 'old_queue' in data:
-                    return data.get('old_queue', [])
-                # 兼容旧版本格式
-                if isinstance(data, list):
-                    return data
-                return []
-        except FileNotFoundError:
-            return []
+        return self.state.load()
 
     def save_learning_state(self):
-        """保存学习状态到文件"""
+        """保存学习状态（在工作单元中时推迟到提交时统一保存）"""
+        if self._pending is not None:
+            self._state_dirty = True
+            return
         # 更新统计信息
         self.stats["total_learned"] = len(self.learned_words)
-        with open(self.save_path, 'w', encoding='utf-8') as f:
-            json.dump({
-                "old_queue": self.old_queue,
-                "stats": self.stats
-            }, f, ensure_ascii=False, indent=2)
-
-    def init_current_queue(self) -> List[WordType]:
-        """初始化今日学习队列（随机5个未学习单词）"""
-        unlearned = [word for word in self.word_lib.all_words 
-                     if word["id"] not in self.learned_words]
-        if len(unlearned) < 5:
-            selected = unlearned
+        self.state.save(self.old_queue.to_list(), self.stats)
+
+    @contextmanager
+    def unit_of_work(self):
+        """一次提交的工作单元
+
+        期间的元数据变化只在内存中合并，退出时一次性写入（单词库日志或用户元数据日志中的
+        一条落盘记录；SQLite 时为一个事务），学习状态也只保存一次。
+        执行或写入出错时丢弃全部变化：队列、已学习集合、未学习单词池和统计信息恢复到进入时的状态。
+        """
+        if self._pending is not None:
+            yield  # 已在工作单元中
+            return
+        self._pending = {}
+        self._state_dirty = False
+        self._learned_changes = {}
+        current_queue = WordQueue(self.current_queue)  # 今日学习队列很短，直接复制
+        stats = dict(self.stats)
+        self.old_queue.mark()  # 已学习队列可能很长，只记录修改
+        try:
+            yield
+            pending, self._pending = self._pending, None
+            with self.metadata.batch():
+                self.metadata.update_many(pending)
+                if self._state_dirty:
+                    self.save_learning_state()
+        except BaseException:
+            self._pending = None
+            self.current_queue = current_queue
+            self.stats = stats
+            self.old_queue.rollback()
+            self._restore_learned()
+            self.scheduler = self._build_scheduler()  # 调度器中可能已有未提交的评分
+            raise
+        self.old_queue.release()
+        self._learned_changes = None
+
+    def _set_learned(self, word_id: str, learned: bool):
+        """修改单词的已学习状态（在工作单元中时记录原来的状态）"""
+        if (word_id in self.learned_words) == learned:
+            return
+        if self._learned_changes is not None:
+            self._learned_changes.setdefault(word_id, not learned)
+        if learned:
+            self.learned_words.add(word_id)
+            self.unlearned.discard(word_id)
         else:
-            selected = random.sample(unlearned, 5)
-        
+            self.learned_words.discard(word_id)
+
+    def _restore_learned(self):
+        """撤销工作单元中已学习状态的变化"""
+        changes, self._learned_changes = self._learned_changes or {}, None
+        for word_id, learned in changes.items():
+            if learned:
+                self.learned_words.add(word_id)
+            else:
+                self.learned_words.discard(word_id)
+        self.unlearned.restore([word_id for word_id, learned in changes.items() if not learned])
+
+    def _get_metadata(self, word_id: str) -> Optional[Dict]:
+        """读取学习元数据（包含工作单元中尚未写入的变化）"""
+        lm = self.metadata.get(word_id)
+        if self._pending and word_id in self._pending:
+            lm = {**(lm or {}), **self._pending[word_id]}
+        return lm
+
+    def _update_metadata(self, word_id: str, changes: Dict[str, object]) -> Dict:
+        """更新学习元数据，返回更新后的元数据"""
+        if self._pending is None:
+            return self.metadata.update(word_id, changes)
+        self._pending.setdefault(word_id, {}).update(changes)
+        return self._get_metadata(word_id)
+
+    def init_current_queue(self, count: Optional[int] = None) -> List[WordType]:
+        """初始化今日学习队列（从未学习单词池中抽取，默认 new_words_per_batch 个）"""
+        count = self.new_words_per_batch if count is None else count
+        selected = [self.word_lib.get_word(word_id) for word_id in self.unlearned.sample(count)]
+
         # 只存储单词ID到队列
-        self.current_queue = [word["id"] for word in selected]
+        self.current_queue = WordQueue(word["id"] for word in selected)
         return selected
 
     def select_smart_review_words(self, count: int = 10) -> List[WordType]:
@@ -70,48 +159,24 @@ class ReviewManager:
         """
         if not self.old_queue:
             return []
-            
-        review_candidates = []
-        
-        # 计算每个单词的复习评分
-        for word_id in self.old_queue:
-            try:
-                word = self._get_word_by_id(word_id)
-            except ValueError as e:
-                print(f"警告: {e}，跳过此单词的复习评分计算")
-                continue
-                
-            if "learning_metadata" not in word:
-                # 没有学习元数据的单词给予中等评分
-                score = 5.0
-            else:
-                lm = word["learning_metadata"]
-                # 1. 复习次数（复习次数越少，越需要复习）
-                review_factor = 1.0 / (lm.get("review_count", 1) + 1)
-                
-                # 2. 时间因素（距离上次复习时间越久，越需要复习）
-                last_reviewed = lm.get("last_reviewed")
-                if last_reviewed:
-                    days_since_review = (datetime.now() - datetime.fromisoformat(last_reviewed)).days
-                    time_factor = min(days_since_review / 7, 3.0)  # 最多3倍权重
-                else:
-                    time_factor = 2.0  # 从未复习过的单词给予较高权重
-                
-                # 3. 记忆强度（强度越低，越需要复习）
-                strength = lm.get("strength", 1.0)
-                strength_factor = 1.0 / strength
-                
-                # 综合评分
-                score = review_factor * time_factor * strength_factor
-            
-            review_candidates.append((word, score))
-        
-        # 按评分降序排序
-        review_candidates.sort(key=lambda x: x[1], reverse=True)
-        
+
+        # 从调度器中取出评分最高的 2×count 个单词，不再对全部已学单词重新评分
+        while True:
+            top_ids = self.scheduler.top(count * 2)
+            missing = [word_id for word_id in top_ids if self.word_lib.get_word(word_id) is None]
+            if not missing:
+                break
+            for word_id in missing:
+                # 单词已被移出单词库：从调度器和已学习队列中清理后重新选择
+                self.scheduler.remove(word_id)
+                try:
+                    self._get_word_by_id(word_id)
+                except ValueError as e:
+                    print(f"警告: {e}，跳过此单词的复习评分计算")
+        top_candidates = [self.word_lib.get_word(word_id) for word_id in top_ids]
+
         # 随机选择前N个高分单词（避免总是选择相同的单词）
-        top_candidates = review_candidates[:min(count*2, len(review_candidates))]
-        return [word for word, _ in random.sample(top_candidates, min(count, len(top_candidates)))]
+        return random.sample(top_candidates, min(count, len(top_candidates)))
 
     def process_word(self, word_id: str, action: str):
         """处理单个单词的学习操作"""
@@ -123,42 +188,42 @@ class ReviewManager:
         self.stats["session_words"] += 1
         
         # 如果单词在队列中，才移除它
-        if word_id in self.current_queue:
-            self.current_queue.remove(word_id)
+        self.current_queue.discard(word_id)
 
         if action == 'keep':
             self.stats["session_kept"] += 1
-            if word_id not in self.old_queue:
-                self.old_queue.append(word_id)
-            if word_id not in self.learned_words:
-                self.learned_words.add(word_id)
+            self.old_queue.append(word_id)
+            self._set_learned(word_id, True)
                 
-            # 更新单词学习元数据
+            # 更新单词学习元数据（只记录变化的字段）
             try:
-                word = self._get_word_by_id(word_id)
-                if "learning_metadata" not in word:
-                    word["learning_metadata"] = {
+                self._get_word_by_id(word_id)
+                lm = self._get_metadata(word_id)
+                changes = {}
+                if lm is None:
+                    lm = {
                         "first_learned": datetime.now().isoformat(),
                         "review_count": 0,
                         "last_reviewed": None,
                         "strength": 1
                     }
+                    changes.update(lm)
                 
-                lm = word["learning_metadata"]
-                lm["review_count"] += 1
-                lm["last_reviewed"] = datetime.now().isoformat()
+                changes["review_count"] = lm["review_count"] + 1
+                changes["last_reviewed"] = datetime.now().isoformat()
                 
-                if lm["review_count"] >= 3:
-                    lm["strength"] = min(lm["strength"] * 1.2, 10.0)
+                if changes["review_count"] >= 3:
+                    changes["strength"] = min(lm["strength"] * 1.2, 10.0)
                 else:
-                    lm["strength"] = min(lm["strength"] * 1.1, 10.0)
+                    changes["strength"] = min(lm["strength"] * 1.1, 10.0)
                 
-                self.word_lib.save_words()
+                lm = self._update_metadata(word_id, changes)
+                self.scheduler.update(word_id, lm)
             except ValueError as e:
                 print(f"警告: {e}，跳过此单词的学习状态更新")
-                if word_id in self.old_queue:
-                    self.old_queue.remove(word_id)
-                self.learned_words.discard(word_id)
+                self.old_queue.discard(word_id)
+                self._set_learned(word_id, False)
+                self.scheduler.remove(word_id)
         else:
             self.stats["session_discarded"] += 1
 
@@ -168,22 +233,25 @@ class ReviewManager:
         # 处理选中的需要重新学习的单词
         for word in selected_words:
             # 将选中的单词加入当前学习队列
-            if word in self.old_queue:
-                self.old_queue.remove(word)
+            self.old_queue.discard(word)
+            self.scheduler.remove(word)
             self.current_queue.append(word)
 
         # 处理用户记得的单词
         for word_id in unselected_words:
             try:
                 # 更新单词的学习元数据
-                word = self._get_word_by_id(word_id)
-                if "learning_metadata" in word:
-                    lm = word["learning_metadata"]
-                    lm["review_count"] += 1
-                    lm["last_reviewed"] = datetime.now().isoformat()
-                    # 轻度增加记忆强度
-                    lm["strength"] = min(lm["strength"] * 1.05, 10.0)
-                self.word_lib.save_words()
+                self._get_word_by_id(word_id)
+                lm = self._get_metadata(word_id)
+                if lm is not None:
+                    lm = self._update_metadata(word_id, {
+                        "review_count": lm["review_count"] + 1,
+                        "last_reviewed": datetime.now().isoformat(),
+                        # 轻度增加记忆强度
+                        "strength": min(lm["strength"] * 1.05, 10.0)
+                    })
+                    if word_id in self.scheduler:
+                        self.scheduler.update(word_id, lm)
             except ValueError:
                 continue
 
@@ -193,21 +261,15 @@ class ReviewManager:
 
     def _get_word_by_id(self, word_id: str) -> WordType:
         """通过ID获取完整单词对象"""
-        for word in self.word_lib.all_words:
-            if word["id"] == word_id:
-                return word
-        # 如果单词不在单词库中，尝试从已学习队列中查找
-        if word_id in self.old_queue:
-            # 从文件重新加载单词库，可能单词被移除后没有更新引用
-            self.word_lib.all_words = self.word_lib._load_words()
-            for word in self.word_lib.all_words:
-                if word["id"] == word_id:
-                    return word
-                    
-            # 如果仍然找不到，可能是单词被意外删除了
+        word = self.word_lib.get_word(word_id)
+        if word is not None:
+            return word
+        # 单词库索引与文件、日志保持一致，找不到说明单词确实已被删除
+        if word_id in self.learned_words:
             print(f"警告: 单词ID {word_id} 在已学习队列中但不在单词库中，将从学习队列中移除")
-            self.old_queue = [wid for wid in self.old_queue if wid != word_id]
-            self.learned_words.discard(word_id)
+            self.old_queue.discard(word_id)
+            self._set_learned(word_id, False)
+            self.scheduler.remove(word_id)
             self.save_learning_state()  # 保存学习状态，移除无效ID
             
         # 如果完全找不到，抛出错误
@@ -0,0 +1,141 @@
+import heapq
+import itertools
+import math
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+SECONDS_PER_DAY = 86400
+MAX_TIME_FACTOR_DAYS = 21  # 超过21天后时间因素封顶为3.0，评分不再随时间变化
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_seconds(value) -> Optional[float]:
+    """把ISO时间字符串（或datetime）转换为秒数，与 datetime.now() 相减的语义保持一致"""
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value) if isinstance(value, str) else value
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return (dt - _EPOCH).total_seconds()
+
+
+def now_seconds() -> float:
+    return to_seconds(datetime.now())
+
+
+def time_factor(last_reviewed: Optional[float], now: float) -> float:
+    """距离上次复习时间越久，越需要复习"""
+    if last_reviewed is None:
+        return 2.0  # 从未复习过的单词给予较高权重
+    days_since_review = math.floor((now - last_reviewed) / SECONDS_PER_DAY)
+    return min(days_since_review / 7, 3.0)  # 最多3倍权重
+
+
+def static_factor(lm: Dict) -> float:
+    """评分中不随时间变化的部分：复习次数因素 × 记忆强度因素"""
+    # 1. 复习次数（复习次数越少，越需要复习）
+    review_factor = 1.0 / (lm.get("review_count", 1) + 1)
+    # 2. 记忆强度（强度越低，越需要复习）
+    strength_factor = 1.0 / lm.get("strength", 1.0)
+    return review_factor * strength_factor
+
+
+def review_score(lm: Optional[Dict], now: float) -> float:
+    """计算单个单词的复习评分（与 ReviewManager 原有公式一致）"""
+    if lm is None:
+        # 没有学习元数据的单词给予中等评分
+        return 5.0
+    return static_factor(lm) * time_factor(to_seconds(lm.get("last_reviewed")), now)
+
+
+class ReviewScheduler:
+    """基于堆的复习调度器
+
+    评分 = 静态因素 × 时间因素，其中时间因素只在"距上次复习的整天数"变化时改变，
+    且21天后封顶。因此每个单词只需在这些时刻重新评分：调度器用一个按评分排序的堆
+    选出最需要复习的单词，再用一个按"下次评分变化时间"排序的堆在查询时补算到期的单词。
+    过期的堆条目通过版本号惰性删除。
+    """
+
+    def __init__(self):
+        # word_id -> (静态因素, 上次复习秒数, 版本号, 插入序号)；静态因素为None表示没有学习元数据
+        self._state: Dict[str, Tuple[Optional[float], Optional[float], int, int]] = {}
+        self._score_heap: List[Tuple[float, int, str, int]] = []  # (-评分, 插入序号, word_id, 版本号)
+        self._change_heap: List[Tuple[float, str, int]] = []  # (评分变化时间, word_id, 版本号)
+        self._seq = itertools.count()  # 评分相同时按加入顺序排列（与原先的稳定排序一致）
+        self._version = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def __contains__(self, word_id: str) -> bool:
+        return word_id in self._state
+
+    def update(self, word_id: str, lm: Optional[Dict], now: Optional[float] = None):
+        """加入单词，或在学习元数据变化后更新它的评分"""
+        now = now_seconds() if now is None else now
+        seq = self._state[word_id][3] if word_id in self._state else next(self._seq)
+        factor = static_factor(lm) if lm is not None else None
+        last = to_seconds(lm.get("last_reviewed")) if lm is not None else None
+        self._state[word_id] = (factor, last, next(self._version), seq)
+        self._push(word_id, now)
+        self._maybe_rebuild()
+
+    def remove(self, word_id: str):
+        """移除单词（堆中的旧条目会在之后被惰性丢弃）"""
+        self._state.pop(word_id, None)
+
+    def top(self, n: int, now: Optional[float] = None) -> List[str]:
+        """按评分从高到低返回前n个单词ID"""
+        now = now_seconds() if now is None else now
+        self._refresh(now)
+        result = []
+        popped = []
+        while self._score_heap and len(result) < n:
+            entry = heapq.heappop(self._score_heap)
+            if self._is_current(entry[2], entry[3]):
+                result.append(entry[2])
+                popped.append(entry)
+        for entry in popped:
+            heapq.heappush(self._score_heap, entry)
+        return result
+
+    def _score(self, word_id: str, now: float) -> float:
+        factor, last, _, _ = self._state[word_id]
+        if factor is None:
+            return 5.0
+        return factor * time_factor(last, now)
+
+    def _push(self, word_id: str, now: float):
+        factor, last, version, seq = self._state[word_id]
+        heapq.heappush(self._score_heap, (-self._score(word_id, now), seq, word_id, version))
+        if factor is None or last is None:
+            return  # 评分不随时间变化
+        days = math.floor((now - last) / SECONDS_PER_DAY)
+        if days < MAX_TIME_FACTOR_DAYS:
+            change_at = last + (days + 1) * SECONDS_PER_DAY
+            heapq.heappush(self._change_heap, (change_at, word_id, version))
+
+    def _refresh(self, now: float):
+        """补算评分已经随时间变化的单词"""
+        while self._change_heap and self._change_heap[0][0] <= now:
+            _, word_id, version = heapq.heappop(self._change_heap)
+            if not self._is_current(word_id, version):
+                continue
+            factor, last, _, seq = self._state[word_id]
+            self._state[word_id] = (factor, last, next(self._version), seq)
+            self._push(word_id, now)
+        self._maybe_rebuild()
+
+    def _is_current(self, word_id: str, version: int) -> bool:
+        state = self._state.get(word_id)
+        return state is not None and state[2] == version
+
+    def _maybe_rebuild(self):
+        """过期条目过多时重建堆，控制内存占用"""
+        if len(self._score_heap) > 2 * len(self._state) + 64:
+            self._score_heap = [e for e in self._score_heap if self._is_current(e[2], e[3])]
+            heapq.heapify(self._score_heap)
+        if len(self._change_heap) > 2 * len(self._state) + 64:
+            self._change_heap = [e for e in self._change_heap if self._is_current(e[1], e[2])]
+            heapq.heapify(self._change_heap)
@@ -0,0 +1,232 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Container, Dict, List, Optional, Set, Tuple
+from single_flight import SingleFlight
+from word_store import atomic_write_text
+
+
+class SentenceCache:
+    """预生成例句缓存
+
+    每个条目以关键单词ID为键，保存生成时使用的复习池和例句结果。
+    条目超过TTL或复习池中有单词已不在已学习集合中时视为失效；超出容量时按LRU淘汰。
+    修改只标记为未保存，由 flush() 定期在后台线程中写入文件（退出时调用 save()）。
+    """
+
+    def __init__(self,
+                 file_path: str = "sentence_cache.json",
+                 max_entries: int = 500,
+                 ttl: float = 3 * 24 * 3600):
+        self.file_path = file_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Dict]" = self._load()
+        self._dirty = False
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.saved_latency = 0.0  # 命中缓存省下的生成时间（秒）
+        self.live_latency = 0.0  # 未命中时实时生成的总耗时（秒）
+
+    def _load(self) -> "OrderedDict[str, Dict]":
+        """从文件加载缓存"""
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                if isinstance(data, dict):
+                    return OrderedDict(data)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        return OrderedDict()
+
+    def save(self):
+        """保存缓存到文件"""
+        atomic_write_text(self.file_path, json.dumps(self.entries, ensure_ascii=False))
+        self._dirty = False
+
+    async def flush(self):
+        """有未保存的修改时写入文件：在事件循环中序列化，在后台线程中写盘"""
+        if not self._dirty:
+            return
+        payload = json.dumps(self.entries, ensure_ascii=False)
+        self._dirty = False
+        try:
+            await asyncio.to_thread(atomic_write_text, self.file_path, payload)
+        except OSError as e:
+            self._dirty = True
+            print(f"警告: 保存例句缓存失败: {e}")
+
+    def get(self, word_id: str, learned: Container[str]) -> Optional[Dict]:
+        """获取单词的预生成例句，失效或不存在时返回None"""
+        entry = self.entries.get(word_id)
+        if entry is not None:
+            expired = time.time() - entry["created_at"] > self.ttl
+            if expired or not all(w["id"] in learned for w in entry["review_pool"]):
+                del self.entries[word_id]
+                self._dirty = True
+                entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(word_id)
+        self.hits += 1
+        self.saved_latency += entry["latency"]
+        return entry
+
+    def put(self, word_id: str, review_pool: List[Dict], sentence_data: Dict, latency: float):
+        """写入一条预生成例句（review_pool 只保存 id 和 word）"""
+        self.entries[word_id] = {
+            "review_pool": [{"id": w["id"], "word": w["word"]} for w in review_pool],
+            "sentence_data": sentence_data,
+            "latency": latency,
+            "created_at": time.time()
+        }
+        self.entries.move_to_end(word_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._dirty = True
+
+    def invalidate(self, word_id: str):
+        """删除某个单词的缓存条目"""
+        if self.entries.pop(word_id, None) is not None:
+            self._dirty = True
+
+    def record_live(self, latency: float):
+        """记录一次未命中时的实时生成耗时"""
+        self.live_latency += latency
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_latency_seconds": round(self.saved_latency, 3),
+            "avg_live_latency_seconds": round(self.live_latency / self.misses, 3) if self.misses else 0.0
+        }
+
+
+class SentencePrefetcher:
+    """后台预生成例句：今日学习队列确定后，立即为每个单词生成例句写入缓存
+
+    队首的单词（页面最先需要）单独生成，其余单词在一次LLM请求中批量生成（LLM.amake_sentences），
+    每个例句校验通过后立即写入缓存，等待某个单词的页面不必等整批生成和重试结束。
+    """
+
+    def __init__(self, llm, review_manager, cache: SentenceCache, pool_size: int = 10, namespace: str = ""):
+        self.llm = llm
+        self.review_manager = review_manager
+        self.cache = cache
+        self.pool_size = pool_size
+        self.namespace = namespace  # 多用户共用一个缓存时，用用户ID区分各自的条目
+        self._pending: Dict[str, asyncio.Event] = {}  # 正在生成的单词ID -> 写入缓存（或生成结束）时设置的事件
+        self._tasks: Set[asyncio.Task] = set()
+        self._live = SingleFlight()  # 同一单词的实时生成（刷新页面、多个标签页）只进行一次
+
+    def key(self, word_id: str) -> str:
+        """单词在缓存中的键"""
+        return f"{self.namespace}:{word_id}" if self.namespace else word_id
+
+    def schedule(self, word_ids: List[str]):
+        """为一批单词启动后台生成任务（已在生成中的单词会跳过）"""
+        word_ids = [word_id for word_id in dict.fromkeys(word_ids) if word_id not in self._pending]
+        if not word_ids:
+            return
+        for word_id in word_ids:
+            self._pending[word_id] = asyncio.Event()
+        first, rest = word_ids[0], word_ids[1:]
+        self._start(self._prefetch(first))
+        if len(rest) == 1:
+            self._start(self._prefetch(rest[0]))
+        elif rest:
+            self._start(self._prefetch_batch(rest))
+
+    def _start(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _done(self, word_id: str):
+        event = self._pending.pop(word_id, None)
+        if event is not None:
+            event.set()
+
+    def busy(self) -> bool:
+        """是否有预生成或实时生成在进行"""
+        return bool(self._tasks) or len(self._live) > 0
+
+    def close(self):
+        """取消正在进行的预生成（会话被移出内存时调用）"""
+        for task in list(self._tasks):
+            task.cancel()
+        for word_id in list(self._pending):
+            self._done(word_id)
+
+    async def wait_for(self, word_id: str):
+        """如果该单词正在后台生成，等待它写入缓存（或生成失败）"""
+        event = self._pending.get(word_id)
+        if event is not None:
+            await event.wait()
+
+    async def generate_live(self, word_id: str, on_partial=None) -> Tuple[List[Dict], Dict]:
+        """缓存未命中时实时生成例句，返回 (复习池, 例句数据)
+
+        同一单词正在实时生成时直接等待该结果，不再另外选复习池和请求模型。
+        复习池与缓存条目相同，只包含 id 和 word（结果会复制给其他等待者，不能引用单词库中的记录）。
+        """
+        async def generate(publish):
+            word = self.review_manager._get_word_by_id(word_id)
+            review_pool = [{"id": w["id"], "word": w["word"]}
+                           for w in self.review_manager.select_smart_review_words(self.pool_size)]
+            start = time.perf_counter()
+            sentence_data = await self.llm.amake_sentence(word["word"], [w["word"] for w in review_pool],
+                                                          on_partial=publish)
+            self.cache.record_live(time.perf_counter() - start)
+            return review_pool, sentence_data
+        return await self._live.run("live_sentence", word_id, generate, on_partial)
+
+    async def _prefetch(self, word_id: str):
+        try:
+            word = self.review_manager._get_word_by_id(word_id)
+            review_pool = self.review_manager.select_smart_review_words(self.pool_size)
+            start = time.perf_counter()
+            sentence_data = await self.llm.amake_sentence(word["word"], [w["word"] for w in review_pool])
+            self.cache.put(self.key(word_id), review_pool, sentence_data, time.perf_counter() - start)
+        except Exception as e:
+            print(f"警告: 预生成单词 {word_id} 的例句失败: {e}")
+        finally:
+            self._done(word_id)
+
+    async def _prefetch_batch(self, word_ids: List[str]):
+        try:
+            ids, words = [], []
+            for word_id in word_ids:
+                try:
+                    words.append(self.review_manager._get_word_by_id(word_id))
+                    ids.append(word_id)
+                except ValueError as e:
+                    print(f"警告: {e}，跳过该单词的例句预生成")  # 已被移出单词库，不影响同批的其他单词
+                    self._done(word_id)
+            if not ids:
+                return
+            pools = [self.review_manager.select_smart_review_words(self.pool_size) for _ in words]
+            start = time.perf_counter()
+
+            def on_result(i: int, sentence_data: Dict):
+                # 一次请求生成整批例句，耗时按单词数分摊
+                latency = (time.perf_counter() - start) / len(ids)
+                self.cache.put(self.key(ids[i]), pools[i], sentence_data, latency)
+                self._done(ids[i])
+
+            # 重试后仍失败的单词在页面打开时实时生成
+            await self.llm.amake_sentences(
+                [(word["word"], [w["word"] for w in pool]) for word, pool in zip(words, pools)], on_result=on_result)
+        except Exception as e:
+            print(f"警告: 批量预生成 {len(word_ids)} 个单词的例句失败: {e}")
+        finally:
+            for word_id in word_ids:
+                self._done(word_id)
@@ -0,0 +1,149 @@
+import re
+from collections import Counter
+from itertools import zip_longest
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from llm_json import LLMOutputError, require_keys
+
+# 例句校验统计：checked 为校验次数，repaired 为严格校验失败但在本地修复的次数，failed 为仍需重新生成的次数
+CHECK_COUNTERS: Counter = Counter()
+
+
+def _bold(sentence: str, spans: List[Tuple[int, int]]) -> str:
+    parts = []
+    last_end = 0
+    for start, end in spans:
+        parts.append(sentence[last_end:start])
+        parts.append(f"**{sentence[start:end]}**")
+        last_end = end
+    parts.append(sentence[last_end:])
+    return ''.join(parts)
+
+
+def _strict_check(result: Dict, key: str) -> Dict:
+    """原有的校验：关键单词必须在 words_list 中，occur_list 中的单词必须按顺序原样出现在句子中"""
+    if key not in result["words_list"]:
+        raise LLMOutputError(f"关键单词 {key} 不在 words_list 中")
+    sentence = result["sentence"].replace('*', '')
+    current_index = 0
+    spans = []
+    for word in result["occur_list"]:
+        # 创建带单词边界的正则模式
+        pattern = re.compile(r'\b' + re.escape(word) + r'\b')
+        match = pattern.search(sentence, current_index)
+        if not match:
+            raise LLMOutputError(f"句子中找不到单词 {word}")
+        spans.append(match.span())
+        current_index = match.end()
+    result["sentence"] = _bold(sentence, spans)
+    return result
+
+
+def _find(sentence: str, forms: Iterable[str], start: int, taken: List[Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+    """在句子中查找任一形式（不区分大小写），优先从start之后找，不与已标出的单词重叠"""
+    forms = sorted({form for form in forms if form}, key=len, reverse=True)
+    if not forms:
+        return None
+    pattern = re.compile(r'\b(?:' + '|'.join(re.escape(form) for form in forms) + r')\b', re.IGNORECASE)
+    for begin in (start, 0):
+        for match in pattern.finditer(sentence, begin):
+            if all(match.end() <= s or match.start() >= e for s, e in taken):
+                return match.span()
+    return None
+
+
+def _repair(result: Dict, key: str, pool: Sequence[str], index) -> Dict:
+    """按词形索引在本地修复：找回变形或大小写不一致的单词、纠正原形、补上漏标的关键单词
+
+    标出的每个位置都必须是对应单词的某种形式，否则不标出（关键单词找不到时需要重新生成）。
+    """
+    sentence = result["sentence"].replace('*', '')
+    candidates = [key, *pool]
+
+    def resolve(lemma: Optional[str], occur: Optional[str]) -> Optional[str]:
+        """把模型给出的原形对应到关键单词或单词池中的单词"""
+        for word in candidates:
+            if lemma and lemma.lower() == word.lower():
+                return word
+        for word in candidates:
+            if (occur and index.is_form_of(occur, word)) or (lemma and index.is_form_of(lemma, word)):
+                return word
+        return lemma or occur
+
+    spans: List[Tuple[int, int, str]] = []
+    cursor = 0
+    for lemma, occur in zip_longest(result["words_list"], result["occur_list"]):
+        lemma = resolve(lemma, occur)
+        if not lemma:
+            continue
+        # 模型给出的句中形式必须确实是该单词的变形（teacher 不能算作 teach）
+        forms = index.forms_of(lemma)
+        occur_forms = [occur] if occur and occur.strip().lower() in forms else []
+        span = _find(sentence, occur_forms, cursor, [s[:2] for s in spans])
+        if span is None:
+            span = _find(sentence, forms, cursor, [s[:2] for s in spans])
+        if span is None:
+            continue  # 单词池中的单词没有用上，不标出
+        spans.append((*span, lemma))
+        cursor = span[1]
+
+    if not any(lemma == key for _, _, lemma in spans):
+        span = _find(sentence, index.forms_of(key), 0, [s[:2] for s in spans])
+        if span is None:
+            raise LLMOutputError(f"句子中找不到关键单词 {key}")
+        spans.append((*span, key))
+
+    spans.sort()
+    result["sentence"] = _bold(sentence, [(start, end) for start, end, _ in spans])
+    result["words_list"] = [lemma for _, _, lemma in spans]
+    result["occur_list"] = [sentence[start:end] for start, end, _ in spans]
+    return result
+
+
+def _key_forms_match(result: Dict, key: str, index) -> bool:
+    """words_list 中标为关键单词的位置，句中形式确实是关键单词的某种形式"""
+    return all(index.is_form_of(occur, key)
+               for lemma, occur in zip(result["words_list"], result["occur_list"]) if lemma == key)
+
+
+def check_sentence(result: object, key: str, pool: Sequence[str] = (), index=None) -> Dict:
+    """校验单个例句并把句中出现的单词加粗，校验不通过时抛出 LLMOutputError（需要重新生成）
+
+    严格校验通过的结果保持原样；提供词形索引（inflection.InflectionIndex）时，
+    关键单词的句中形式还必须是它的变形，不满足或严格校验失败的结果先尝试在本地修复，修复不了才需要重新生成。
+    """
+    result = require_keys(result, ["sentence", "translation", "words_list", "occur_list"])
+    if not all(isinstance(result[field], list) for field in ("words_list", "occur_list")):
+        raise LLMOutputError("words_list 和 occur_list 必须是列表")
+    CHECK_COUNTERS["checked"] += 1
+    try:
+        checked = _strict_check(dict(result), key)
+        if index is None or _key_forms_match(checked, key, index):
+            return checked
+    except LLMOutputError:
+        if index is None:
+            CHECK_COUNTERS["failed"] += 1
+            raise
+    try:
+        repaired = _repair(dict(result), key, pool, index)
+    except LLMOutputError:
+        CHECK_COUNTERS["failed"] += 1
+        raise
+    CHECK_COUNTERS["repaired"] += 1
+    return repaired
+
+
+def map_used_words(sentence_data: Dict, review_pool: List[Dict], index=None) -> List[Tuple[str, str]]:
+    """把例句中用到的单词对应到复习池中的单词，返回 (单词ID, 句中形式) 列表"""
+    used_words = []
+    for origin, occur in zip(sentence_data['words_list'], sentence_data['occur_list']):
+        match = next((d for d in review_pool if d.get('word') == origin), None)
+        if match is None and index is not None:
+            match = next((d for d in review_pool if d.get('word')
+                          and (index.is_form_of(occur, d['word']) or origin.lower() == d['word'].lower())), None)
+        if match:
+            used_words.append((match['id'], occur))
+    return used_words
+
+
+def check_stats() -> Dict[str, int]:
+    return {name: CHECK_COUNTERS[name] for name in ("checked", "repaired", "failed")}
@@ -0,0 +1,140 @@
+import re
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+SESSION_COOKIE = "dr_session"
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def valid_session_id(value: Optional[str]) -> bool:
+    """会话ID会用作用户数据目录名，只接受 new_session_id() 生成的格式"""
+    return bool(value) and _SESSION_ID.match(value) is not None
+
+
+class UserSession:
+    """单个用户的学习状态：复习管理器、故事创作器、例句预生成器和预生成的填空练习"""
+
+    def __init__(self, user_id: str, review_manager, story_creator, prefetcher, fill_blank_buffer):
+        self.user_id = user_id
+        self.review_manager = review_manager
+        self.story_creator = story_creator
+        self.prefetcher = prefetcher
+        self.fill_blank_buffer = fill_blank_buffer
+        self.last_active = time.monotonic()
+
+    def busy(self) -> bool:
+        """是否还有属于该用户的后台任务（例句预生成、填空练习补充、故事摘要和预先续写）在进行"""
+        return self.prefetcher.busy() or self.fill_blank_buffer.busy() or self.story_creator.busy()
+
+    def close(self):
+        """保存学习状态和学习元数据，取消后台任务并丢弃尚未使用的预先续写和填空练习"""
+        self.prefetcher.close()
+        self.story_creator.close()
+        self.fill_blank_buffer.close()
+        self.review_manager.save_learning_state()
+        self.review_manager.metadata.close()
+
+
+class SessionManager:
+    """活跃用户会话的LRU缓存
+
+    用户第一次访问时通过 loader 从磁盘加载状态；超过容量或空闲超时的会话会被
+    保存并移出内存，下次访问时重新加载。正在处理请求（hold() 期间）或还有后台任务的会话
+    不会被移出，暂时超出容量，等空闲后再淘汰。
+    """
+
+    def __init__(self,
+                 loader: Callable[[str], UserSession],
+                 capacity: int = 64,
+                 idle_timeout: float = 30 * 60):
+        self.loader = loader
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout  # 秒
+        self._sessions: "OrderedDict[str, UserSession]" = OrderedDict()
+        self._holds: Counter = Counter()  # 用户ID -> 正在处理的请求数
+
+        # 统计信息
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._sessions
+
+    def __iter__(self) -> Iterator[UserSession]:
+        """内存中的全部会话"""
+        return iter(list(self._sessions.values()))
+
+    def get(self, user_id: str) -> UserSession:
+        """获取用户会话（不在内存中时加载），并顺带淘汰空闲会话"""
+        session = self._sessions.get(user_id)
+        if session is None:
+            session = self.loader(user_id)
+            self._sessions[user_id] = session
+            self.loads += 1
+        self._sessions.move_to_end(user_id)
+        session.last_active = time.monotonic()
+        self._evict(keep=user_id)
+        return session
+
+    @contextmanager
+    def hold(self, user_id: str):
+        """请求处理期间占用用户会话，期间不会被移出内存"""
+        self._holds[user_id] += 1
+        try:
+            yield
+        finally:
+            self._holds[user_id] -= 1
+            if self._holds[user_id] <= 0:
+                del self._holds[user_id]
+            session = self._sessions.get(user_id)
+            if session is not None:
+                session.last_active = time.monotonic()
+
+    def _in_use(self, session: UserSession) -> bool:
+        return session.user_id in self._holds or session.busy()
+
+    def _evict(self, keep: Optional[str] = None):
+        """淘汰超出容量或空闲超时的会话（keep 为刚取出的会话，不淘汰）"""
+        now = time.monotonic()
+        expired: List[UserSession] = []
+        size = len(self._sessions)
+        for user_id, session in list(self._sessions.items()):
+            if size <= self.capacity and now - session.last_active <= self.idle_timeout:
+                break
+            if user_id == keep or self._in_use(session):
+                continue
+            del self._sessions[user_id]
+            expired.append(session)
+            size -= 1
+        for session in expired:
+            self._close(session)
+
+    def _close(self, session: UserSession):
+        try:
+            session.close()
+            self.evictions += 1
+        except Exception as e:
+            print(f"警告: 保存用户 {session.user_id} 的学习状态失败: {e}")
+
+    def close_all(self):
+        """保存并关闭全部会话（退出时调用）"""
+        while self._sessions:
+            _, session = self._sessions.popitem(last=False)
+            self._close(session)
+
+    def stats(self) -> Dict:
+        return {
+            "active": len(self._sessions),
+            "loads": self.loads,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,87 @@
+import asyncio
+import copy
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# 各调用的合并统计（所有 SingleFlight 实例共享）：calls 为调用次数，shared 为复用了进行中调用的次数
+COALESCE_COUNTERS: Dict[str, Dict[str, int]] = defaultdict(lambda: {"calls": 0, "shared": 0})
+
+PartialCallback = Callable[[Dict], Awaitable[None]]
+
+
+class _Flight:
+    def __init__(self):
+        self.task: Optional[asyncio.Future] = None
+        self.listeners: List[PartialCallback] = []
+        self.last_partial: Optional[Dict] = None
+
+    async def publish(self, partial: Dict):
+        """把流式生成的部分结果转发给所有等待者（某个等待者出错时只移除它，不影响生成）"""
+        self.last_partial = partial
+        for listener in list(self.listeners):
+            try:
+                await listener(partial)
+            except Exception:
+                if listener in self.listeners:
+                    self.listeners.remove(listener)
+
+
+class SingleFlight:
+    """合并相同的并发调用：同一个键同时只执行一次，其他调用者等待同一个结果
+
+    调用在独立的任务中执行，某个调用者被取消（例如页面关闭）不会影响其他调用者。
+    流式生成的部分结果会转发给所有传入 on_partial 的调用者，后加入的调用者会先收到最近一次的部分结果。
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def run(self,
+                  name: str,
+                  key: Hashable,
+                  fn: Callable[[Optional[PartialCallback]], Awaitable[T]],
+                  on_partial: Optional[PartialCallback] = None) -> T:
+        """执行 fn(publish)，或等待进行中的相同调用
+
+        fn 收到的 publish 在发起者传入了 on_partial 时为转发函数，否则为None（不需要流式生成）。
+        其他调用者拿到结果的深拷贝，结果应只包含可复制的普通数据（字典、列表、字符串等）。
+        """
+        COALESCE_COUNTERS[name]["calls"] += 1
+        flight = self._flights.get((name, key))
+        leader = flight is None
+        if leader:
+            flight = _Flight()
+            self._flights[(name, key)] = flight
+            flight.task = asyncio.ensure_future(fn(flight.publish if on_partial is not None else None))
+            flight.task.add_done_callback(lambda _: self._finish((name, key), flight))
+        else:
+            COALESCE_COUNTERS[name]["shared"] += 1
+            if on_partial is not None and flight.last_partial is not None:
+                try:
+                    await on_partial(flight.last_partial)
+                except Exception:
+                    on_partial = None
+        if on_partial is not None:
+            flight.listeners.append(on_partial)
+        try:
+            result = await asyncio.shield(flight.task)
+            # 其他调用者拿到结果的副本，避免修改互相影响
+            return result if leader else copy.deepcopy(result)
+        finally:
+            if on_partial in flight.listeners:
+                flight.listeners.remove(on_partial)
+
+    def _finish(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            flight.task.exception()  # 所有调用者都已离开时，避免"异常未被获取"的警告
+
+
+def coalesce_stats() -> Dict[str, Dict[str, int]]:
+    return {name: dict(counter) for name, counter in COALESCE_COUNTERS.items()}
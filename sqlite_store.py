@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS learning_metadata (
+    user_id TEXT NOT NULL,
+    word_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, word_id)
+);
+CREATE TABLE IF NOT EXISTS learned (
+    user_id TEXT NOT NULL,
+    word_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (user_id, word_id)
+);
+CREATE INDEX IF NOT EXISTS idx_learned_seq ON learned (user_id, seq);
+CREATE TABLE IF NOT EXISTS learning_stats (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+class SqliteLearningDB:
+    """保存所有用户学习进度的SQLite数据库（WAL模式）
+
+    - learning_metadata：每个用户每个单词的学习元数据（JSON）
+    - learned / learning_stats：每个用户的已学习队列（按 seq 排序）和统计信息
+
+    数据库只负责保存；复习选择和未学习单词的抽取仍由内存中的调度器和未学习单词池完成
+    （随学习进度和单词库增删增量维护）。
+    """
+
+    def __init__(self, path: str = "learning.db"):
+        self.path = path
+        # 事务由 transaction() 显式控制；连接只在事件循环中使用，不会被并发访问
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self._depth = 0  # 嵌套事务层数，只有最外层提交
+
+    @contextmanager
+    def transaction(self):
+        """事务（可嵌套，最外层退出时提交，出错时回滚）"""
+        if self._depth == 0:
+            self.conn.execute("BEGIN")
+        self._depth += 1
+        try:
+            yield self.conn
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute("ROLLBACK")
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.conn.execute("COMMIT")
+
+    def has_user(self, user_id: str) -> bool:
+        """用户是否已有学习进度"""
+        return any(self.conn.execute(f"SELECT 1 FROM {table} WHERE user_id = ? LIMIT 1", (user_id,)).fetchone()
+                   for table in ("learned", "learning_metadata"))
+
+    def copy_user(self, source: str, target: str):
+        """把一个用户的学习进度复制给另一个用户（目标用户已有的数据被覆盖）"""
+        with self.transaction() as conn:
+            for table, columns in (("learning_metadata", "word_id, data"),
+                                   ("learned", "word_id, seq"),
+                                   ("learning_stats", "data")):
+                conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (target,))
+                conn.execute(f"INSERT INTO {table} (user_id, {columns}) "
+                             f"SELECT ?, {columns} FROM {table} WHERE user_id = ?", (target, source))
+
+    def for_user(self, user_id: str) -> "SqliteLearningStore":
+        return SqliteLearningStore(self, user_id)
+
+    def close(self):
+        self.conn.close()
+
+
+class SqliteLearningStore:
+    """单个用户的学习元数据和学习状态（同时实现元数据存储与学习状态存储的接口）
+
+    元数据在内存中保留一份（调度器构建时需要全部读取），写入时同步更新数据库。
+    """
+
+    def __init__(self, db: SqliteLearningDB, user_id: str):
+        self.db = db
+        self.user_id = user_id
+        self._data: Dict[str, Dict] = self._load_metadata()
+        self._saved_queue: Dict[str, int] = {}  # 数据库中的已学习队列：单词ID -> seq
+
+    def _load_metadata(self) -> Dict[str, Dict]:
+        rows = self.db.conn.execute(
+            "SELECT word_id, data FROM learning_metadata WHERE user_id = ?", (self.user_id,))
+        return {word_id: json.loads(data) for word_id, data in rows}
+
+    # ---- 元数据存储接口 ----
+
+    def get(self, word_id: str) -> Optional[Dict]:
+        return self._data.get(word_id)
+
+    def update(self, word_id: str, changes: Dict[str, object]) -> Dict:
+        """合并更新学习元数据，返回更新后的元数据"""
+        lm = dict(self._data.get(word_id) or {})
+        lm.update(changes)
+        with self.db.transaction() as conn:
+            # 旧版本数据库中另有 review_count 等单独的列，可为空，不再写入
+            conn.execute("INSERT OR REPLACE INTO learning_metadata (user_id, word_id, data) VALUES (?, ?, ?)",
+                         (self.user_id, word_id, json.dumps(lm, ensure_ascii=False)))
+        self._data[word_id] = lm
+        return lm
+
+    def update_many(self, changes: Dict[str, Dict[str, object]]):
+        """在一个事务中写入多个单词的元数据变化"""
+        with self.db.transaction():
+            for word_id, fields in changes.items():
+                self.update(word_id, fields)
+
+    @contextmanager
+    def batch(self):
+        """一次表单提交中的全部更新在同一个事务中提交；出错回滚时重新加载内存中的元数据"""
+        try:
+            with self.db.transaction():
+                yield self
+        except BaseException:
+            self._data = self._load_metadata()
+            self._saved_queue = {}
+            raise
+
+    def close(self):
+        """数据已逐次提交，无需额外处理"""
+
+    # ---- 学习状态存储接口 ----
+
+    def load(self) -> List[str]:
+        """加载已学习队列"""
+        rows = self.db.conn.execute(
+            "SELECT word_id, seq FROM learned WHERE user_id = ? ORDER BY seq", (self.user_id,)).fetchall()
+        self._saved_queue = dict(rows)
+        return [word_id for word_id, _ in rows]
+
+    def save(self, old_queue: List[str], stats: Dict):
+        """保存学习状态：已学习队列只写入与上次保存相比的增删"""
+        if not self._saved_queue:
+            self.load()
+        current = set(old_queue)
+        removed = [word_id for word_id in self._saved_queue if word_id not in current]
+        added = [word_id for word_id in old_queue if word_id not in self._saved_queue]
+        next_seq = max(self._saved_queue.values(), default=-1) + 1
+        with self.db.transaction() as conn:
+            conn.executemany("DELETE FROM learned WHERE user_id = ? AND word_id = ?",
+                             ((self.user_id, word_id) for word_id in removed))
+            conn.executemany("INSERT INTO learned (user_id, word_id, seq) VALUES (?, ?, ?)",
+                             ((self.user_id, word_id, next_seq + i) for i, word_id in enumerate(added)))
+            conn.execute("INSERT OR REPLACE INTO learning_stats (user_id, data) VALUES (?, ?)",
+                         (self.user_id, json.dumps(stats, ensure_ascii=False)))
+        for word_id in removed:
+            del self._saved_queue[word_id]
+        for i, word_id in enumerate(added):
+            self._saved_queue[word_id] = next_seq + i
+
+
+def migrate(db: SqliteLearningDB, word_lib, state_path: str, users_dir: str):
+    """把JSON文件中的学习进度导入SQLite
+
+    - 单用户：单词库记录中的 learning_metadata 和 state_path（学习状态文件）导入为 "default" 用户
+    - 多用户：users_dir/<会话ID>/ 下的 learning_metadata.json 和 learning_state.json
+    """
+    from learning_metadata import JsonLearningState, UserMetadataStore
+
+    sources = []
+    if os.path.exists(state_path):
+        metadata = {word["id"]: word["learning_metadata"] for word in word_lib.all_words
+                    if word.get("learning_metadata")}
+        sources.append(("default", metadata, JsonLearningState(state_path).load()))
+    if os.path.isdir(users_dir):
+        for user_id in sorted(os.listdir(users_dir)):
+            user_dir = os.path.join(users_dir, user_id)
+            if not os.path.isdir(user_dir):
+                continue
+            store = UserMetadataStore(os.path.join(user_dir, "learning_metadata.json"))
+            metadata = dict(store.items())
+            store.close()
+            sources.append((user_id, metadata, JsonLearningState(os.path.join(user_dir, "learning_state.json")).load()))
+
+    for user_id, metadata, old_queue in sources:
+        store = db.for_user(user_id)
+        with store.batch():
+            for word_id, lm in metadata.items():
+                store.update(word_id, lm)
+            store.save(old_queue, {"total_learned": len(set(old_queue))})
+        print(f"用户 {user_id}: 导入 {len(metadata)} 条学习元数据，{len(old_queue)} 个已学习单词")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把JSON格式的学习进度迁移到SQLite")
+    parser.add_argument("--library", default="word_library.json", help="单词库文件")
+    parser.add_argument("--state", default="learning_state.json", help="单用户学习状态文件")
+    parser.add_argument("--users", default="users", help="多用户数据目录")
+    parser.add_argument("--db", default="learning.db", help="SQLite数据库文件")
+    args = parser.parse_args()
+
+    from word_library import WordLibrary
+
+    word_lib = WordLibrary(args.library)
+    db = SqliteLearningDB(args.db)
+    try:
+        migrate(db, word_lib, args.state, args.users)
+    finally:
+        db.close()
+        word_lib.close()
+
+
+if __name__ == "__main__":
+    main()
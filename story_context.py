@@ -0,0 +1,93 @@
+import hashlib
+import math
+import re
+from typing import List, Tuple
+from langchain.schema import HumanMessage, SystemMessage
+
+_CJK = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计token数：中文字符每个约1个token，其余约4个字符1个token"""
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def _digest(segment: str) -> str:
+    return hashlib.sha1(segment.encode('utf-8')).hexdigest()
+
+
+class StoryContext:
+    """故事提示词的上下文：最近 keep_recent 段保留原文，更早的段落合并为滚动摘要
+
+    摘要逐段增量更新（上一步的摘要 + 新移出窗口的段落 -> 新摘要），每一步的结果按段落内容缓存，
+    每段只计算一次；故事被删除或段落内容变化时，从第一个不同的段落开始重新计算。
+    """
+
+    def __init__(self, keep_recent: int = 3, summary_words: int = 150):
+        self.keep_recent = keep_recent
+        self.summary_words = summary_words
+        self._steps: List[Tuple[str, str]] = []  # 已合并进摘要的段落：(段落哈希, 合并该段后的摘要)
+
+    @property
+    def summary(self) -> str:
+        return self._steps[-1][1] if self._steps else ""
+
+    @property
+    def summarized(self) -> int:
+        """已合并进摘要的段落数"""
+        return len(self._steps)
+
+    def pending(self, segments: List[str]) -> List[Tuple[int, str]]:
+        """需要合并进摘要的 (段落序号, 段落)"""
+        for i, (digest, _) in enumerate(self._steps):
+            if i >= len(segments) or _digest(segments[i]) != digest:
+                del self._steps[i:]
+                break
+        end = max(0, len(segments) - self.keep_recent)
+        return [(i, segments[i]) for i in range(len(self._steps), end)]
+
+    def summary_messages(self, segment: str) -> List:
+        if self.summary:
+            prompt = f"""以下是一个故事此前情节的摘要和紧接着的一个新段落：
+摘要：{self.summary}
+
+新段落：{segment}
+
+请把新段落的内容合并进摘要，输出更新后的摘要。要求：
+1. 你的回复应当仅包含摘要，不应该出现其它任何与摘要无关的回复内容；
+2. 用英文书写，不超过{self.summary_words}个单词；
+3. 保留主要人物、关键事件和尚未解决的情节线索；
+"""
+        else:
+            prompt = f"""请为以下故事段落写一个摘要：
+{segment}
+
+要求：
+1. 你的回复应当仅包含摘要，不应该出现其它任何与摘要无关的回复内容；
+2. 用英文书写，不超过{self.summary_words}个单词；
+3. 保留主要人物、关键事件和尚未解决的情节线索；
+"""
+        return [SystemMessage(content="你是一个专业的故事编辑"),
+                HumanMessage(content=prompt)]
+
+    def fold(self, index: int, segment: str, summary: str):
+        """记录第index段合并进摘要后的结果（并发调用重复计算时只保留第一次的结果）"""
+        if index == len(self._steps):
+            self._steps.append((_digest(segment), summary.strip()))
+
+    def render(self, background: str, segments: List[str]) -> str:
+        """构建提示词中的故事上下文：背景 + 摘要 + 最近段落原文（段落编号与完整故事一致）"""
+        self.pending(segments)  # 丢弃与当前段落不一致的摘要
+        summarized = self.summarized
+        context = f"背景设定：{background}\n"
+        if summarized:
+            context += f"此前情节摘要（段落1-{summarized}）：{self.summary}\n"
+        if len(segments) > summarized:
+            context += "已有的故事段落：\n" if not summarized else "最近的故事段落：\n"
+            for i, segment in enumerate(segments[summarized:], summarized + 1):
+                context += f"段落{i}: {segment}\n"
+        return context
+
+    def reset(self):
+        self._steps = []
@@ -1,9 +1,15 @@
+import asyncio
+import hashlib
 import json
 import re
 import math
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
+from llm_limits import upstream_semaphore
+from llm_json import extract_json, require_keys
+from retry_policy import RetryPolicy
+from story_context import StoryContext, estimate_tokens
 
 class StoryCreator:
 
@@ -11,17 +17,77 @@ class StoryCreator:
                  api_key: str,
                  base_url: str = "https://cloud.infini-ai.com/maas/v1",
                  model: str = "deepseek-v3",
-                 temperature: float = 0):
+                 temperature: float = 0,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 context_segments: int = 3,
+                 max_speculations: int = 20):
         self.llm = ChatOpenAI(
             api_key=api_key,
             base_url=base_url,
             model=model,
             temperature=temperature
         )
+        self.base_url = base_url
+        self.retry_policy = retry_policy or RetryPolicy()
         self.history = {
             "background": "",
             "story_segments": []
         }
+        self.context = StoryContext(keep_recent=context_segments)  # 更早的段落以摘要形式放入提示词
+        self._summary_task: Optional[asyncio.Task] = None  # 加入段落后在后台更新摘要，提示词只读取已有的摘要
+        self.next_pool: Optional[List[str]] = None  # 下一段续写使用的单词池（续写页面展示的就是它）
+
+        # 预先续写：加入段落后立即在后台用 next_pool 续写下一段，AI续写时若单词池和故事都未变化则直接使用
+        self.max_speculations = max_speculations  # 每个会话最多预先续写的次数
+        self._speculation: Optional[Tuple[str, List[str], asyncio.Task]] = None  # (故事哈希, 单词池, 任务)
+        self.speculation_stats = {"started": 0, "served": 0, "discarded": 0}
+
+    def _summarize(self):
+        """把移出最近段落窗口的段落合并进摘要（失败时这些段落暂时以原文放入提示词）"""
+        for index, segment in self.context.pending(self.history["story_segments"]):
+            try:
+                response = self.llm.invoke(self.context.summary_messages(segment))
+            except Exception as e:
+                print(f"警告: 生成故事摘要失败: {e}")
+                return
+            self.context.fold(index, segment, response.content)
+
+    async def _asummarize(self):
+        """_summarize 的异步版本，运行期间新移出窗口的段落也会依次合并"""
+        while True:
+            pending = self.context.pending(self.history["story_segments"])
+            if not pending:
+                return
+            index, segment = pending[0]
+            try:
+                response = await self._ainvoke(self.context.summary_messages(segment))
+            except Exception as e:
+                print(f"警告: 生成故事摘要失败: {e}")
+                return
+            self.context.fold(index, segment, response.content)
+
+    def _start_summary(self):
+        """在后台更新摘要（同一时间只有一个任务，按段落顺序合并，每段只请求一次）"""
+        if self._summary_task is not None and not self._summary_task.done():
+            return
+        if self.context.pending(self.history["story_segments"]):
+            self._summary_task = asyncio.create_task(self._asummarize())
+
+    async def wait_for_summary(self):
+        """等待后台的摘要更新完成"""
+        if self._summary_task is not None:
+            await asyncio.shield(self._summary_task)
+
+    def _log_prompt(self, name: str, messages: List):
+        tokens = sum(estimate_tokens(m.content) for m in messages)
+        segments = len(self.history["story_segments"])
+        summarized = self.context.summarized
+        print(f"{name}: 提示词约 {tokens} tokens（摘要 {summarized} 段，原文 {segments - summarized} 段）")
+
+    async def _ainvoke(self, messages):
+        """异步调用模型，受同一上游服务的并发上限约束"""
+        async with upstream_semaphore(self.base_url):
+            return await self.llm.ainvoke(messages)
 
     def generate_background(self, framework: str = "") -> str:
         """
@@ -33,6 +99,15 @@ class StoryCreator:
         Returns:
             生成的小说背景
         """
+        response = self.llm.invoke(self._background_messages(framework))
+        return self._set_background(response.content)
+
+    async def agenerate_background(self, framework: str = "") -> str:
+        """generate_background 的异步版本"""
+        response = await self._ainvoke(self._background_messages(framework))
+        return self._set_background(response.content)
+
+    def _background_messages(self, framework: str) -> List:
         if framework:
             prompt = f"""你需要基于以下内容生成一个简单的小说故事背景：
 {framework}
@@ -52,9 +127,11 @@ class StoryCreator:
 3. 语言简洁，控制在100-150个英文单词，用词不要过于文学化；
 4. 背景设定完整但不复杂；"""
             
-        response = self.llm.invoke([SystemMessage(content="你是一个富有创造力的故事创作者"), 
-                                   HumanMessage(content=prompt)])
-        background = response.content.strip()
+        return [SystemMessage(content="你是一个富有创造力的故事创作者"), 
+                HumanMessage(content=prompt)]
+
+    def _set_background(self, content: str) -> str:
+        background = content.strip()
         self.history["background"] = background
         return background
     
@@ -68,17 +145,32 @@ class StoryCreator:
         Returns:
             新续写的故事段落
         """
+        messages = self._continue_messages(word_pool, end)
+        self._log_prompt("continue_story", messages)
+        response = self.llm.invoke(messages)
+        return response.content.strip()
+
+    async def acontinue_story(self, word_pool: List[str], end: bool = False) -> str:
+        """continue_story 的异步版本"""
+        messages = self._continue_messages(word_pool, end)
+        self._log_prompt("continue_story", messages)
+        response = await self._ainvoke(messages)
+        return response.content.strip()
+
+    async def astream_continue_story(self, word_pool: List[str], end: bool = False) -> AsyncIterator[str]:
+        """流式续写故事，逐段产出生成的文本"""
+        messages = self._continue_messages(word_pool, end)
+        self._log_prompt("continue_story", messages)
+        async with upstream_semaphore(self.base_url):
+            async for chunk in self.llm.astream(messages):
+                if chunk.content:
+                    yield chunk.content
+
+    def _continue_messages(self, word_pool: List[str], end: bool) -> List:
         min_count = len(word_pool) // 4
-        background = self.history["background"]
-        previous_segments = self.history["story_segments"]
-        
-        # 构建故事上下文
-        context = f"背景设定：{background}\n"
-        if previous_segments:
-            context += "已有的故事段落：\n"
-            for i, segment in enumerate(previous_segments, 1):
-                context += f"段落{i}: {segment}\n"
-                
+        # 构建故事上下文（较早的段落以摘要代替）
+        context = self.context.render(self.history["background"], self.history["story_segments"])
+
         if end:
             prompt = f"""请基于以下内容为故事续写一段结尾：
 {context}
@@ -103,10 +195,8 @@ class StoryCreator:
 5. 段落长度控制在150-200个英文单词，用词不要过于文学化；
 """
         
-        response = self.llm.invoke([SystemMessage(content="你是一个专业的故事续写者"), 
-                                   HumanMessage(content=prompt)])
-        new_segment = response.content.strip()
-        return new_segment
+        return [SystemMessage(content="你是一个专业的故事续写者"), 
+                HumanMessage(content=prompt)]
     
     def evaluate_and_improve(self, user_segment: str) -> Dict:
         """
@@ -118,16 +208,26 @@ class StoryCreator:
         Returns:
             包含评价结果、修改意见和修改后段落的字典
         """
-        background = self.history["background"]
-        previous_segments = self.history["story_segments"]
-        
-        # 构建评价提示
-        context = f"背景设定：{background}\n"
-        if previous_segments:
-            context += "已有的故事段落：\n"
-            for i, segment in enumerate(previous_segments, 1):
-                context += f"段落{i}: {segment}\n"
-        
+        messages = self._evaluate_messages(user_segment)
+        self._log_prompt("evaluate_and_improve", messages)
+        return self.retry_policy.run(
+            "evaluate_and_improve",
+            lambda: self._parse_evaluation(self.llm.invoke(messages).content))
+
+    async def aevaluate_and_improve(self, user_segment: str) -> Dict:
+        """evaluate_and_improve 的异步版本"""
+        messages = self._evaluate_messages(user_segment)
+        self._log_prompt("evaluate_and_improve", messages)
+
+        async def attempt():
+            response = await self._ainvoke(messages)
+            return self._parse_evaluation(response.content)
+        return await self.retry_policy.arun("evaluate_and_improve", attempt)
+
+    def _evaluate_messages(self, user_segment: str) -> List:
+        # 构建评价提示（较早的段落以摘要代替）
+        context = self.context.render(self.history["background"], self.history["story_segments"])
+
         prompt = f"""请对用户提供的故事段落进行专业评价：
 {context}
 
@@ -148,28 +248,73 @@ class StoryCreator:
     "improved_segment": "修改后的完整段落"
 }}"""
         
-        response = self.llm.invoke([SystemMessage(content="你是一个专业的英语文学编辑"), 
-                                   HumanMessage(content=prompt)])
-        content = response.content.strip()
+        return [SystemMessage(content="你是一个专业的英语文学编辑"), 
+                HumanMessage(content=prompt)]
+
+    def _parse_evaluation(self, content: str) -> Dict:
+        content = content.strip()
         
-        # 提取JSON结果
-        start_index = content.find('{')
-        end_index = content.rfind('}')
-        if start_index == -1 or end_index == -1 or end_index <= start_index:
-            raise ValueError("未检测到有效的评价结果JSON结构")
-        json_str = content[start_index:end_index+1]
+        # 提取JSON结果并验证结果结构
+        result = extract_json(content)
+        return require_keys(result, ["evaluation", "suggestions", "improved_segment"])
+    
+    def _history_key(self) -> str:
+        return hashlib.sha1(json.dumps([self.history["background"], self.history["story_segments"]],
+                                       ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def speculate(self, word_pool: List[str]):
+        """在后台预先续写下一段（需要在事件循环中调用），超过本会话的次数上限后不再预先续写"""
+        key = self._history_key()
+        if self._speculation is not None and self._speculation[:2] == (key, word_pool):
+            return
+        self.discard_speculation()
+        if self.speculation_stats["started"] >= self.max_speculations:
+            return
+        self.speculation_stats["started"] += 1
+        task = asyncio.create_task(self._speculate_story(word_pool))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())  # 未被使用的失败结果不再告警
+        self._speculation = (key, list(word_pool), task)
+
+    async def _speculate_story(self, word_pool: List[str]) -> str:
+        # 预先续写本来就在后台进行，可以先等摘要更新完，提示词更短
+        await self.wait_for_summary()
+        return await self.acontinue_story(word_pool)
+
+    async def take_speculation(self, word_pool: List[str], end: bool = False) -> Optional[str]:
+        """取出预先续写的段落（单词池或故事已变化、生成失败时返回None，由调用方实时续写）"""
+        speculation, self._speculation = self._speculation, None
+        if speculation is None:
+            return None
+        key, pool, task = speculation
+        if end or pool != word_pool or key != self._history_key():
+            self._speculation = speculation
+            self.discard_speculation()
+            return None
         try:
-            result = json.loads(json_str)
-        except json.JSONDecodeError:
-            raise ValueError("评价结果JSON解析失败")
-        
-        # 验证结果结构
-        required_keys = ["evaluation", "suggestions", "improved_segment"]
-        if not all(key in result for key in required_keys):
-            raise ValueError("评价结果缺少必要字段")
+            segment = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._speculation is None:
+                self._speculation = speculation  # 请求被取消（例如页面关闭），保留给下一次请求
+            raise
+        except Exception as e:
+            print(f"警告: 预先续写故事失败: {e}")
+            self.speculation_stats["discarded"] += 1
+            return None
+        self.speculation_stats["served"] += 1
+        return segment
+
+    def busy(self) -> bool:
+        """是否有预先续写或摘要更新在进行"""
+        summarizing = self._summary_task is not None and not self._summary_task.done()
+        return summarizing or (self._speculation is not None and not self._speculation[2].done())
+
+    def discard_speculation(self):
+        """丢弃（并取消）尚未使用的预先续写"""
+        if self._speculation is not None:
+            self._speculation[2].cancel()
+            self._speculation = None
+            self.speculation_stats["discarded"] += 1
 
-        return result
-    
     def get_full_story(self) -> str:
         """获取完整的故事内容（背景+所有段落）"""
         if not self.history["background"]:
@@ -186,8 +331,25 @@ class StoryCreator:
         return story
     
     def append(self, content: str = ""):
+        """加入段落，并把移出最近段落窗口的段落合并进摘要（在事件循环中时在后台进行）"""
         self.history['story_segments'].append(content)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._summarize()
+            return
+        self._start_summary()
 
     def delete_story(self):
         self.history['background'] = ''
-        self.history['story_segments'] = []
\ No newline at end of file
+        self.history['story_segments'] = []
+        self.close()
+        self.context.reset()
+        self.next_pool = None
+
+    def close(self):
+        """取消后台的摘要更新和预先续写"""
+        if self._summary_task is not None:
+            self._summary_task.cancel()
+            self._summary_task = None
+        self.discard_speculation()
\ No newline at end of file
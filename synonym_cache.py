@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import json
+from collections import OrderedDict
+from typing import Dict, Optional
+from word_store import atomic_write_text
+
+
+def normalize_word(word: str) -> str:
+    return word.strip().lower()
+
+
+class SynonymCache:
+    """近义词查询的磁盘缓存
+
+    键为小写单词，整个缓存带版本号（模型名+提示词的哈希），版本变化时旧内容全部作废；
+    超出容量时按LRU淘汰。
+    """
+
+    def __init__(self,
+                 version: str,
+                 file_path: str = "synonym_cache.json",
+                 max_entries: int = 5000,
+                 save_every: int = 20):
+        self.version = version
+        self.file_path = file_path
+        self.max_entries = max_entries
+        self.save_every = save_every  # 每写入多少条保存一次文件（退出时也会保存）
+        self.entries: "OrderedDict[str, Dict]" = self._load()
+        self._unsaved = 0
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> "OrderedDict[str, Dict]":
+        """从文件加载缓存，版本不一致时丢弃"""
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                if isinstance(data, dict) and data.get("version") == self.version:
+                    return OrderedDict(data.get("entries", {}))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        return OrderedDict()
+
+    def save(self):
+        """保存缓存到文件"""
+        atomic_write_text(self.file_path, json.dumps({
+            "version": self.version,
+            "entries": self.entries
+        }, ensure_ascii=False))
+        self._unsaved = 0
+
+    def get(self, word: str) -> Optional[Dict]:
+        key = normalize_word(word)
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, word: str, result: Dict):
+        key = normalize_word(word)
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+class SynonymService:
+    """近义词查询：单词库记录 -> 磁盘缓存 -> LLM
+
+    单词库中的单词会把结果保存在记录的 "synonyms" 字段中（与 root_explanation 类似）。
+    """
+
+    def __init__(self, llm, cache: SynonymCache, word_lib=None):
+        self.llm = llm
+        self.cache = cache
+        self.word_lib = word_lib
+
+    def _stored(self, word: str) -> Optional[Dict]:
+        """读取单词库记录中保存的近义词结果"""
+        if self.word_lib is None:
+            return None
+        for record in self.word_lib.find_by_word(word):
+            stored = record.get("synonyms")
+            if isinstance(stored, dict) and stored.get("version") == self.cache.version:
+                return stored["items"]
+        return None
+
+    def _store(self, word: str, result: Dict):
+        if self.word_lib is None:
+            return
+        for record in self.word_lib.find_by_word(word):
+            self.word_lib.update_word(record["id"], {
+                "synonyms": {"version": self.cache.version, "items": result}
+            })
+
+    async def lookup(self, word: str) -> Dict:
+        key = normalize_word(word)
+        result = self._stored(key)
+        if result is not None:
+            self.cache.hits += 1
+            return result
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+        result = await self.llm.aget_synonyms(key)
+        # 空结果可能是生成失败，不写入缓存
+        if result:
+            self.cache.put(key, result)
+            self._store(key, result)
+        return result
+
+
+async def warm(service: SynonymService, words, concurrency: int):
+    """为一批单词预先生成近义词（并发数另受LLM上游并发上限约束）"""
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def one(word):
+        nonlocal done
+        async with semaphore:
+            try:
+                await service.lookup(word)
+            except Exception as e:
+                print(f"警告: 单词 {word} 的近义词生成失败: {e}")
+        done += 1
+        if done % 50 == 0:
+            print(f"已完成 {done}/{len(words)}")
+
+    await asyncio.gather(*(one(word) for word in words))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为单词库中的所有单词预热近义词缓存")
+    parser.add_argument("--library", default="word_library.json", help="单词库文件")
+    parser.add_argument("--cache", default="synonym_cache.json", help="缓存文件")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--api-key", default=None)
+    args = parser.parse_args()
+
+    from llm import LLM
+    from word_library import WordLibrary
+
+    api_key = args.api_key or str(input("Please enter your infini_ai API_KEY: "))
+    llm = LLM(api_key=api_key)
+    word_lib = WordLibrary(args.library)
+    cache = SynonymCache(llm.synonym_version(), args.cache)
+    service = SynonymService(llm, cache, word_lib)
+
+    # 同一单词只查询一次，已有结果的跳过
+    words = sorted({normalize_word(str(w["word"])) for w in word_lib.all_words})
+    pending = [w for w in words if service._stored(w) is None and w not in cache.entries]
+    print(f"单词库共 {len(words)} 个单词，需要生成 {len(pending)} 个")
+    try:
+        asyncio.run(warm(service, pending, args.concurrency))
+    finally:
+        cache.save()
+        word_lib.close()
+
+
+if __name__ == "__main__":
+    main()
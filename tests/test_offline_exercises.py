@@ -0,0 +1,36 @@
+import json
+
+from inflection import InflectionIndex
+from offline_exercises import ExampleIndex
+from word_library import WordLibrary
+from word_store import convert
+
+
+def test_examples_stay_in_the_binary_library(tmp_path):
+    words = [
+        {"id": "w0", "word": "study", "translation": "学习", "example": "She studies every night. - 她每晚学习。"},
+        {"id": "w1", "word": "night", "translation": "夜晚", "example": "The night was quiet. - 夜很安静。"},
+        {"id": "w2", "word": "quiet", "translation": "安静的", "example": None},
+    ]
+    (tmp_path / "library.json").write_text(json.dumps(words, ensure_ascii=False), encoding='utf-8')
+    convert(str(tmp_path / "library.json"), str(tmp_path / "library.wlib"))
+    word_lib = WordLibrary(str(tmp_path / "library.wlib"))
+    try:
+        index = ExampleIndex(word_lib, InflectionIndex())
+        assert len(index) == 2
+        # 建立索引后例句仍只在文件映射中，没有读入单词记录
+        assert not any(dict.__contains__(word, "example") for word in word_lib.all_words)
+
+        exercise = index.cloze([word_lib.get_word("w0"), word_lib.get_word("w2")])
+        assert exercise["sentence"] == "She ____ every night. The night was ____."
+        assert exercise["answer_list"] == ["studies", "quiet"]
+        assert index.examples_for("w2") == ["w1"]
+
+        # 例句在使用时才从单词库读取，修改后立即生效
+        word_lib.update_word("w1", {"example": "The night was very quiet. - 夜非常安静。"})
+        assert index.cloze([word_lib.get_word("w2")])["sentence"] == "The night was very ____."
+
+        word_lib.remove_word("w1")
+        assert index.examples_for("w2") == []
+    finally:
+        word_lib.close()
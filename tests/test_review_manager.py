@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from review_manager import ReviewManager
+from word_library import WordLibrary
+
+
+@pytest.fixture
+def manager(tmp_path):
+    words = [{"id": f"w{i}", "word": f"word{i}", "translation": f"释义{i}", "metadata": {}} for i in range(10)]
+    (tmp_path / "library.json").write_text(json.dumps(words), encoding='utf-8')
+    state_path = tmp_path / "learning_state.json"
+    state_path.write_text(json.dumps({"old_queue": ["w0", "w1", "w2"], "stats": {}}), encoding='utf-8')
+    word_lib = WordLibrary(str(tmp_path / "library.json"))
+    review_manager = ReviewManager(word_lib, str(state_path))
+    with review_manager.unit_of_work():
+        for word_id in ("w0", "w1", "w2"):
+            review_manager.process_word(word_id, "keep")
+    review_manager.init_current_queue()
+    yield review_manager
+    word_lib.close()
+
+
+def state(review_manager):
+    return (review_manager.current_queue.to_list(), review_manager.old_queue.to_list(),
+            set(review_manager.learned_words), len(review_manager.unlearned), dict(review_manager.stats),
+            {word_id: review_manager.metadata.get(word_id) for word_id in review_manager.word_lib.word_ids})
+
+
+def submit(review_manager):
+    new_word = review_manager.current_queue[0]
+    review_manager.process_word(new_word, "keep")
+    review_manager.process_word_selection(["w0"], ["w1", "w2"])
+
+
+def test_error_in_block_restores_state(manager):
+    before = state(manager)
+    with pytest.raises(RuntimeError):
+        with manager.unit_of_work():
+            submit(manager)
+            raise RuntimeError("请求处理失败")
+    assert state(manager) == before
+    assert [w["id"] for w in manager.select_smart_review_words(10)]
+
+
+def test_error_while_writing_restores_state(manager, monkeypatch):
+    before = state(manager)
+
+    def fail(op, sync=False):
+        raise OSError("磁盘已满")
+
+    monkeypatch.setattr(manager.word_lib.journal, "append", fail)
+    with pytest.raises(OSError):
+        with manager.unit_of_work():
+            submit(manager)
+    assert state(manager) == before
+    monkeypatch.undo()
+
+    with manager.unit_of_work():
+        submit(manager)
+    assert "w0" not in manager.old_queue and len(manager.learned_words) == 4
@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+import pytest
+
+from fake_chat import FakeChatModel
+from llm import LLM
+from retry_policy import LLMRetryError, RetryPolicy
+from review_manager import ReviewManager
+from sentence_cache import SentenceCache, SentencePrefetcher
+from word_library import WordLibrary
+from word_store import convert
+
+
+def make_llm(latency: float = 0.05, responder=None, retry_policy=None) -> LLM:
+    llm = LLM(api_key="offline", retry_policy=retry_policy)
+    llm.llm = FakeChatModel(latency=latency, responder=responder)
+    return llm
+
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    llm = make_llm()
+    partials = []
+
+    async def on_partial(fields):
+        partials.append(fields)
+
+    async def main():
+        # 一半的调用者以流式方式调用
+        return await asyncio.gather(*(llm.amake_sentence("study", ["apple"], on_partial=on_partial if i % 2 == 0 else None)
+                                      for i in range(8)))
+
+    results = asyncio.run(main())
+    assert llm.llm.calls == 1
+    assert all(result == results[0] for result in results)
+    assert all(result is not results[0] for result in results[1:])  # 其他调用者拿到副本
+    assert partials
+    assert len(llm.single_flight) == 0
+
+
+def test_different_prompts_are_not_coalesced():
+    llm = make_llm()
+
+    async def main():
+        await asyncio.gather(*(llm.amake_sentence(f"word{i}", []) for i in range(4)))
+
+    asyncio.run(main())
+    assert llm.llm.calls == 4
+
+
+def test_cancelled_follower_does_not_cancel_the_call():
+    llm = make_llm(latency=0.2)
+
+    async def main():
+        leader = asyncio.create_task(llm.amake_sentence("study", []))
+        follower = asyncio.create_task(llm.amake_sentence("study", []))
+        await asyncio.sleep(0.05)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    result = asyncio.run(main())
+    assert "study" in result["sentence"]
+    assert llm.llm.calls == 1
+
+
+def test_cancelled_leader_does_not_cancel_the_call():
+    llm = make_llm(latency=0.2)
+
+    async def main():
+        leader = asyncio.create_task(llm.amake_sentence("study", []))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(llm.amake_sentence("study", []))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        return await follower
+
+    result = asyncio.run(main())
+    assert "study" in result["sentence"]
+    assert llm.llm.calls == 1
+
+
+def test_leader_error_reaches_all_callers():
+    llm = make_llm(responder=lambda messages: "not json", retry_policy=RetryPolicy(max_attempts=1))
+
+    async def main():
+        return await asyncio.gather(*(llm.amake_sentence("study", []) for _ in range(4)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert llm.llm.calls == 1
+    assert all(isinstance(result, LLMRetryError) for result in results)
+    assert len(llm.single_flight) == 0
+
+
+def test_live_sentence_shared_with_binary_library(tmp_path):
+    words = [{"id": f"w{i}", "word": f"word{i}", "translation": f"释义{i}",
+              "example": f"An example for word{i}.", "metadata": {}} for i in range(20)]
+    json_path = tmp_path / "library.json"
+    json_path.write_text(json.dumps(words, ensure_ascii=False), encoding='utf-8')
+    convert(str(json_path), str(tmp_path / "library.wlib"))
+    state_path = tmp_path / "learning_state.json"
+    state_path.write_text(json.dumps({"old_queue": [f"w{i}" for i in range(1, 20)], "stats": {}}), encoding='utf-8')
+
+    word_lib = WordLibrary(str(tmp_path / "library.wlib"))
+    try:
+        review_manager = ReviewManager(word_lib, str(state_path))
+        llm = make_llm()
+        prefetcher = SentencePrefetcher(llm, review_manager, SentenceCache(str(tmp_path / "cache.json")))
+
+        async def main():
+            return await asyncio.gather(*(prefetcher.generate_live("w0") for _ in range(3)))
+
+        results = asyncio.run(main())
+    finally:
+        word_lib.close()
+    assert llm.llm.calls == 1
+    pools = [pool for pool, _ in results]
+    assert pools[0] and all(pool == pools[0] for pool in pools)
+    assert all(set(w) == {"id", "word"} for w in pools[0])
+    assert all(data == results[0][1] for _, data in results)
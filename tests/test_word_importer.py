@@ -0,0 +1,70 @@
+import json
+
+import word_importer
+from word_importer import import_books, iter_json_records
+from word_library import WordLibrary
+
+
+def entry(rank: int) -> dict:
+    head = f"word{rank}"
+    return {
+        "wordRank": rank,
+        "headWord": head,
+        "content": {"word": {"wordHead": head, "content": {
+            "trans": [{"tranCn": f"释义{rank}"}],
+            "usphone": head
+        }}},
+        "bookId": "TEST_1"
+    }
+
+
+def write_book(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in lines:
+            f.write(line + "\n")
+
+
+def test_bad_line_in_the_middle(tmp_path, monkeypatch, capsys):
+    # 块很小，使出错的记录之后还要读取许多块
+    monkeypatch.setattr(word_importer, "_CHUNK_SIZE", 256)
+    lines = [json.dumps(entry(rank)) for rank in range(1, 2001)]
+    lines.insert(10, '{"wordRank": 11, "headWord": "broken", "content": ')
+    book = tmp_path / "book.json"
+    write_book(book, lines)
+
+    records = list(iter_json_records(str(book)))
+    assert records.count(None) == 1
+    assert [r["wordRank"] for r in records if r is not None] == list(range(1, 2001))
+    assert "不完整" not in capsys.readouterr().out
+
+    word_lib = WordLibrary(str(tmp_path / "library.json"))
+    try:
+        counts = import_books(word_lib, [str(book)])
+    finally:
+        word_lib.close()
+    assert counts == {"read": 2001, "imported": 2000, "duplicate": 0, "invalid": 1}
+
+
+def test_bad_records_in_a_json_array(tmp_path):
+    book = tmp_path / "book.json"
+    text = "[\n" + ",\n".join([json.dumps(entry(1)), '{"headWord": oops}', json.dumps(entry(2))]) + "\n]\n"
+    book.write_text(text, encoding='utf-8')
+    records = list(iter_json_records(str(book)))
+    assert records[0]["wordRank"] == 1 and records[1] is None and records[2]["wordRank"] == 2
+
+
+def test_record_split_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(word_importer, "_CHUNK_SIZE", 7)
+    book = tmp_path / "book.json"
+    # 多行格式的记录也会被块截断，不能当作无效记录
+    book.write_text("[\n" + ",\n".join(json.dumps(entry(rank), indent=2) for rank in range(1, 4)) + "\n]",
+                    encoding='utf-8')
+    assert [r["wordRank"] for r in iter_json_records(str(book))] == [1, 2, 3]
+
+
+def test_truncated_last_record(tmp_path, capsys):
+    book = tmp_path / "book.json"
+    book.write_text(json.dumps(entry(1)) + "\n" + json.dumps(entry(2))[:30], encoding='utf-8')
+    records = list(iter_json_records(str(book)))
+    assert records[0]["wordRank"] == 1 and records[1:] == [None]
+    assert "不完整" in capsys.readouterr().out
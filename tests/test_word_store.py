@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from word_library import WordLibrary
+from word_store import JsonSnapshot, WordJournal
+
+
+def test_rotate_keeps_leftover_journal(tmp_path):
+    journal = WordJournal(str(tmp_path / "library.json.journal"))
+    journal.append({"op": "meta", "id": "a", "fields": {"review_count": 1}})
+    journal.rotate()  # 压缩开始后中途退出，旧日志留在 .compacting
+    with open(journal.rotated_path, 'a', encoding='utf-8') as f:
+        f.write('{"op": "meta", "id": "a", "fi')  # 写了一半的记录
+    journal.append({"op": "meta", "id": "b", "fields": {"review_count": 2}})
+    journal.rotate()
+    assert [op["id"] for op in journal.replay()] == ["a", "b"]
+
+
+def test_crash_during_recovery_keeps_records(tmp_path, monkeypatch):
+    path = str(tmp_path / "library.json")
+    words = [{"id": f"w{i}", "word": f"word{i}", "metadata": {}} for i in range(3)]
+    (tmp_path / "library.json").write_text(json.dumps(words), encoding='utf-8')
+
+    def crash(self, prepared):
+        raise OSError("写入快照时退出")
+
+    # 压缩中途退出：w0 的记录留在 .compacting，之后的 w1 写入新日志
+    word_lib = WordLibrary(path)
+    word_lib.update_metadata("w0", {"review_count": 1})
+    monkeypatch.setattr(JsonSnapshot, "write", crash)
+    with pytest.raises(OSError):
+        word_lib.compact()
+    word_lib.update_metadata("w1", {"review_count": 2})
+    word_lib.journal.close()
+
+    # 启动时的恢复压缩再次中途退出
+    with pytest.raises(OSError):
+        WordLibrary(path)
+    monkeypatch.undo()
+
+    word_lib = WordLibrary(path)
+    try:
+        assert word_lib.get_word("w0")["learning_metadata"] == {"review_count": 1}
+        assert word_lib.get_word("w1")["learning_metadata"] == {"review_count": 2}
+    finally:
+        word_lib.close()
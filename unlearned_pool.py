@@ -0,0 +1,206 @@
+import bisect
+import itertools
+import math
+import random
+import weakref
+from typing import Callable, Container, Dict, List, Optional, Tuple
+
+# 新单词的出题顺序
+ORDER_STRATEGIES = ("random", "list", "frequency", "difficulty")
+
+
+def _number(value) -> Optional[float]:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _frequency_rank(word: Dict) -> Optional[float]:
+    """词频排名：metadata.frequency_rank，没有时用词书导入时记录的序号 metadata.book_rank（词书按常用程度排列）"""
+    metadata = word.get("metadata") or {}
+    rank = _number(metadata.get("frequency_rank"))
+    return _number(metadata.get("book_rank")) if rank is None else rank
+
+
+def _difficulty(word: Dict) -> Optional[float]:
+    return _number((word.get("metadata") or {}).get("difficulty"))
+
+
+def frequency_key(word: Dict) -> float:
+    """按词频排名（越小越常用），没有排名的排在最后"""
+    rank = _frequency_rank(word)
+    return math.inf if rank is None else rank
+
+
+def difficulty_key(word: Dict) -> float:
+    """按难度（metadata.difficulty），没有标注时用单词长度近似"""
+    difficulty = _difficulty(word)
+    return len(str(word.get("word", ""))) if difficulty is None else difficulty
+
+
+_SORT_KEYS: Dict[str, Callable[[Dict], float]] = {
+    "frequency": frequency_key,
+    "difficulty": difficulty_key,
+}
+
+# 排序所依据的数据（单词没有时使用的替代顺序），用于在整个单词库都没有数据时提示
+_SORT_DATA: Dict[str, Tuple[Callable[[Dict], Optional[float]], str, str]] = {
+    "frequency": (_frequency_rank, "metadata.frequency_rank / book_rank", "单词库顺序"),
+    "difficulty": (_difficulty, "metadata.difficulty", "单词长度"),
+}
+
+
+class OrderIndex:
+    """单词库按某种顺序预先排好的单词ID列表（所有用户共用，新增单词时按序插入）
+
+    删除的单词不从列表中移除，遍历时跳过单词库中已不存在的ID。
+    """
+
+    def __init__(self, word_lib, strategy: str):
+        self.word_lib = word_lib
+        self._key = _SORT_KEYS.get(strategy)
+        self._seq = 0
+        self._pools: "weakref.WeakSet[UnlearnedPool]" = weakref.WeakSet()  # 使用该索引的未学习单词池
+        self._keys: List[Tuple[float, int]] = []  # (排序键, 加入序号)，与 ids 一一对应
+        self.ids: List[str] = []
+        entries = [self._entry(word) for word in word_lib.all_words]
+        entries.sort(key=lambda e: e[0])
+        self._keys = [e[0] for e in entries]
+        self.ids = [e[1] for e in entries]
+        word_lib.add_listener(self)
+        if strategy in _SORT_DATA:
+            has_data, field, fallback = _SORT_DATA[strategy]
+            if entries and not any(has_data(word) is not None for word in word_lib.all_words):
+                print(f"警告: 单词库中没有单词带有 {field}，新单词顺序 {strategy} 实际按{fallback}排列")
+
+    def attach(self, pool: "UnlearnedPool"):
+        self._pools.add(pool)
+
+    def _entry(self, word: Dict) -> Tuple[Tuple[float, int], str]:
+        key = (self._key(word) if self._key else 0, self._seq)  # 单词库顺序作为第二排序键
+        self._seq += 1
+        return key, word["id"]
+
+    def words_added(self, words: List[Dict]):
+        entries = sorted((self._entry(word) for word in words), key=lambda e: e[0])
+        if not entries:
+            return
+        position = bisect.bisect_right(self._keys, entries[0][0])  # 第一个新单词的位置
+        if len(entries) == 1:
+            self._keys.insert(position, entries[0][0])
+            self.ids.insert(position, entries[0][1])
+        else:
+            # 批量导入时合并两个有序序列一次（Timsort 识别出两段有序序列，O(N + k log k)），不逐个插入
+            merged = list(zip(self._keys, self.ids))
+            merged.extend(entries)
+            merged.sort(key=lambda e: e[0])
+            self._keys = [e[0] for e in merged]
+            self.ids = [e[1] for e in merged]
+        for pool in list(self._pools):
+            pool.inserted(position)
+
+    def word_removed(self, word_id: str):
+        """遍历时跳过"""
+
+
+_ORDER_INDEXES: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def order_index(word_lib, strategy: str) -> OrderIndex:
+    """获取（必要时构建）单词库的排序索引"""
+    indexes = _ORDER_INDEXES.setdefault(word_lib, {})
+    if strategy not in indexes:
+        indexes[strategy] = OrderIndex(word_lib, strategy)
+    return indexes[strategy]
+
+
+class UnlearnedPool:
+    """某个用户的未学习单词池，随学习进度和单词库变化增量维护
+
+    - random：ID数组 + ID到下标的字典，删除时与最后一个元素交换，抽取k个单词为 O(k)
+    - list / frequency / difficulty：共用的预排序索引 + 游标，游标之前的单词都已学习（或已被删除），
+      每次从游标处向后取前k个未学习的单词。游标只由已学习集合决定，重启或会话重新加载后位置不变；
+      出过题但没有学会的单词下次仍会出现
+    """
+
+    def __init__(self, word_lib, learned: Container[str], strategy: str = "random"):
+        if strategy not in ORDER_STRATEGIES:
+            raise ValueError(f"未知的新单词顺序: {strategy}，可选 {ORDER_STRATEGIES}")
+        self.word_lib = word_lib
+        self.learned = learned
+        self.strategy = strategy
+        self._ids: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._order: Optional[OrderIndex] = None
+        self._cursor = 0
+        if strategy == "random":
+            for word_id in word_lib.word_ids:
+                if word_id not in learned:
+                    self._add(word_id)
+            word_lib.add_listener(self)
+        else:
+            self._order = order_index(word_lib, strategy)
+            self._order.attach(self)
+
+    def __len__(self) -> int:
+        if self._order is None:
+            return len(self._ids)
+        return sum(1 for word_id in self._order.ids[self._cursor:] if self._available(word_id))
+
+    def _available(self, word_id: str) -> bool:
+        return word_id not in self.learned and self.word_lib.get_word(word_id) is not None
+
+    def _add(self, word_id: str):
+        if word_id not in self._index:
+            self._index[word_id] = len(self._ids)
+            self._ids.append(word_id)
+
+    def discard(self, word_id: str):
+        """单词已学习或已被删除"""
+        i = self._index.pop(word_id, None)
+        if i is None:
+            return
+        last = self._ids.pop()
+        if last != word_id:
+            self._ids[i] = last
+            self._index[last] = i
+
+    def restore(self, word_ids: List[str]):
+        """单词重新变为未学习（工作单元回滚）"""
+        if not word_ids:
+            return
+        if self._order is None:
+            for word_id in word_ids:
+                if self._available(word_id):
+                    self._add(word_id)
+        else:
+            self._cursor = 0  # 游标可能已越过这些单词，下次抽取时重新跳过已学习的单词
+
+    def sample(self, count: int) -> List[str]:
+        """取出最多count个未学习的单词ID"""
+        if self._order is None:
+            picks = random.sample(range(len(self._ids)), min(count, len(self._ids)))
+            return [self._ids[i] for i in picks]
+        ids = self._order.ids
+        while self._cursor < len(ids) and not self._available(ids[self._cursor]):
+            self._cursor += 1
+        result = []
+        for word_id in itertools.islice(ids, self._cursor, None):
+            if len(result) >= count:
+                break
+            if self._available(word_id):
+                result.append(word_id)
+        return result
+
+    def inserted(self, position: int):
+        """排序索引中插入了新单词，position 为其中最靠前的位置（在游标之前时游标退回到该位置）"""
+        if position <= self._cursor:
+            self._cursor = position
+
+    # 单词库变化通知（random 顺序）
+
+    def words_added(self, words: List[Dict]):
+        for word in words:
+            if word["id"] not in self.learned:
+                self._add(word["id"])
+
+    def word_removed(self, word_id: str):
+        self.discard(word_id)
@@ -0,0 +1,125 @@
+import argparse
+import json
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+from word_library import WordLibrary, WordType, new_word_id
+
+_CHUNK_SIZE = 1 << 16
+
+
+def iter_json_records(path: str) -> Iterator[Optional[Dict]]:
+    """逐条读取词书文件中的记录，不把整个文件读入内存
+
+    支持 kajweb/dict 的词书格式（每行一个JSON对象），也支持由这些对象组成的JSON数组。
+    无法解析的记录返回None，并从该记录开始的下一行继续读取。
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        buffer = ""
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            buffer += chunk
+            pos = 0
+            while True:
+                # 跳过空白、数组的括号和分隔逗号
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,[]":
+                    pos += 1
+                if pos >= len(buffer):
+                    break
+                try:
+                    record, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as e:
+                    # 出错位置之后还有换行，说明不是被块的末尾截断，而是记录本身有误
+                    if buffer.find("\n", e.pos) != -1:
+                        yield None
+                        pos = buffer.index("\n", pos) + 1
+                        continue
+                    if not chunk:
+                        print(f"警告: {path} 末尾存在不完整的记录，已跳过")
+                        yield None
+                        pos = len(buffer)
+                    break  # 记录被块的末尾截断，读取下一块后继续
+                pos = end
+                if isinstance(record, dict):
+                    yield record
+            buffer = buffer[pos:]
+            if not chunk:
+                return
+
+
+def _first(items) -> Dict:
+    return items[0] if isinstance(items, list) and items and isinstance(items[0], dict) else {}
+
+
+def convert_entry(entry: Dict) -> Optional[WordType]:
+    """把一条 kajweb 词书记录转换为单词库记录（字段与现有单词库一致），无法识别时返回None"""
+    content = entry.get("content", {}).get("word", {})
+    detail = content.get("content", {}) if isinstance(content, dict) else {}
+    head = str(entry.get("headWord") or content.get("wordHead") or "").strip()
+    if not head:
+        return None
+    translation = _first(detail.get("trans")).get("tranCn", "")
+    phone = detail.get("usphone") or detail.get("ukphone")
+    sentence = _first(detail.get("sentence", {}).get("sentences"))
+    example = None
+    if sentence.get("sContent"):
+        example = f"{sentence['sContent']} - {sentence.get('sCn', '')}".strip(" -")
+    metadata = {}
+    if entry.get("bookId"):
+        metadata["book"] = entry["bookId"]
+    if isinstance(entry.get("wordRank"), int):
+        metadata["book_rank"] = entry["wordRank"]  # 在词书中的序号
+    return {
+        "id": new_word_id(),
+        "word": head,
+        "translation": str(translation).strip(),
+        "pronunciation": f"/{phone}/" if phone else None,
+        "example": example,
+        "note": "Imported from JSON",
+        "created_at": datetime.now().isoformat(),
+        "metadata": metadata
+    }
+
+
+def import_books(word_lib: WordLibrary, paths: Iterable[str]) -> Dict[str, int]:
+    """导入若干词书：按单词（不区分大小写）去重，全部解析完后一次性写入单词库"""
+    seen = set()
+    batch: List[WordType] = []
+    counts = {"read": 0, "imported": 0, "duplicate": 0, "invalid": 0}
+    for path in paths:
+        for entry in iter_json_records(path):
+            counts["read"] += 1
+            word = convert_entry(entry) if entry is not None else None
+            if word is None:
+                counts["invalid"] += 1
+                continue
+            key = word["word"].lower()
+            if key in seen or word_lib.find_by_word(key):
+                counts["duplicate"] += 1
+                continue
+            seen.add(key)
+            batch.append(word)
+    counts["imported"] = word_lib.import_words(batch)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从 kajweb/dict 词书文件批量导入单词")
+    parser.add_argument("books", nargs="+", help="词书文件（每行一个JSON对象）")
+    parser.add_argument("--library", default="word_library.json", help="单词库文件（.json 或 .wlib）")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    word_lib = WordLibrary(args.library)
+    try:
+        counts = import_books(word_lib, args.books)
+    finally:
+        word_lib.close()
+    print(f"读取 {counts['read']} 条，导入 {counts['imported']} 个新单词，"
+          f"跳过重复 {counts['duplicate']} 个、无法识别 {counts['invalid']} 条，"
+          f"耗时 {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,260 @@
-import json
 import random
-from typing import List, Dict, Set, Optional
+import threading
+import uuid
+import weakref
+from typing import List, Dict, KeysView, Optional
 from datetime import datetime
+from word_store import WordJournal, open_snapshot
 
 # 单词数据结构定义
 WordType = Dict[str, object]  # 单词数据结构：字典类型
 
+
+def new_word_id() -> str:
+    """生成新的单词ID（随机UUID，批量创建时也不会重复）"""
+    return f"word_{uuid.uuid4().hex}"
+
 class WordLibrary:
-    def __init__(self, file_path: str = "word_library.json"):
+    def __init__(self,
+                 file_path: str = "word_library.json",
+                 journal_path: Optional[str] = None,
+                 compact_threshold: int = 500):
         self.file_path = file_path
-        self.all_words: List[WordType] = self._load_words()
-        self.word_ids: Set[str] = set(word["id"] for word in self.all_words)  # 单词ID集合，用于快速查找
+        self.snapshot = open_snapshot(file_path)  # 单词库文件格式（JSON 或 .wlib 二进制）
+        # 追加式变更日志：日常修改只追加到日志，攒够一定数量后在后台压缩回单词库文件
+        self.journal = WordJournal(journal_path or f"{file_path}.journal")
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()  # 保护内存数据与日志写入
+        self._compact_lock = threading.Lock()  # 保证同一时间只有一个压缩任务
+        self._compact_thread: Optional[threading.Thread] = None
+        # 单词增删通知（例如各用户的未学习单词池），对象需实现 words_added(words) 和 word_removed(word_id)
+        self._listeners = weakref.WeakSet()
+
+        # 索引：ID -> 单词（同时按插入顺序保存整个单词库），单词文本(小写) -> 单词列表
+        self._by_id: Dict[str, WordType] = {}
+        self._by_word: Dict[str, List[WordType]] = {}
+        self._build_index(self._load_words())
+        if self._replay_journal():
+            self.compact()
+
+    @property
+    def all_words(self) -> List[WordType]:
+        """按顺序返回全部单词"""
+        return list(self._by_id.values())
+
+    @property
+    def word_ids(self) -> KeysView[str]:
+        """单词ID集合，用于快速查找"""
+        return self._by_id.keys()
+
+    def _build_index(self, words: List[WordType]):
+        self._by_id = {}
+        self._by_word = {}
+        for word in words:
+            self._index_word(word)
+
+    def _index_word(self, word: WordType):
+        self._by_id[word["id"]] = word
+        self._by_word.setdefault(str(word.get("word", "")).lower(), []).append(word)
+
+    def _unindex_word(self, word_id: str) -> Optional[WordType]:
+        word = self._by_id.pop(word_id, None)
+        if word is not None:
+            key = str(word.get("word", "")).lower()
+            same_text = self._by_word.get(key, [])
+            same_text[:] = [w for w in same_text if w["id"] != word_id]
+            if not same_text:
+                self._by_word.pop(key, None)
+        return word
+
+    def add_listener(self, listener):
+        """注册单词增删通知（弱引用，对象被回收后自动移除）"""
+        self._listeners.add(listener)
+
+    def get_word(self, word_id: str) -> Optional[WordType]:
+        """通过ID获取单词，不存在时返回None"""
+        return self._by_id.get(word_id)
+
+    def find_by_word(self, word_text: str) -> List[WordType]:
+        """通过单词文本（不区分大小写）查找单词"""
+        return list(self._by_word.get(word_text.strip().lower(), []))
 
     def _load_words(self) -> List[WordType]:
         """从文件加载单词库"""
-        try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # 确保数据是列表类型
-                if not isinstance(data, list):
-                    print(f"警告: 单词库文件格式不正确，期望列表，却得到{type(data)}。重置为新列表。")
-                    return []
-                return data
-        except FileNotFoundError:
-            return []
+        return self.snapshot.load()
+
+    def _replay_journal(self) -> bool:
+        """把变更日志重放到内存中的单词库上，返回是否需要立即压缩"""
+        replayed = 0
+        for op in self.journal.replay():
+            kind = op.get("op")
+            if kind == "meta":
+                self._merge_metadata(op.get("id"), op.get("fields", {}))
+            elif kind == "meta_many":
+                for word_id, fields in op.get("items", {}).items():
+                    self._merge_metadata(word_id, fields)
+            elif kind == "set":
+                word = self._by_id.get(op.get("id"))
+                if word is not None:
+                    word.update(op.get("fields", {}))
+            elif kind == "set_many":
+                for word_id, fields in op.get("items", {}).items():
+                    word = self._by_id.get(word_id)
+                    if word is not None:
+                        word.update(fields)
+            elif kind == "add":
+                word = op.get("word")
+                if word and word["id"] not in self._by_id:
+                    self._index_word(word)
+            elif kind == "del":
+                self._unindex_word(op.get("id"))
+            replayed += 1
+        self.journal.entries = replayed
+
+        # 上次压缩中途退出，或日志已经很长时，加载后先同步压缩一次
+        return self.journal.has_rotated() or replayed >= self.compact_threshold
+
+    def _merge_metadata(self, word_id: str, changes: Dict[str, object]) -> Optional[WordType]:
+        # 整体替换元数据字典，避免后台压缩序列化时字典被原地修改
+        word = self._by_id.get(word_id)
+        if word is not None:
+            lm = dict(word.get("learning_metadata") or {})
+            lm.update(changes)
+            word["learning_metadata"] = lm
+        return word
+
+    def reload(self):
+        """重新从文件加载单词库，并重放变更日志"""
+        if self._compact_thread is not None:
+            self._compact_thread.join()
+        with self._lock:
+            self.journal.close()
+            self._build_index(self._load_words())
+            need_compact = self._replay_journal()
+        if need_compact:
+            self.compact()
 
     def save_words(self, new_words: List[WordType] = None):
-        """保存单词库（可选：传入新单词列表）"""
+        """保存单词库（可选：传入新单词列表）
+
+        传入新单词时只把新增记录追加到变更日志；不传参数时把整个单词库写回文件。
+        """
         if new_words:
-            # 添加新单词（检查ID是否存在）
-            for word in new_words:
-                if word["id"] not in self.word_ids:
-                    self.all_words.append(word)
-                    self.word_ids.add(word["id"])
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(self.all_words, f, ensure_ascii=False, indent=2)
-
-    def create_word(self, 
-                    word_text: str, 
+            added = []
+            with self._lock:
+                # 添加新单词（检查ID是否存在）
+                for word in new_words:
+                    if word["id"] not in self._by_id:
+                        self._index_word(word)
+                        self.journal.append({"op": "add", "word": word})
+                        added.append(word)
+            for listener in list(self._listeners):
+                listener.words_added(added)
+            self._maybe_compact()
+        else:
+            self.compact()
+
+    def import_words(self, words: List[WordType]) -> int:
+        """批量导入新单词：不逐条写日志，而是导入后把整个单词库写回文件一次，返回实际新增的数量"""
+        added = []
+        with self._lock:
+            for word in words:
+                if word["id"] not in self._by_id:
+                    self._index_word(word)
+                    added.append(word)
+        if added:
+            for listener in list(self._listeners):
+                listener.words_added(added)
+            self.compact()
+        return len(added)
+
+    def update_metadata(self, word_id: str, changes: Dict[str, object]) -> WordType:
+        """更新单词的学习元数据，只把变化的字段追加到变更日志"""
+        with self._lock:
+            word = self._merge_metadata(word_id, changes)
+            if word is None:
+                raise ValueError(f"单词ID {word_id} 不存在")
+            self.journal.append({"op": "meta", "id": word_id, "fields": changes})
+        self._maybe_compact()
+        return word
+
+    def update_metadata_many(self, changes: Dict[str, Dict[str, object]]):
+        """一次更新多个单词的学习元数据，作为一条日志记录写入并落盘（要么全部生效，要么都不生效）"""
+        if not changes:
+            return
+        with self._lock:
+            missing = [word_id for word_id in changes if word_id not in self._by_id]
+            if missing:
+                raise ValueError(f"单词ID {missing[0]} 不存在")
+            # 先落盘再修改内存，写入失败时内存中的元数据保持不变
+            self.journal.append({"op": "meta_many", "items": changes}, sync=True)
+            for word_id, fields in changes.items():
+                self._merge_metadata(word_id, fields)
+        self._maybe_compact()
+
+    def update_word(self, word_id: str, fields: Dict[str, object]) -> WordType:
+        """更新单词记录的顶层字段（例如LLM生成的附加内容），只把这些字段追加到变更日志"""
+        with self._lock:
+            word = self._by_id.get(word_id)
+            if word is None:
+                raise ValueError(f"单词ID {word_id} 不存在")
+            word.update(fields)
+            self.journal.append({"op": "set", "id": word_id, "fields": fields})
+        self._maybe_compact()
+        return word
+
+    def update_words(self, updates: Dict[str, Dict[str, object]]) -> int:
+        """批量更新多个单词的顶层字段，作为一条日志记录写入并落盘，返回实际更新的数量
+
+        已被删除的单词直接跳过（后台任务生成结果期间单词可能被移除）。
+        """
+        with self._lock:
+            applied = {word_id: fields for word_id, fields in updates.items() if word_id in self._by_id}
+            if not applied:
+                return 0
+            for word_id, fields in applied.items():
+                self._by_id[word_id].update(fields)
+            self.journal.append({"op": "set_many", "items": applied}, sync=True)
+        self._maybe_compact()
+        return len(applied)
+
+    def compact(self):
+        """把内存中的单词库完整写回文件，并清空已合并的变更日志"""
+        with self._compact_lock:
+            with self._lock:
+                prepared = self.snapshot.serialize(self.all_words)
+                self.journal.rotate()
+            # 写文件时不持有数据锁，请求处理可以继续追加日志
+            self.snapshot.write(prepared)
+            with self._lock:
+                self.snapshot.commit(prepared)
+            self.journal.discard_rotated()
+
+    def _maybe_compact(self):
+        """日志过长时在后台线程中压缩"""
+        if self.journal.entries < self.compact_threshold:
+            return
+        if self._compact_thread is not None and self._compact_thread.is_alive():
+            return
+        self._compact_thread = threading.Thread(target=self.compact, daemon=True)
+        self._compact_thread.start()
+
+    def close(self):
+        """等待后台压缩结束并关闭日志文件"""
+        if self._compact_thread is not None:
+            self._compact_thread.join()
+        with self._lock:
+            self.journal.close()
+
+    def create_word(self,
+                    word_text: str,
                     translation: str,
                     pronunciation: Optional[str] = None,
                     example: Optional[str] = None,
                     note: Optional[str] = None) -> WordType:
         """创建新单词对象"""
         return {
-            "id": f"word_{datetime.now().timestamp()}",  # 使用时间戳生成唯一ID
+            "id": new_word_id(),  # 唯一ID（时间戳在循环中创建时会重复）
             "word": word_text,  # 单词文本
             "translation": translation,  # 翻译
             "pronunciation": pronunciation,  # 发音
@@ -56,10 +266,11 @@ class WordLibrary:
 
     def remove_word(self, word_id: str) -> bool:
         """从单词库中移除指定ID的单词"""
-        for i, word in enumerate(self.all_words):
-            if word["id"] == word_id:
-                del self.all_words[i]
-                self.word_ids.remove(word_id)
-                self.save_words()  # 立即保存更改
-                return True
-        return False
\ No newline at end of file
+        with self._lock:
+            if self._unindex_word(word_id) is None:
+                return False
+            self.journal.append({"op": "del", "id": word_id})  # 立即记录更改
+        for listener in list(self._listeners):
+            listener.word_removed(word_id)
+        self._maybe_compact()
+        return True
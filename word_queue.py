@@ -0,0 +1,98 @@
+from collections import OrderedDict
+from itertools import count, islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+class WordQueue:
+    """按加入顺序排列的单词ID队列（有序集合）
+
+    成员判断、追加、删除、取队首都是 O(1)；同一个ID只出现一次，重复追加不改变位置。
+    保存时用 to_list() 转成列表，文件格式与原先的列表相同。
+    mark() 之后的修改可以用 rollback() 撤销（只记录变化，不复制整个队列）。
+    """
+
+    def __init__(self, word_ids: Iterable[str] = ()):
+        self._seq = count()
+        # ID -> 加入序号（回滚时用于恢复原来的顺序）
+        self._items: "OrderedDict[str, int]" = OrderedDict((word_id, next(self._seq)) for word_id in word_ids)
+        # mark() 以来的修改：(ID, 原来的序号)，原来不在队列中时序号为None
+        self._undo: Optional[List[Tuple[str, Optional[int]]]] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __bool__(self) -> bool:
+        return bool(self._items)
+
+    def __contains__(self, word_id: str) -> bool:
+        return word_id in self._items
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items)
+
+    def __getitem__(self, index: int) -> str:
+        """队首（0）和队尾（-1）为 O(1)，其他位置需要遍历"""
+        if not self._items:
+            raise IndexError("队列为空")
+        if index == 0:
+            return next(iter(self._items))
+        if index == -1:
+            return next(reversed(self._items))
+        if index < 0:
+            index += len(self._items)
+        if not 0 <= index < len(self._items):
+            raise IndexError(index)
+        return next(islice(self._items, index, None))
+
+    def __repr__(self) -> str:
+        return f"WordQueue({self.to_list()!r})"
+
+    def append(self, word_id: str):
+        """追加到队尾（已在队列中时保持原位置）"""
+        if word_id not in self._items:
+            if self._undo is not None:
+                self._undo.append((word_id, None))
+            self._items[word_id] = next(self._seq)
+
+    def remove(self, word_id: str):
+        """移除单词，不在队列中时抛出 ValueError（与 list.remove 一致）"""
+        if word_id not in self._items:
+            raise ValueError(f"{word_id} 不在队列中")
+        self.discard(word_id)
+
+    def discard(self, word_id: str):
+        """移除单词（不在队列中时忽略）"""
+        seq = self._items.pop(word_id, None)
+        if seq is not None and self._undo is not None:
+            self._undo.append((word_id, seq))
+
+    def popleft(self) -> str:
+        if not self._items:
+            raise IndexError("队列为空")
+        word_id = self[0]
+        self.discard(word_id)
+        return word_id
+
+    def mark(self):
+        """开始记录修改，之后可以用 rollback() 恢复到此时的状态"""
+        self._undo = []
+
+    def release(self):
+        """停止记录修改（保留修改）"""
+        self._undo = None
+
+    def rollback(self):
+        """撤销 mark() 以来的修改；有单词被移除又恢复时按加入序号重新排列，恢复原来的顺序"""
+        undo, self._undo = self._undo or [], None
+        reordered = False
+        for word_id, seq in reversed(undo):
+            if seq is None:
+                self._items.pop(word_id, None)
+            else:
+                self._items[word_id] = seq
+                reordered = True
+        if reordered:
+            self._items = OrderedDict(sorted(self._items.items(), key=lambda item: item[1]))
+
+    def to_list(self) -> List[str]:
+        return list(self._items)
@@ -0,0 +1,293 @@
+import argparse
+import io
+import json
+import mmap
+import os
+import shutil
+import struct
+from typing import Dict, Iterator, List, Tuple, Union
+
+
+def atomic_write_text(path: str, text: Union[str, bytes]):
+    """原子写入文件（先写临时文件并fsync，再rename覆盖）"""
+    tmp_path = f"{path}.tmp"
+    if isinstance(text, bytes):
+        f = open(tmp_path, 'wb')
+    else:
+        f = open(tmp_path, 'w', encoding='utf-8')
+    with f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class JsonSnapshot:
+    """单词库快照：JSON格式（项目原有格式）"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> List[Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                # 确保数据是列表类型
+                if not isinstance(data, list):
+                    print(f"警告: 单词库文件格式不正确，期望列表，却得到{type(data)}。重置为新列表。")
+                    return []
+                return data
+        except FileNotFoundError:
+            return []
+
+    def serialize(self, words: List[Dict]) -> str:
+        """序列化（调用方持有数据锁）"""
+        return json.dumps([materialize(word) for word in words], ensure_ascii=False, indent=2)
+
+    def write(self, payload: str):
+        """写入文件（不需要持有数据锁）"""
+        atomic_write_text(self.path, payload)
+
+    def commit(self, payload: str):
+        """写入完成后的收尾工作（调用方持有数据锁）"""
+
+
+# 二进制格式中按需加载的大文本字段
+COLD_FIELDS = ("root_explanation", "example")
+_MAGIC = b"DRWLIB1\n"
+_HEADER = struct.Struct("<8sQ")  # 魔数 + 热数据区偏移
+
+
+class _ColdSegment:
+    """二进制单词库文件的内存映射，按偏移读取冷字段"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, offset: int, length: int):
+        return json.loads(self._mmap[offset:offset + length].decode('utf-8'))
+
+    def raw(self, offset: int, length: int) -> bytes:
+        return self._mmap[offset:offset + length]
+
+
+class LazyWord(dict):
+    """冷字段（root_explanation、example）不常驻内存的单词记录，读取时才从文件映射中解码"""
+
+    __slots__ = ("_cold",)
+
+    def __init__(self, hot: Dict, cold: Dict[str, Tuple[_ColdSegment, int, int]]):
+        super().__init__(hot)
+        self._cold = cold
+
+    def __missing__(self, key):
+        ref = self._cold.get(key)
+        if ref is None:
+            raise KeyError(key)
+        segment, offset, length = ref
+        return segment.read(offset, length)
+
+    def __contains__(self, key) -> bool:
+        return dict.__contains__(self, key) or key in self._cold
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+def materialize(word: Dict) -> Dict:
+    """得到包含全部字段的普通字典"""
+    if not isinstance(word, LazyWord):
+        return word
+    full = dict(word)
+    for key in word._cold:
+        if key not in full:
+            full[key] = word[key]
+    return full
+
+
+class BinarySnapshot:
+    """单词库快照：紧凑二进制格式
+
+    文件结构：头部（魔数 + 热数据区偏移） | 冷数据区 | 热数据区
+    - 冷数据区：COLD_FIELDS 中各字段的JSON编码，依次拼接，通过 mmap 按需读取
+    - 热数据区：其余字段（id、word、translation、learning_metadata 等）的紧凑JSON列表，
+      每条记录附带 "_cold": {字段: [偏移, 长度]}，启动时整体加载
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> List[Dict]:
+        try:
+            with open(self.path, 'rb') as f:
+                magic, hot_offset = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != _MAGIC:
+                    print(f"警告: {self.path} 不是有效的二进制单词库文件。重置为新列表。")
+                    return []
+                f.seek(hot_offset)
+                hot = json.loads(f.read().decode('utf-8'))
+        except FileNotFoundError:
+            return []
+        segment = _ColdSegment(self.path)
+        words = []
+        for record in hot:
+            refs = record.pop("_cold", {})
+            words.append(LazyWord(record, {key: (segment, ref[0], ref[1]) for key, ref in refs.items()}))
+        return words
+
+    def serialize(self, words: List[Dict]):
+        """序列化（调用方持有数据锁），冷字段优先直接复制原文件中的字节"""
+        blob = io.BytesIO()
+        blob.write(b"\0" * _HEADER.size)
+        hot = []
+        placements = []  # (单词, {字段: (偏移, 长度, 内存中的原值)})，写入完成后用于更新记录的冷字段位置
+        for word in words:
+            record = {key: value for key, value in word.items() if key not in COLD_FIELDS}
+            refs = {}
+            for key in COLD_FIELDS:
+                value = None
+                if dict.__contains__(word, key):
+                    value = dict.__getitem__(word, key)
+                    data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+                elif isinstance(word, LazyWord) and key in word._cold:
+                    segment, offset, length = word._cold[key]
+                    data = segment.raw(offset, length)
+                else:
+                    continue
+                refs[key] = (blob.tell(), len(data), value)
+                blob.write(data)
+            record["_cold"] = {key: [ref[0], ref[1]] for key, ref in refs.items()}
+            hot.append(record)
+            placements.append((word, refs))
+        hot_offset = blob.tell()
+        blob.write(json.dumps(hot, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        payload = blob.getvalue()
+        payload = _HEADER.pack(_MAGIC, hot_offset) + payload[_HEADER.size:]
+        return payload, placements
+
+    def write(self, prepared):
+        atomic_write_text(self.path, prepared[0])
+
+    def commit(self, prepared):
+        """让已加载的记录改为引用新文件（旧文件的映射在不再被引用后自动释放）"""
+        segment = _ColdSegment(self.path)
+        for word, refs in prepared[1]:
+            if isinstance(word, LazyWord):
+                word._cold = {key: (segment, offset, length) for key, (offset, length, _) in refs.items()}
+                for key, (_, _, value) in refs.items():
+                    # 已写入文件的冷字段不再常驻内存（写入期间又被修改的除外）
+                    if value is not None and dict.get(word, key) is value:
+                        dict.__delitem__(word, key)
+
+
+def open_snapshot(path: str):
+    """根据文件扩展名选择快照格式（.wlib 为二进制格式，其余为JSON）"""
+    if path.endswith(".wlib"):
+        return BinarySnapshot(path)
+    return JsonSnapshot(path)
+
+
+class WordJournal:
+    """追加式变更日志（每行一条JSON操作记录）
+
+    支持的操作：
+    - {"op": "meta", "id": 单词ID, "fields": {...}}  合并更新learning_metadata中变化的字段
+    - {"op": "meta_many", "items": {单词ID: {...}}}   一次提交中多个单词的元数据变化（作为一条记录原子写入）
+    - {"op": "set", "id": 单词ID, "fields": {...}}   更新单词记录的顶层字段
+    - {"op": "set_many", "items": {单词ID: {...}}}    批量更新多个单词的顶层字段（一条记录）
+    - {"op": "add", "word": {...}}                    新增单词
+    - {"op": "del", "id": 单词ID}                     删除单词
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rotated_path = f"{path}.compacting"  # 压缩进行中时旧日志的临时位置
+        self.entries = 0  # 当前日志中的记录条数
+        self._file = None
+
+    def append(self, op: Dict, sync: bool = False):
+        """追加一条操作记录（只写入本次变化，不重写整个单词库），sync=True 时等待落盘"""
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(op, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+        self.entries += 1
+
+    def replay(self) -> Iterator[Dict]:
+        """按顺序读出所有未压缩的操作记录（先旧日志，再当前日志）"""
+        for path in (self.rotated_path, self.path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            yield json.loads(line)
+                        except json.JSONDecodeError:
+                            # 崩溃时可能留下写了一半的最后一行，直接忽略
+                            print(f"警告: 日志 {path} 中存在损坏的记录，已跳过")
+            except FileNotFoundError:
+                continue
+
+    def has_rotated(self) -> bool:
+        return os.path.exists(self.rotated_path)
+
+    def rotate(self):
+        """把当前日志移到一边，之后的写入进入新日志（压缩开始时调用）
+
+        上次压缩中途退出留下的旧日志还在时，把当前日志追加到它后面，而不是覆盖它。
+        追加完成前退出的话两个文件中会有重复的记录，重放这些操作是幂等的。
+        """
+        self.close()
+        if os.path.exists(self.path):
+            if os.path.exists(self.rotated_path):
+                with open(self.rotated_path, 'rb+') as rotated, open(self.path, 'rb') as current:
+                    rotated.seek(0, os.SEEK_END)
+                    if rotated.tell() > 0:
+                        rotated.seek(-1, os.SEEK_END)
+                        if rotated.read(1) != b"\n":
+                            rotated.write(b"\n")  # 旧日志末尾可能有写了一半的记录
+                    shutil.copyfileobj(current, rotated)
+                    rotated.flush()
+                    os.fsync(rotated.fileno())
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self.rotated_path)
+        self.entries = 0
+
+    def discard_rotated(self):
+        """快照写入完成后删除旧日志"""
+        try:
+            os.remove(self.rotated_path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def convert(source: str, target: str):
+    """在JSON与二进制单词库格式之间转换（按扩展名判断格式）"""
+    src = open_snapshot(source)
+    dst = open_snapshot(target)
+    words = src.load()
+    prepared = dst.serialize(words)
+    dst.write(prepared)
+    print(f"已将 {len(words)} 个单词从 {source} 转换到 {target}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="单词库格式转换（.json <-> .wlib）")
+    parser.add_argument("source")
+    parser.add_argument("target")
+    args = parser.parse_args()
+    convert(args.source, args.target)